@@ -0,0 +1,117 @@
+import tracemalloc
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.dependencies import require_profiling
+from app.api.schemas import MemorySnapshotResponse
+from app.config import profiling_settings
+from app.services.profiling import (
+    PROFILE_FILE_HEADER,
+    PROFILE_HEADER,
+    StackSampler,
+    memory_snapshots,
+    memory_stats,
+    profiling_allowed,
+    write_profile,
+)
+
+# Снимки памяти хранятся в процессе API: при нескольких процессах uvicorn
+# запросы к /debug/memory должны попадать в один и тот же процесс
+debug_router = APIRouter(
+    prefix="/debug/memory", dependencies=[Depends(require_profiling)]
+)
+
+
+async def profile_requests(request: Request, call_next):
+    """
+    Middleware: профилирует запрос с заголовком X-Profile-Token.
+    Сэмплируются все потоки процесса (цикл событий и пул потоков синхронных
+    эндпоинтов), поэтому в профиль попадают и одновременные запросы.
+    Имя файла профиля возвращается в заголовке X-Profile-File.
+    """
+    if not profiling_allowed(request.headers.get(PROFILE_HEADER), profiling_settings):
+        return await call_next(request)
+
+    sampler = StackSampler(
+        profiling_settings.PROFILING_INTERVAL,
+        max_duration=profiling_settings.PROFILING_MAX_DURATION,
+    ).start()
+    try:
+        response = await call_next(request)
+    finally:
+        # stop() ждёт последний сэмпл через time.sleep: не в цикле событий
+        samples = await run_in_threadpool(sampler.stop)
+
+    path = await run_in_threadpool(
+        write_profile, samples, "api", f"{request.method}{request.url.path}"
+    )
+    response.headers[PROFILE_FILE_HEADER] = path.name
+    return response
+
+
+@debug_router.post("/start")
+def start_memory_tracing(frames: int = Query(None, ge=1, le=100)):
+    """
+    Запускает трассировку выделений памяти (tracemalloc) в процессе API.
+    Трассировка замедляет выделение памяти, после диагностики её нужно остановить.
+    """
+    memory_snapshots.start(frames or profiling_settings.PROFILING_TRACEMALLOC_FRAMES)
+    return {"tracing": True}
+
+
+@debug_router.delete("")
+def stop_memory_tracing():
+    """Останавливает трассировку памяти и удаляет сохранённые снимки."""
+    memory_snapshots.stop()
+    return {"tracing": False}
+
+
+@debug_router.post("/snapshots", response_model=MemorySnapshotResponse)
+def take_memory_snapshot(limit: int = Query(20, ge=1, le=200)):
+    """
+    Снимок памяти: крупнейшие места выделения по строкам кода.
+    Сохраняется для сравнения (последние MAX_MEMORY_SNAPSHOTS снимков).
+
+    Raises:
+        HTTPException: Если трассировка не запущена.
+    """
+    try:
+        snapshot_id, snapshot = memory_snapshots.take()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    traced, peak = tracemalloc.get_traced_memory()
+    return MemorySnapshotResponse(
+        snapshot_id=snapshot_id,
+        traced=traced,
+        peak=peak,
+        top=memory_stats(snapshot, limit=limit),
+    )
+
+
+@debug_router.get("/snapshots/{snapshot_id}/diff", response_model=MemorySnapshotResponse)
+def diff_memory_snapshot(snapshot_id: int, limit: int = Query(20, ge=1, le=200)):
+    """
+    Прирост памяти от сохранённого снимка до текущего момента.
+    Текущее состояние сохраняется новым снимком для следующего сравнения.
+
+    Raises:
+        HTTPException: Если снимка нет или трассировка не запущена.
+    """
+    base = memory_snapshots.snapshots.get(snapshot_id)
+    if base is None:
+        raise HTTPException(status_code=404, detail="Снимок не найден")
+
+    try:
+        current_id, current = memory_snapshots.take()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    traced, peak = tracemalloc.get_traced_memory()
+    return MemorySnapshotResponse(
+        snapshot_id=current_id,
+        traced=traced,
+        peak=peak,
+        top=memory_stats(current, base, limit=limit),
+    )
@@ -0,0 +1,89 @@
+from functools import lru_cache
+
+from typing import AsyncIterator, Optional
+
+from fastapi import Header, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from starlette.datastructures import UploadFile
+
+from app.config import admission_settings, profiling_settings
+from app.db.session import (
+    get_async_session_maker,
+    get_broker_async,
+    get_redis_async,
+)
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services.profiling import profiling_allowed
+
+
+@lru_cache
+def get_admission_controller() -> AdmissionController:
+    return AdmissionController(
+        get_redis_async(),
+        get_broker_async(),
+        admission_settings,
+        get_async_session_maker(),
+    )
+
+
+async def admission_control(request: Request):
+    """
+    Контроль допуска загрузки: при перегрузке отвечает 429 с Retry-After.
+    Слот одновременных загрузок освобождается после обработки запроса.
+    """
+    if not admission_settings.ADMISSION_ENABLED:
+        yield
+        return
+
+    client_id = request.client.host if request.client else "unknown"
+    admission_controller = get_admission_controller()
+
+    try:
+        slot = await admission_controller.admit(client_id)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    try:
+        yield
+    finally:
+        await admission_controller.release(slot)
+
+
+async def upload_file(request: Request) -> AsyncIterator[UploadFile]:
+    """
+    Архив из multipart-формы (поле file).
+
+    Файл не объявлен параметром эндпоинта: такие параметры FastAPI читает
+    до выполнения зависимостей, и отклонённая admission_control загрузка
+    успевала бы передать архив целиком. Зависимости маршрута выполняются
+    раньше зависимостей эндпоинта, поэтому тело читается после допуска.
+    """
+    async with request.form() as form:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise RequestValidationError(
+                [
+                    {
+                        "type": "missing",
+                        "loc": ("body", "file"),
+                        "msg": "Field required",
+                        "input": None,
+                    }
+                ]
+            )
+        yield file
+
+
+async def require_profiling(x_profile_token: Optional[str] = Header(None)):
+    """
+    Доступ к диагностическим эндпоинтам: 404, если профилирование выключено,
+    403 при неверном X-Profile-Token.
+    """
+    if not profiling_settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling_allowed(x_profile_token, profiling_settings):
+        raise HTTPException(status_code=403, detail="Неверный токен профилирования")
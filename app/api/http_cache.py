@@ -0,0 +1,74 @@
+"""
+HTTP-кэширование ответа GET /results/{task_id}.
+
+task_id - SHA-256 архива, поэтому после SUCCESS ответ больше не меняется
+и может кэшироваться клиентами и прокси как immutable. FAILED может смениться
+на SUCCESS при повторной попытке, PENDING/IN_PROGRESS меняются постоянно.
+"""
+
+import hashlib
+import json
+from typing import Dict, Optional, Tuple
+
+from app.models.task_result import TaskStatusEnum
+
+# Время жизни ETag в Redis (сек) для завершённых задач
+ETAG_TTL = {
+    TaskStatusEnum.SUCCESS: 24 * 60 * 60,
+    TaskStatusEnum.FAILED: 60,
+}
+
+CACHE_CONTROL = {
+    TaskStatusEnum.SUCCESS: "public, max-age=31536000, immutable",
+    TaskStatusEnum.FAILED: "public, max-age=60",
+    TaskStatusEnum.PENDING: "public, max-age=5",
+    TaskStatusEnum.IN_PROGRESS: "public, max-age=5",
+}
+
+# Через сколько секунд имеет смысл снова запросить незавершённую задачу
+RETRY_AFTER = {
+    TaskStatusEnum.PENDING: 5,
+    TaskStatusEnum.IN_PROGRESS: 10,
+}
+
+
+def render_body(data: dict) -> bytes:
+    """
+    Сериализует ответ в канонический JSON (с сортировкой ключей), чтобы одинаковые
+    данные из кэша Redis и из БД давали побайтно одинаковое тело и одинаковый ETag.
+    """
+    return json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+
+
+def make_etag(body: bytes) -> str:
+    """Строгий ETag по содержимому тела ответа."""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Проверяет заголовок If-None-Match (слабое сравнение, как требует RFC 9110)."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in candidates)
+
+
+def cache_headers(status: TaskStatusEnum, etag: str) -> Dict[str, str]:
+    """Заголовки кэширования для ответа с задачей в статусе status."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL[status]}
+    if status in RETRY_AFTER:
+        headers["Retry-After"] = str(RETRY_AFTER[status])
+    return headers
+
+
+def pack_etag(status: TaskStatusEnum, etag: str) -> str:
+    """Значение ключа ETag в Redis: статус нужен, чтобы ответить 304 с верными заголовками."""
+    return f"{status.value} {etag}"
+
+
+def unpack_etag(value: str) -> Tuple[TaskStatusEnum, str]:
+    status, _, etag = value.partition(" ")
+    return TaskStatusEnum(status), etag
@@ -0,0 +1,46 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(updated_at: datetime, task_id: str) -> str:
+    """Кодирует позицию последней выданной строки в непрозрачный курсор."""
+    raw = f"{updated_at.isoformat()}|{task_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Декодирует курсор, полученный из encode_cursor.
+
+    Raises:
+        ValueError: Если курсор повреждён.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, task_id = raw.split("|", 1)
+        return datetime.fromisoformat(updated_at), task_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+
+
+def encode_offset(offset: int) -> str:
+    """Кодирует номер строки отчёта в непрозрачный курсор."""
+    return base64.urlsafe_b64encode(str(offset).encode()).decode().rstrip("=")
+
+
+def decode_offset(cursor: str) -> int:
+    """
+    Декодирует курсор, полученный из encode_offset.
+
+    Raises:
+        ValueError: Если курсор повреждён.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        offset = int(raw)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+    if offset < 0:
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return offset
@@ -1,26 +1,104 @@
 import json
+import zipfile
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, UploadFile, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, HTTPException, Depends, Header, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import ValidationError
-from app.api.schemas import UploadResponse, ResultsResponse, TestResults
-from app.models.task_result import TaskResult, TaskStatusEnum
+from app.api.dependencies import admission_control, upload_file
+from app.config import profiling_settings
+from app.api.http_cache import (
+    ETAG_TTL,
+    cache_headers,
+    etag_matches,
+    make_etag,
+    pack_etag,
+    render_body,
+    unpack_etag,
+)
+from app.api.pagination import (
+    decode_cursor,
+    decode_offset,
+    encode_cursor,
+    encode_offset,
+)
+from app.api.schemas import (
+    UploadResponse,
+    ResultsResponse,
+    TestResults,
+    TaskListResponse,
+    TaskSummary,
+    ArchiveManifestResponse,
+    FindingsResponse,
+    QualityDay,
+    QualityStatsResponse,
+)
+from app.models.quality_rollup import (
+    COVERAGE_METRIC,
+    SEVERITY_METRICS,
+    QualityRollup,
+    QualityRollupDelta,
+)
+from app.models.task_outbox import TaskOutbox
+from app.models.task_result import (
+    TERMINAL_STATUSES,
+    TaskReport,
+    TaskResult,
+    TaskStatusEnum,
+)
 from app.services.minio_client import (
     delete_from_minio,
     upload_to_minio,
     file_exists_in_minio,
 )
-from app.services.celery import process_zip_task
-from app.db.session import get_db, redis_client_async
+from app.services.cache import (
+    RESULT_CACHE_TTL,
+    STORE_ETAG_SCRIPT,
+    etag_key,
+    result_key,
+)
+from app.services.remote_zip import read_manifest
+from app.services.profiling import slow_stage
+from app.services.reports import read_findings, report_object
+from app.services.rollups import utc_today
+from app.db.session import get_db, get_redis_async
 from app.check_hash import calculate_file_hash
-from sqlalchemy import text
+from minio.error import S3Error
+from sqlalchemy import BigInteger, case, cast, func, text, tuple_, union_all
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter()
 
+# Максимальный период статистики качества (дней)
+MAX_STATS_DAYS = 366
+
+# Тело /upload для OpenAPI: форма читается зависимостью upload_file
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["file"],
+                "properties": {"file": {"type": "string", "format": "binary"}},
+            }
+        }
+    },
+}
+
 
-@router.post("/upload", response_model=UploadResponse)
-async def upload_zip(file: UploadFile, db: AsyncSession = Depends(get_db)):
+@router.post(
+    "/upload",
+    response_model=UploadResponse,
+    dependencies=[Depends(admission_control)],
+    openapi_extra={"requestBody": UPLOAD_REQUEST_BODY},
+)
+async def upload_zip(
+    file: UploadFile = Depends(upload_file), db: AsyncSession = Depends(get_db)
+):
     """
     Загрузка ZIP-архива на сервер.
     Args:
@@ -29,58 +107,92 @@ async def upload_zip(file: UploadFile, db: AsyncSession = Depends(get_db)):
     Returns:
         UploadResponse: Словарь с идентификатором задачи.
     Raises:
-        HTTPException: Если файл не является ZIP-архивом, уже загружен или произошла ошибка при загрузке.
+        HTTPException: Если файл не является ZIP-архивом, уже загружен, произошла ошибка при загрузке
+            или сервис перегружен (429 с заголовком Retry-After).
     """
     if (not file.filename) or (not file.filename.endswith(".zip")):
         raise HTTPException(status_code=400, detail="Только ZIP-архивы разрешены")
 
     file_data = await file.read()
-    file_hash = calculate_file_hash(file)
+    with slow_stage("hash", profiling_settings.SLOW_HASH_SECONDS, size=len(file_data)):
+        file_hash = calculate_file_hash(file)
 
-    if file_exists_in_minio(file_hash):
+    with slow_stage("minio:stat", profiling_settings.SLOW_MINIO_SECONDS, task_id=file_hash):
+        exists = file_exists_in_minio(file_hash)
+    if exists:
         raise HTTPException(status_code=409, detail="Файл уже загружен")
 
-    upload_result = upload_to_minio(file_data, file_hash)
+    with slow_stage(
+        "minio:upload",
+        profiling_settings.SLOW_MINIO_SECONDS,
+        task_id=file_hash,
+        size=len(file_data),
+    ):
+        # При MINIO_STORAGE_MODE=chunked загрузка режет архив на чанки и пишет их
+        # параллельно: выполняется вне цикла событий
+        upload_result = await run_in_threadpool(upload_to_minio, file_data, file_hash)
 
     if not upload_result:
         raise HTTPException(status_code=500, detail="Ошибка при загрузке файла")
 
-    task = TaskResult(task_id=file_hash, status=TaskStatusEnum.PENDING)
+    task = TaskResult(
+        task_id=file_hash, status=TaskStatusEnum.PENDING, size=len(file_data)
+    )
 
     try:
+        # Сообщение для брокера - в той же транзакции, публикует его app.relay
         db.add(task)
+        db.add(TaskOutbox(task_id=task.task_id))
         await db.commit()
+    except IntegrityError:
+        # Архив уже удалён политикой хранения, но результаты проверки остались
+        delete_from_minio(task.task_id)
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Файл уже загружен")
     except Exception as e:
         delete_from_minio(task.task_id)
         await db.rollback()
         raise HTTPException(status_code=500, detail="Ошибка при добавлении файла в бд")
 
-    task_id = task.task_id
-
-    # Отправляем задание в очередь Celery
-    process_zip_task.apply_async(args=[task_id])
-
-    return UploadResponse(task_id=task_id)
+    return UploadResponse(task_id=task.task_id)
 
 
 @router.get("/results/{task_id}", response_model=ResultsResponse)
-async def get_results(task_id: str, db: AsyncSession = Depends(get_db)):
+async def get_results(
+    task_id: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Возвращает результат проверки ZIP-архива из БД, используя кэширование в Redis.
 
+    Ответ содержит ETag и Cache-Control. Если ETag из If-None-Match совпадает
+    с сохранённым для завершённой задачи, возвращается 304 без чтения результатов,
+    иначе ETag сравнивается с вычисленным по телу ответа (304 и для незавершённых).
+
     Args:
         task_id (str): Идентификатор задачи.
+        if_none_match (Optional[str]): Заголовок If-None-Match.
         db (AsyncSession): Асинхронная сессия базы данных.
 
     Returns:
-        ResultsResponse: Объект с результатами проверки.
+        Response: JSON с результатами проверки (ResultsResponse) или 304.
 
     Raises:
         HTTPException: Если задача не найдена или произошла ошибка при преобразовании JSON.
     """
+    redis_client = get_redis_async()
+
+    # Быстрый путь: клиент уже имеет актуальную версию ответа
+    if if_none_match:
+        stored = await redis_client.get(etag_key(task_id))
+        if stored:
+            status, etag = unpack_etag(stored)
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers=cache_headers(status, etag))
 
     # Проверяем кэш Redis
-    cache = await redis_client_async.get(task_id)
+    cache = await redis_client.get(result_key(task_id))
 
     if cache:
         try:
@@ -89,34 +201,288 @@ async def get_results(task_id: str, db: AsyncSession = Depends(get_db)):
                 results = None
             else:
                 results = TestResults(**cache_data["results"])
-            return ResultsResponse(status=cache_data["status"], results=results)
+            response = ResultsResponse(status=cache_data["status"], results=results)
         except (ValidationError, KeyError, json.JSONDecodeError) as e:
             raise HTTPException(status_code=500, detail=f"Ошибка кэша Redis: {e}")
+    else:
+        # Запрос к БД, если в кэше данных нет. Результаты читаются из task_reports
+        # только для завершённых задач: CASE не выполняет подзапрос для остальных
+        report = (
+            select(TaskReport.results)
+            .where(TaskReport.task_id == TaskResult.task_id)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            select(
+                TaskResult.status,
+                case((TaskResult.status.in_(TERMINAL_STATUSES), report)).label(
+                    "results"
+                ),
+            ).where(TaskResult.task_id == task_id)
+        )
+        task = result.first()
+
+        if not task:
+            raise HTTPException(status_code=404, detail="Задача не найдена")
+
+        results = None
+        if task.results:
+            try:
+                results = TestResults(**task.results)
+            except ValidationError as e:
+                raise HTTPException(
+                    status_code=500, detail=f"Ошибка преобразования JSON: {e}"
+                )
+
+        # Кэшируем результат в Redis на 5 минут (300 секунд)
+        cache_data = {
+            "status": task.status.value,  # ✅ Преобразуем Enum в строку
+            "results": task.results,
+        }
+        cache = json.dumps(cache_data)
+        # Только если кэша нет: воркер мог записать более новый статус после чтения из БД
+        await redis_client.set(
+            result_key(task_id), cache, ex=RESULT_CACHE_TTL, nx=True
+        )
+        response = ResultsResponse(status=task.status, results=results)
+
+    body = render_body(response.model_dump(mode="json"))
+    etag = make_etag(body)
 
-    # Запрос к БД, если в кэше данных нет
-    result = await db.execute(select(TaskResult).filter(TaskResult.task_id == task_id))
-    task = result.scalars().first()
+    # ETag завершённой задачи сохраняем для быстрых ответов 304, если кэш
+    # результата не изменился; воркер удаляет его при смене статуса
+    if response.status in ETAG_TTL:
+        await redis_client.eval(
+            STORE_ETAG_SCRIPT,
+            2,
+            result_key(task_id),
+            etag_key(task_id),
+            cache,
+            pack_etag(response.status, etag),
+            ETAG_TTL[response.status],
+        )
 
-    if not task:
-        raise HTTPException(status_code=404, detail="Задача не найдена")
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers(response.status, etag))
 
-    results = None
-    if task.results:
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=cache_headers(response.status, etag),
+    )
+
+
+@router.get("/results/{task_id}/findings", response_model=FindingsResponse)
+def get_findings(
+    task_id: str,
+    analyzer: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Постраничные находки из подробного отчёта анализаторов.
+    Отчёт читается из MinIO потоковой распаковкой, БД и кэш не используются.
+
+    Args:
+        task_id (str): Идентификатор задачи.
+        analyzer (Optional[str]): Только находки анализатора
+            (coverage, vulnerabilities, smells).
+        cursor (Optional[str]): Курсор следующей страницы из предыдущего ответа.
+        limit (int): Размер страницы.
+
+    Returns:
+        FindingsResponse: Находки и курсор следующей страницы.
+
+    Raises:
+        HTTPException: Если курсор некорректен или отчёта нет (задача
+            не завершена успешно или удалена политикой хранения).
+    """
+    offset = 0
+    if cursor:
         try:
-            results = TestResults(**task.results)
-        except ValidationError as e:
-            raise HTTPException(
-                status_code=500, detail=f"Ошибка преобразования JSON: {e}"
+            offset = decode_offset(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        items, next_offset = read_findings(task_id, offset, limit, analyzer)
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            raise HTTPException(status_code=404, detail="Отчёт не найден")
+        raise HTTPException(status_code=500, detail=f"Ошибка MinIO: {e}")
+
+    return FindingsResponse(
+        items=items,
+        next_cursor=encode_offset(next_offset) if next_offset is not None else None,
+    )
+
+
+@router.get("/archives/{task_id}/manifest", response_model=ArchiveManifestResponse)
+def get_archive_manifest(task_id: str):
+    """
+    Список файлов архива. Читается только центральный каталог ZIP
+    Range-запросами к MinIO, архив целиком не скачивается.
+
+    Args:
+        task_id (str): Идентификатор задачи.
+
+    Returns:
+        ArchiveManifestResponse: Файлы архива и их размеры.
+
+    Raises:
+        HTTPException: Если архива нет в MinIO (в том числе удалён политикой
+            хранения) или он повреждён.
+    """
+    try:
+        return read_manifest(task_id)
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            raise HTTPException(status_code=404, detail="Архив не найден")
+        raise HTTPException(status_code=500, detail=f"Ошибка MinIO: {e}")
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=422, detail=f"Повреждённый ZIP-архив: {e}")
+
+
+@router.get("/tasks", response_model=TaskListResponse)
+async def list_tasks(
+    status: Optional[List[TaskStatusEnum]] = Query(None),
+    updated_from: Optional[datetime] = None,
+    updated_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Постраничный список задач, от недавно изменённых к старым.
+
+    Args:
+        status (Optional[List[TaskStatusEnum]]): Фильтр по статусам
+            (PENDING и IN_PROGRESS вместе - незавершённые задачи).
+        updated_from (Optional[datetime]): Начало интервала по времени изменения.
+        updated_to (Optional[datetime]): Конец интервала (не включительно).
+        cursor (Optional[str]): Курсор следующей страницы из предыдущего ответа.
+        limit (int): Размер страницы.
+        db (AsyncSession): Асинхронная сессия базы данных.
+
+    Returns:
+        TaskListResponse: Краткие сведения о задачах (без результатов проверки).
+
+    Raises:
+        HTTPException: Если курсор некорректен.
+    """
+    # Только краткие колонки: JSONB с результатами не читаем
+    query = select(
+        TaskResult.task_id,
+        TaskResult.status,
+        TaskResult.size,
+        TaskResult.created_at,
+        TaskResult.updated_at,
+    )
+
+    if status:
+        query = query.where(TaskResult.status.in_(status))
+    if updated_from is not None:
+        query = query.where(TaskResult.updated_at >= updated_from)
+    if updated_to is not None:
+        query = query.where(TaskResult.updated_at < updated_to)
+
+    # Keyset-пагинация: продолжаем строго после последней строки предыдущей страницы
+    if cursor:
+        try:
+            last_updated_at, last_task_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(
+            tuple_(TaskResult.updated_at, TaskResult.task_id)
+            < tuple_(last_updated_at, last_task_id)
+        )
+
+    query = query.order_by(
+        TaskResult.updated_at.desc(), TaskResult.task_id.desc()
+    ).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].task_id)
+
+    return TaskListResponse(
+        items=[TaskSummary.model_validate(row, from_attributes=True) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/stats/quality", response_model=QualityStatsResponse)
+async def get_quality_stats(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Показатели качества по дням (UTC): среднее покрытие и суммы найденных
+    проблем по критичности. Читаются предагрегированные счётчики, время ответа
+    зависит только от длины периода.
+
+    Args:
+        date_from (Optional[date]): Первый день периода (по умолчанию - 30 дней назад).
+        date_to (Optional[date]): Последний день периода (по умолчанию - сегодня).
+        db (AsyncSession): Асинхронная сессия базы данных.
+
+    Returns:
+        QualityStatsResponse: Показатели за дни, в которые были успешные проверки.
+
+    Raises:
+        HTTPException: Если период задан некорректно.
+    """
+    date_to = date_to or utc_today()
+    date_from = date_from or date_to - timedelta(days=29)
+
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from позже date_to")
+    if (date_to - date_from).days >= MAX_STATS_DAYS:
+        raise HTTPException(
+            status_code=400, detail=f"Период больше {MAX_STATS_DAYS} дней"
+        )
+
+    # Приращения, ещё не перенесённые в quality_rollups (fold_quality_rollups),
+    # добавляются к счётчикам: их немного, не больше чем за период переноса
+    counters = union_all(
+        *(
+            select(model.day, model.metric, model.severity, model.value, model.tasks)
+            .where(model.day.between(date_from, date_to))
+            for model in (QualityRollup, QualityRollupDelta)
+        )
+    ).subquery()
+    rows = (
+        await db.execute(
+            select(
+                counters.c.day,
+                counters.c.metric,
+                counters.c.severity,
+                func.sum(counters.c.value).label("value"),
+                # sum(bigint) в PostgreSQL - numeric
+                cast(func.sum(counters.c.tasks), BigInteger).label("tasks"),
             )
+            .group_by(counters.c.day, counters.c.metric, counters.c.severity)
+            .order_by(counters.c.day)
+        )
+    ).all()
 
-    # Кэшируем результат в Redis на 5 минут (300 секунд)
-    cache_data = {
-        "status": task.status.value,  # ✅ Преобразуем Enum в строку
-        "results": task.results,
-    }
-    await redis_client_async.setex(task_id, 300, json.dumps(cache_data))
+    days: Dict[date, QualityDay] = {}
+    for row in rows:
+        day = days.setdefault(
+            row.day,
+            QualityDay(day=row.day, tasks=0, bugs={}, vulnerabilities={}, code_smells={}),
+        )
+        if row.metric == COVERAGE_METRIC:
+            day.tasks = row.tasks
+            day.average_coverage = round(row.value / row.tasks, 2) if row.tasks else None
+        elif row.metric in SEVERITY_METRICS:
+            getattr(day, row.metric)[row.severity] = int(row.value)
 
-    return ResultsResponse(status=task.status, results=results)
+    return QualityStatsResponse(items=list(days.values()))
 
 
 @router.delete("/clear-database", response_model=dict)
@@ -130,8 +496,9 @@ async def clear_database(db: AsyncSession = Depends(get_db)):
 
         for task_id in task_ids:
             delete_from_minio(task_id)
+            delete_from_minio(report_object(task_id))
 
-        await db.execute(text("TRUNCATE TABLE task_results RESTART IDENTITY CASCADE"))
+        await db.execute(text("TRUNCATE TABLE task_results, quality_rollups, quality_rollup_deltas, task_outbox RESTART IDENTITY CASCADE"))
         await db.commit()
 
         return {"message": "База данных и файлы MinIO успешно очищены"}
@@ -1,5 +1,6 @@
+from datetime import date, datetime
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from app.models.task_result import TaskStatusEnum
 
 
@@ -7,13 +8,90 @@ class UploadResponse(BaseModel):
     task_id: str
 
 
+class ReportRef(BaseModel):
+    findings: int
+    size: int
+
+
 class TestResults(BaseModel):
     overall_coverage: float
     bugs: Dict[str, int]
     code_smells: Dict[str, int]
     vulnerabilities: Dict[str, int]
+    # Подробный отчёт: GET /results/{task_id}/findings
+    report: Optional[ReportRef] = None
 
 
 class ResultsResponse(BaseModel):
     status: TaskStatusEnum
     results: Optional[TestResults] = None
+
+
+class Finding(BaseModel):
+    analyzer: str
+    kind: Optional[str] = None
+    file: Optional[str] = None
+    line: Optional[int] = None
+    severity: Optional[str] = None
+    rule: Optional[str] = None
+    message: Optional[str] = None
+
+
+class FindingsResponse(BaseModel):
+    items: List[Finding]
+    next_cursor: Optional[str] = None
+
+
+class TaskSummary(BaseModel):
+    task_id: str
+    status: TaskStatusEnum
+    size: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class TaskListResponse(BaseModel):
+    items: List[TaskSummary]
+    next_cursor: Optional[str] = None
+
+
+class ArchiveEntry(BaseModel):
+    name: str
+    size: int
+    compressed_size: int
+    crc: int
+
+
+class ArchiveManifestResponse(BaseModel):
+    files: int
+    uncompressed_size: int
+    compressed_size: int
+    entries: List[ArchiveEntry]
+
+
+class QualityDay(BaseModel):
+    day: date
+    tasks: int
+    average_coverage: Optional[float] = None
+    bugs: Dict[str, int]
+    vulnerabilities: Dict[str, int]
+    code_smells: Dict[str, int]
+
+
+class QualityStatsResponse(BaseModel):
+    items: List[QualityDay]
+
+
+class MemoryStat(BaseModel):
+    location: str
+    size: int
+    count: int
+    size_diff: int = 0
+    count_diff: int = 0
+
+
+class MemorySnapshotResponse(BaseModel):
+    snapshot_id: int
+    traced: int
+    peak: int
+    top: List[MemoryStat]
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -6,6 +8,22 @@ class MinioSettings(BaseSettings):
     MINIO_ROOT_USER: str = "minioadmin"
     MINIO_ROOT_PASSWORD: str = "minioadminpassword"
     MINIO_BUCKET_NAME: str = "zip-archives"
+    # Чтение архивов по диапазонам: размер блока (байт) и число блоков в кэше
+    MINIO_RANGE_BLOCK_SIZE: int = 256 * 1024
+    MINIO_RANGE_CACHE_BLOCKS: int = 64
+    # Уровень сжатия zstd подробных отчётов анализаторов (1-22)
+    MINIO_REPORT_ZSTD_LEVEL: int = 3
+    # Хранение архивов: object - объект целиком, chunked - чанки с дедупликацией
+    MINIO_STORAGE_MODE: str = "object"
+    # Размеры чанков (байт): минимальный, средний и максимальный
+    MINIO_CHUNK_MIN_SIZE: int = 16 * 1024
+    MINIO_CHUNK_AVG_SIZE: int = 64 * 1024
+    MINIO_CHUNK_MAX_SIZE: int = 256 * 1024
+    # Параллельных запросов к MinIO при записи чанков одного архива
+    MINIO_CHUNK_UPLOAD_CONCURRENCY: int = 16
+    # Чанки без ссылок удаляются не раньше этого срока (ч), период сборки мусора (сек)
+    MINIO_CHUNK_GC_GRACE_HOURS: float = 6.0
+    MINIO_CHUNK_GC_INTERVAL: int = 3600
 
     model_config = SettingsConfigDict(
         env_file=".env", case_sensitive=False, extra="allow"
@@ -34,7 +52,146 @@ class DBSettings(BaseSettings):
 
 
 class RedisSettings(BaseSettings):
-    REDIS_URL: str = "redis://localhost:6379/0"
+    # Redis кэша (не брокер Celery): standalone | sentinel | cluster
+    REDIS_MODE: str = "standalone"
+    # standalone - адрес сервера, cluster - адрес любого узла кластера.
+    # По умолчанию отдельная база: брокер Celery использует базу 0
+    REDIS_URL: str = "redis://localhost:6379/1"
+    # sentinel - узлы sentinel через запятую (host:port), имя мастера и база
+    REDIS_SENTINELS: str = "localhost:26379"
+    REDIS_SENTINEL_MASTER: str = "mymaster"
+    REDIS_SENTINEL_DB: int = 1
+    REDIS_PASSWORD: Optional[str] = None
+    # Префикс всех ключей кэша
+    REDIS_KEY_PREFIX: str = "zipv:"
+
+    model_config = SettingsConfigDict(
+        env_file=".env", case_sensitive=False, extra="allow"
+    )
+
+
+class WorkerSettings(BaseSettings):
+    # Модель исполнения воркера: eventlet | gevent | threads | prefork | solo.
+    # Должна совпадать с флагом -P в команде запуска celery.
+    WORKER_POOL: str = "eventlet"
+    # Пустое значение - берётся значение по умолчанию для выбранной модели
+    WORKER_CONCURRENCY: Optional[int] = None
+    # Количество процессов для CPU-bound этапов (хэширование, разбор ZIP)
+    CPU_POOL_SIZE: Optional[int] = None
+    # Запись статусов задач в БД: 1 - сразу, больше 1 - пачками указанного размера
+    STATUS_BATCH_SIZE: int = 1
+    # Максимальное время (сек) нахождения статуса в буфере до записи в БД
+    STATUS_FLUSH_INTERVAL: float = 1.0
+    # Время аренды задачи воркером (сек); продлевается между этапами обработки
+    LEASE_TTL: int = 120
+    # Период запуска поиска задач с истёкшей арендой (сек) и размер пачки
+    REAPER_INTERVAL: int = 60
+    REAPER_BATCH_SIZE: int = 500
+    # Перенос приращений показателей качества в quality_rollups: период (сек) и размер пачки
+    ROLLUP_FOLD_INTERVAL: int = 60
+    ROLLUP_FOLD_BATCH_SIZE: int = 5000
+
+    model_config = SettingsConfigDict(
+        env_file=".env", case_sensitive=False, extra="allow"
+    )
+
+
+class RetentionSettings(BaseSettings):
+    # Удаление данных включается явно: по умолчанию архивы и результаты хранятся бессрочно.
+    # Через сколько часов после SUCCESS удалять архив из MinIO (пусто - не удалять)
+    ARCHIVE_RETENTION_HOURS: Optional[int] = None
+    # Через сколько дней удалять завершённые задачи (SUCCESS/FAILED) вместе с архивом
+    RESULT_RETENTION_DAYS: Optional[int] = None
+    # Период запуска очистки (сек), размер пачки и максимум пачек за один запуск
+    RETENTION_INTERVAL: int = 300
+    RETENTION_BATCH_SIZE: int = 500
+    RETENTION_MAX_BATCHES: int = 20
+
+    model_config = SettingsConfigDict(
+        env_file=".env", case_sensitive=False, extra="allow"
+    )
+
+
+class AdmissionSettings(BaseSettings):
+    ADMISSION_ENABLED: bool = True
+    # Загрузки отклоняются, если очередь не успеет разобраться за допустимое ожидание (сек).
+    # Пропускная способность - частота завершения задач воркерами за окно (сек),
+    # но не ниже ADMISSION_WORKER_THROUGHPUT (задач/сек): оценка для простоя и старта
+    ADMISSION_MAX_QUEUE_WAIT: float = 600.0
+    ADMISSION_THROUGHPUT_WINDOW: int = 300
+    ADMISSION_WORKER_THROUGHPUT: float = 1.0
+    # Таймаут запроса длины очереди к брокеру (сек), при ошибке очередь брокера не учитывается
+    ADMISSION_BROKER_TIMEOUT: float = 1.0
+    # Максимум одновременно принимаемых загрузок на все экземпляры API
+    ADMISSION_MAX_IN_FLIGHT_UPLOADS: int = 50
+    # Token bucket на клиента: загрузок в секунду и размер всплеска
+    ADMISSION_CLIENT_RATE: float = 0.5
+    ADMISSION_CLIENT_BURST: int = 10
+
+    model_config = SettingsConfigDict(
+        env_file=".env", case_sensitive=False, extra="allow"
+    )
+
+
+class AnalyzerSettings(BaseSettings):
+    # Адаптивный лимит одновременных запросов к каждому внешнему анализатору (AIMD),
+    # общий для всех воркеров через Redis
+    ANALYZER_LIMITS_ENABLED: bool = False
+    # Начальный лимит; по умолчанию - конкурентность воркера (WORKER_CONCURRENCY)
+    ANALYZER_INITIAL_LIMIT: Optional[float] = None
+    ANALYZER_MIN_LIMIT: float = 1.0
+    ANALYZER_MAX_LIMIT: float = 64.0
+    # Уменьшение лимита при перегрузке (таймаут, ответ 429/503, медленный ответ),
+    # не чаще раза в период (сек). Прочие ошибки лимит не меняют
+    ANALYZER_DECREASE_FACTOR: float = 0.7
+    ANALYZER_DECREASE_COOLDOWN: float = 5.0
+    # Ответ дольше этого времени (сек) считается признаком перегрузки анализатора
+    ANALYZER_LATENCY_TARGET: float = 15.0
+    # Сколько ждать свободного слота (сек) до ошибки и повторной попытки задачи
+    ANALYZER_ACQUIRE_TIMEOUT: float = 30.0
+    # Слот освобождается автоматически, если воркер упал посреди запроса (сек)
+    ANALYZER_PERMIT_TTL: int = 120
+    # Дублирующий (hedged) запрос, если ответа нет дольше перцентиля задержки
+    ANALYZER_HEDGE_ENABLED: bool = False
+    ANALYZER_HEDGE_QUANTILE: float = 0.95
+    # Минимум наблюдений задержки, после которого включается дублирование
+    ANALYZER_HEDGE_MIN_SAMPLES: int = 20
+
+    model_config = SettingsConfigDict(
+        env_file=".env", case_sensitive=False, extra="allow"
+    )
+
+
+class OutboxSettings(BaseSettings):
+    # Размер пачки сообщений, публикуемых в брокер за одну транзакцию
+    OUTBOX_BATCH_SIZE: int = 500
+    # Пауза (сек) между опросами таблицы, когда новых сообщений нет
+    OUTBOX_POLL_INTERVAL: float = 0.5
+    # Через сколько часов удалять опубликованные сообщения (пусто - не удалять)
+    OUTBOX_SENT_RETENTION_HOURS: Optional[int] = 24
+
+    model_config = SettingsConfigDict(
+        env_file=".env", case_sensitive=False, extra="allow"
+    )
+
+
+class ProfilingSettings(BaseSettings):
+    # Профилирование по запросу (заголовок X-Profile-Token, опция задачи profile)
+    # и эндпоинты /debug/memory. Без PROFILING_TOKEN профилирование запросов API
+    # и /debug/memory недоступны (403)
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: Optional[str] = None
+    # Каталог файлов профилей (collapsed stacks для flamegraph)
+    PROFILING_DIR: str = "/tmp/zip_verifier_profiles"
+    # Период сэмплирования стеков (сек) и предельная длительность профиля (сек)
+    PROFILING_INTERVAL: float = 0.005
+    PROFILING_MAX_DURATION: float = 600.0
+    # Глубина стека, сохраняемая tracemalloc для каждого выделения памяти
+    PROFILING_TRACEMALLOC_FRAMES: int = 10
+    # Пороги журнала медленных этапов (сек), пусто - не журналировать
+    SLOW_HASH_SECONDS: Optional[float] = 2.0
+    SLOW_MINIO_SECONDS: Optional[float] = 5.0
+    SLOW_ANALYZER_SECONDS: Optional[float] = 30.0
 
     model_config = SettingsConfigDict(
         env_file=".env", case_sensitive=False, extra="allow"
@@ -45,3 +202,9 @@ minio_settings = MinioSettings()
 celery_settings = CelerySettings()
 db_settings = DBSettings()
 redis_settings = RedisSettings()
+worker_settings = WorkerSettings()
+retention_settings = RetentionSettings()
+admission_settings = AdmissionSettings()
+analyzer_settings = AnalyzerSettings()
+outbox_settings = OutboxSettings()
+profiling_settings = ProfilingSettings()
@@ -1,30 +1,136 @@
+"""
+Подключения к PostgreSQL и Redis.
+
+Движки и клиенты создаются при первом обращении, а не при импорте: API и воркер
+стартуют быстрее, а в prefork каждый дочерний процесс Celery создаёт свои
+подключения вместо унаследованных от родителя. Закрываются в dispose_resources().
+
+Redis кэша и брокер Celery - разные подключения: кэш может работать через
+Sentinel или Redis Cluster (REDIS_MODE), брокер всегда standalone.
+"""
+
+import logging
+from functools import lru_cache
+from typing import List, Tuple, Union
+
 import redis.asyncio as redis_async
 import redis as redis_sync
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
-from app.config import db_settings, redis_settings
-
-# Асинхронный движок для FastAPI
-async_engine = create_async_engine(db_settings.DATABASE_URL)
-async_session_maker = async_sessionmaker(
-    bind=async_engine, class_=AsyncSession, expire_on_commit=False
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
 )
+from sqlalchemy import Engine, create_engine
+from app.config import celery_settings, db_settings, redis_settings
 
-# Синхронный движок для Celery
-sync_engine = create_engine(db_settings.DATABASE_URL.replace("+asyncpg", ""))
-SessionLocal = sessionmaker(bind=sync_engine)
 
-# Подключение к Redis
-redis_client_async = redis_async.Redis.from_url(
-    redis_settings.REDIS_URL, decode_responses=True
-)
-redis_client_sync = redis_sync.Redis.from_url(
-    redis_settings.REDIS_URL, decode_responses=True
-)
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    """Асинхронный движок для FastAPI"""
+    return create_async_engine(db_settings.DATABASE_URL)
+
+
+@lru_cache
+def get_async_session_maker() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        bind=get_async_engine(), class_=AsyncSession, expire_on_commit=False
+    )
+
+
+@lru_cache
+def get_sync_engine() -> Engine:
+    """Синхронный движок для Celery"""
+    return create_engine(db_settings.DATABASE_URL.replace("+asyncpg", ""))
+
+
+logger = logging.getLogger(__name__)
+
+REDIS_MODES = ("standalone", "sentinel", "cluster")
+
+
+def parse_nodes(nodes: str) -> List[Tuple[str, int]]:
+    """Разбирает список узлов вида "host:port,host:port"."""
+    result = []
+    for node in filter(None, (node.strip() for node in nodes.split(","))):
+        host, _, port = node.rpartition(":")
+        result.append((host, int(port)))
+    return result
+
+
+def create_redis(client_module) -> Union[redis_sync.Redis, redis_sync.RedisCluster]:
+    """
+    Создаёт клиент Redis кэша в режиме REDIS_MODE.
+
+    Args:
+        client_module: redis (синхронный клиент) или redis.asyncio.
+    """
+    mode = redis_settings.REDIS_MODE
+    if mode not in REDIS_MODES:
+        raise ValueError(f"Неизвестный режим Redis: {mode}")
+
+    options = {"decode_responses": True}
+    if redis_settings.REDIS_PASSWORD:
+        options["password"] = redis_settings.REDIS_PASSWORD
+
+    if mode == "cluster":
+        return client_module.RedisCluster.from_url(redis_settings.REDIS_URL, **options)
+
+    if mode == "sentinel":
+        sentinel = client_module.Sentinel(
+            parse_nodes(redis_settings.REDIS_SENTINELS), **options
+        )
+        return sentinel.master_for(
+            redis_settings.REDIS_SENTINEL_MASTER,
+            db=redis_settings.REDIS_SENTINEL_DB,
+            **options,
+        )
+
+    if redis_settings.REDIS_URL == celery_settings.CELERY_BROKER_URL:
+        logger.warning(
+            "Кэш и брокер Celery используют одну базу Redis, задайте отдельный REDIS_URL"
+        )
+    return client_module.Redis.from_url(redis_settings.REDIS_URL, **options)
+
+
+@lru_cache
+def get_redis_async() -> Union[redis_async.Redis, redis_async.RedisCluster]:
+    """Подключение к Redis (кэш) для FastAPI"""
+    return create_redis(redis_async)
+
+
+@lru_cache
+def get_redis_sync() -> Union[redis_sync.Redis, redis_sync.RedisCluster]:
+    """Подключение к Redis (кэш) для Celery"""
+    return create_redis(redis_sync)
+
+
+@lru_cache
+def get_broker_async() -> redis_async.Redis:
+    """Подключение к брокеру Celery (для контроля длины очереди)"""
+    return redis_async.Redis.from_url(
+        celery_settings.CELERY_BROKER_URL, decode_responses=True
+    )
 
 
 async def get_db():
     """Функция получения асинхронной сессии (используется в FastAPI)"""
-    async with async_session_maker() as session:
+    async with get_async_session_maker()() as session:
         yield session
+
+
+async def dispose_resources():
+    """Закрывает созданные подключения (вызывается при остановке FastAPI)"""
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    for getter in (get_redis_async, get_broker_async):
+        if getter.cache_info().currsize:
+            await getter().aclose()
+
+    for getter in (
+        get_async_engine,
+        get_async_session_maker,
+        get_redis_async,
+        get_broker_async,
+    ):
+        getter.cache_clear()
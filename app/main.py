@@ -1,8 +1,25 @@
 # uvicorn app.main:app --reload
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from app.api.debug import debug_router, profile_requests
 from app.api.routers import router
+from app.config import profiling_settings
+from app.db.session import dispose_resources
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Подключения создаются при первом обращении, здесь только закрываются
+    yield
+    await dispose_resources()
 
-app = FastAPI(title="ZIP")
+
+app = FastAPI(title="ZIP", lifespan=lifespan)
 
 app.include_router(router)
+app.include_router(debug_router)
+
+# Без профилирования middleware не подключается и не добавляет накладных расходов
+if profiling_settings.PROFILING_ENABLED:
+    app.middleware("http")(profile_requests)
@@ -0,0 +1,39 @@
+from sqlalchemy import BigInteger, DateTime, Index, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+from datetime import datetime
+from typing import Optional
+
+
+class ChunkRef(Base):
+    """
+    Счётчик ссылок манифестов архивов на чанк (MINIO_STORAGE_MODE=chunked).
+
+    refs = 0 - чанк без ссылок, zero_since - с какого момента: сборка мусора
+    удаляет такие чанки после MINIO_CHUNK_GC_GRACE_HOURS.
+    """
+
+    __tablename__ = "chunk_refs"
+
+    digest: Mapped[str] = mapped_column(String, primary_key=True)
+    refs: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    zero_since: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    __table_args__ = (
+        # Кандидаты на удаление - малая доля таблицы, частичный индекс
+        Index("ix_chunk_refs_unreferenced", "zero_since", postgresql_where=refs == 0),
+    )
+
+
+class ChunkManifest(Base):
+    """
+    Манифесты, учтённые в chunk_refs, и SHA-256 их содержимого: манифест
+    учитывается один раз, а копия удалённого сверяется с учтённой версией.
+    """
+
+    __tablename__ = "chunk_manifests"
+
+    task_id: Mapped[str] = mapped_column(String, primary_key=True)
+    digest: Mapped[str] = mapped_column(String, nullable=False)
@@ -0,0 +1,45 @@
+from sqlalchemy import BigInteger, Date, Double, Identity, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+from datetime import date
+
+# Метрики результатов проверки с разбивкой по критичности
+SEVERITY_METRICS = ("bugs", "vulnerabilities", "code_smells")
+COVERAGE_METRIC = "coverage"
+
+
+class QualityRollup(Base):
+    """
+    Предагрегированные показатели качества за день (UTC).
+
+    Для metric из SEVERITY_METRICS value - сумма по критичности severity,
+    для COVERAGE_METRIC (severity = "") - сумма overall_coverage.
+    tasks - количество успешно проверенных архивов, вошедших в строку.
+    """
+
+    __tablename__ = "quality_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    metric: Mapped[str] = mapped_column(String, primary_key=True)
+    severity: Mapped[str] = mapped_column(String, primary_key=True)
+    value: Mapped[float] = mapped_column(Double, nullable=False)
+    tasks: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
+class QualityRollupDelta(Base):
+    """
+    Приращения показателей, ещё не перенесённые в quality_rollups.
+
+    Воркер только добавляет строки (в транзакции с результатами проверки),
+    поэтому успешные задачи не ждут друг друга на общих строках дня.
+    fold_rollups периодически переносит приращения в quality_rollups.
+    """
+
+    __tablename__ = "quality_rollup_deltas"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    metric: Mapped[str] = mapped_column(String, nullable=False)
+    severity: Mapped[str] = mapped_column(String, nullable=False)
+    value: Mapped[float] = mapped_column(Double, nullable=False)
+    tasks: Mapped[int] = mapped_column(BigInteger, nullable=False)
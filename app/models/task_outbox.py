@@ -0,0 +1,39 @@
+from sqlalchemy import BigInteger, DateTime, Identity, Index, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+from datetime import datetime
+from typing import Optional
+
+PROCESS_ZIP_TASK = "process_zip_task"
+
+
+class TaskOutbox(Base):
+    """
+    Сообщения для брокера Celery (transactional outbox).
+
+    Строка записывается в одной транзакции с изменением задачи и публикуется
+    в брокер отдельным процессом (app.relay), после чего помечается sent_at.
+    """
+
+    __tablename__ = "task_outbox"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    task_id: Mapped[str] = mapped_column(String, nullable=False)
+    task_name: Mapped[str] = mapped_column(
+        String, default=PROCESS_ZIP_TASK, nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    sent_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    __table_args__ = (
+        # Неопубликованные сообщения - малая доля таблицы, частичный индекс
+        Index("ix_task_outbox_pending", "id", postgresql_where=sent_at.is_(None)),
+        # Очистка опубликованных сообщений по времени публикации (purge_outbox)
+        Index(
+            "ix_task_outbox_sent_at", "sent_at", postgresql_where=sent_at.isnot(None)
+        ),
+    )
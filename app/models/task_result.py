@@ -1,7 +1,8 @@
-from sqlalchemy import Column, String, Enum
+from sqlalchemy import BigInteger, DateTime, Enum, ForeignKey, Index, String, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
+from datetime import datetime
 from typing import Optional
 import enum
 
@@ -13,11 +14,88 @@ class TaskStatusEnum(enum.Enum):
     FAILED = "FAILED"
 
 
+NON_TERMINAL_STATUSES = (TaskStatusEnum.PENDING, TaskStatusEnum.IN_PROGRESS)
+TERMINAL_STATUSES = (TaskStatusEnum.SUCCESS, TaskStatusEnum.FAILED)
+
+
 class TaskResult(Base):
+    """
+    Статус задачи - узкая часто обновляемая строка.
+
+    Таблица секционирована по хэшу task_id (секции task_results_p0..p15
+    создаются миграцией): обновления и VACUUM распределяются по секциям.
+    """
+
     __tablename__ = "task_results"
 
-    task_id: Mapped[str] = mapped_column(String, primary_key=True, index=True)
+    task_id: Mapped[str] = mapped_column(String, primary_key=True)
     status: Mapped[TaskStatusEnum] = mapped_column(
         Enum(TaskStatusEnum), default=TaskStatusEnum.PENDING, nullable=False
     )
-    results: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    # Размер архива в байтах
+    size: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+    # Аренда задачи воркером: владелец и время, до которого она действительна
+    lease_owner: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # Время удаления архива из MinIO политикой хранения
+    archive_deleted_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    __table_args__ = (
+        # Постраничный список всех задач (сортировка по времени изменения)
+        Index("ix_task_results_updated_at", "updated_at", "task_id"),
+        # Список задач с фильтром по статусу ("упавшие за последний час")
+        Index("ix_task_results_status_updated_at", "status", "updated_at", "task_id"),
+        # Незавершённые задачи - малая доля таблицы, частичный индекс
+        Index(
+            "ix_task_results_in_flight",
+            "updated_at",
+            "task_id",
+            postgresql_where=status.in_(NON_TERMINAL_STATUSES),
+        ),
+        # Поиск задач с истёкшей арендой
+        Index(
+            "ix_task_results_lease_expires_at",
+            "lease_expires_at",
+            postgresql_where=status == TaskStatusEnum.IN_PROGRESS,
+        ),
+        # Успешные задачи, архив которых ещё хранится в MinIO
+        Index(
+            "ix_task_results_archive_retention",
+            "updated_at",
+            postgresql_where=(status == TaskStatusEnum.SUCCESS)
+            & archive_deleted_at.is_(None),
+        ),
+        {"postgresql_partition_by": "HASH (task_id)"},
+    )
+
+
+class TaskReport(Base):
+    """
+    Результаты проверки - записываются один раз при успешном завершении задачи
+    и больше не меняются, поэтому не раздувают таблицу статусов при обновлениях.
+    """
+
+    __tablename__ = "task_reports"
+
+    task_id: Mapped[str] = mapped_column(
+        String, ForeignKey("task_results.task_id", ondelete="CASCADE"), primary_key=True
+    )
+    results: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    __table_args__ = ({"postgresql_partition_by": "HASH (task_id)"},)
@@ -0,0 +1,30 @@
+# python -m app.relay
+"""
+Процесс публикации задач из таблицы task_outbox в брокер Celery.
+Можно запускать несколько экземпляров.
+"""
+
+import logging
+import signal
+import threading
+
+from app.config import outbox_settings
+from app.db.session import get_sync_engine
+from app.services.outbox import run_relay
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    run_relay(get_sync_engine(), outbox_settings, stop)
+    get_sync_engine().dispose()
+
+
+if __name__ == "__main__":
+    main()
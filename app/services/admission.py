@@ -0,0 +1,265 @@
+"""
+Контроль допуска загрузок (admission control).
+
+Загрузка отклоняется с 429 и заголовком Retry-After, если:
+    - очередь zip_queue не успеет разобраться за допустимое время ожидания;
+    - одновременно принимается слишком много загрузок;
+    - клиент исчерпал свой token bucket.
+
+Состояние хранится в Redis и общее для всех экземпляров API.
+
+Пропускная способность воркеров - наблюдаемая частота завершения задач
+(воркеры отмечают каждое выполнение process_zip_task, record_completion)
+за ADMISSION_THROUGHPUT_WINDOW секунд, но не ниже ADMISSION_WORKER_THROUGHPUT:
+при простое воркеров частота завершения ничего не говорит об их возможностях.
+
+Длина очереди - сообщения в брокере плюс ещё не опубликованные в task_outbox:
+при отставании relay задачи копятся в outbox. Загрузка от брокера не зависит:
+если брокер недоступен, учитывается только outbox (fail open).
+"""
+
+import asyncio
+import logging
+import math
+import time
+import uuid
+from typing import Optional, Union
+
+import redis as redis_sync
+import redis.asyncio as redis_async
+from redis.exceptions import RedisError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import AdmissionSettings
+from app.models.task_outbox import TaskOutbox
+from app.services.cache import cache_key
+from app.services.dispatch import ZIP_QUEUE
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT_KEY = cache_key("admission:in_flight")
+BUCKET_KEY_PREFIX = cache_key("admission:bucket:")
+# Загрузки старше этого времени (сек) считаются завершёнными: защищает
+# счётчик от утечки, если экземпляр API упал посреди загрузки
+IN_FLIGHT_TTL = 300
+COMPLETIONS_KEY = cache_key("admission:completions")
+# Завершения задач считаются по интервалам этой длины (сек)
+COMPLETION_BUCKET = 10
+# Неопубликованные сообщения outbox считаются не дальше этого числа:
+# подсчёт по частичному индексу остаётся дешёвым при большом отставании relay
+OUTBOX_DEPTH_LIMIT = 10000
+
+# Занимает слот одновременных загрузок и возвращает число занятых слотов.
+# Скрипт вместо MULTI: транзакции недоступны в конвейерах Redis Cluster,
+# а скрипт над одним ключом атомарен в любом режиме.
+IN_FLIGHT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - ttl)
+redis.call('ZADD', KEYS[1], now, ARGV[2])
+redis.call('EXPIRE', KEYS[1], ttl)
+return redis.call('ZCARD', KEYS[1])
+"""
+
+# Token bucket: пополнение по времени сервера Redis, чтобы часы экземпляров API
+# не влияли на результат. Возвращает время ожидания до следующего токена (сек).
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+# Отмечает завершение задачи: счётчик текущего интервала в хэше, интервалы
+# старше окна удаляются. Время - сервера Redis, как и при подсчёте частоты.
+RECORD_COMPLETION_SCRIPT = """
+local now = tonumber(redis.call('TIME')[1])
+local bucket = now - now % tonumber(ARGV[1])
+local oldest = bucket - tonumber(ARGV[2])
+redis.call('HINCRBY', KEYS[1], bucket, 1)
+for _, field in ipairs(redis.call('HKEYS', KEYS[1])) do
+    if tonumber(field) < oldest then
+        redis.call('HDEL', KEYS[1], field)
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# Число задач, завершённых за последние ARGV[1] секунд
+COMPLETIONS_SCRIPT = """
+local now = tonumber(redis.call('TIME')[1])
+local oldest = now - tonumber(ARGV[1])
+local total = 0
+local counts = redis.call('HGETALL', KEYS[1])
+for index = 1, #counts, 2 do
+    if tonumber(counts[index]) >= oldest then
+        total = total + tonumber(counts[index + 1])
+    end
+end
+return total
+"""
+
+
+def record_completion(
+    redis_client: Union[redis_sync.Redis, redis_sync.RedisCluster], window: int
+) -> None:
+    """Отмечает завершение задачи воркером для оценки пропускной способности."""
+    redis_client.eval(
+        RECORD_COMPLETION_SCRIPT, 1, COMPLETIONS_KEY, COMPLETION_BUCKET, window
+    )
+
+
+class AdmissionRejected(Exception):
+    """Загрузка отклонена, повторить не раньше чем через retry_after секунд."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def queue_retry_after(depth: int, throughput: float, max_wait: float) -> Optional[int]:
+    """
+    Вычисляет Retry-After для переполненной очереди.
+
+    Args:
+        depth (int): Текущая длина очереди.
+        throughput (float): Пропускная способность воркеров (задач/сек).
+        max_wait (float): Допустимое время ожидания в очереди (сек).
+
+    Returns:
+        Optional[int]: Через сколько секунд очередь разберётся до допустимой
+            длины, либо None, если загрузку можно принять.
+    """
+    capacity = throughput * max_wait
+    if depth < capacity:
+        return None
+    return max(1, math.ceil((depth - capacity + 1) / throughput))
+
+
+class AdmissionController:
+    """Решение о допуске загрузки на основе очереди брокера и лимитов клиента."""
+
+    def __init__(
+        self,
+        redis_client: redis_async.Redis,
+        broker_client: redis_async.Redis,
+        settings: AdmissionSettings,
+        session_maker: Optional[async_sessionmaker[AsyncSession]] = None,
+    ):
+        self.redis = redis_client
+        self.broker = broker_client
+        self.settings = settings
+        self.session_maker = session_maker
+        self._token_bucket = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._occupy_slot = redis_client.register_script(IN_FLIGHT_SCRIPT)
+        self._completions = redis_client.register_script(COMPLETIONS_SCRIPT)
+
+    async def admit(self, client_id: str) -> str:
+        """
+        Допускает загрузку и занимает слот одновременных загрузок.
+        После обработки загрузки слот нужно освободить через release().
+
+        Args:
+            client_id (str): Идентификатор клиента для token bucket.
+
+        Returns:
+            str: Идентификатор занятого слота.
+
+        Raises:
+            AdmissionRejected: Если загрузку нужно отклонить.
+        """
+        depth = await self.queue_depth()
+        retry_after = queue_retry_after(
+            depth,
+            await self.throughput(),
+            self.settings.ADMISSION_MAX_QUEUE_WAIT,
+        )
+        if retry_after is not None:
+            raise AdmissionRejected("Очередь обработки переполнена", retry_after)
+
+        slot = uuid.uuid4().hex
+        in_flight = await self._occupy_slot(
+            keys=[IN_FLIGHT_KEY], args=[time.time(), slot, IN_FLIGHT_TTL]
+        )
+
+        if in_flight > self.settings.ADMISSION_MAX_IN_FLIGHT_UPLOADS:
+            await self.release(slot)
+            raise AdmissionRejected("Слишком много одновременных загрузок", 1)
+
+        try:
+            wait = float(
+                await self._token_bucket(
+                    keys=[BUCKET_KEY_PREFIX + client_id],
+                    args=[
+                        self.settings.ADMISSION_CLIENT_RATE,
+                        self.settings.ADMISSION_CLIENT_BURST,
+                    ],
+                )
+            )
+        except Exception:
+            await self.release(slot)
+            raise
+
+        if wait > 0:
+            await self.release(slot)
+            raise AdmissionRejected("Превышен лимит загрузок клиента", math.ceil(wait))
+
+        return slot
+
+    async def throughput(self) -> float:
+        """
+        Пропускная способность воркеров (задач/сек): частота завершения задач
+        за ADMISSION_THROUGHPUT_WINDOW, но не ниже ADMISSION_WORKER_THROUGHPUT.
+        """
+        window = self.settings.ADMISSION_THROUGHPUT_WINDOW
+        completed = int(await self._completions(keys=[COMPLETIONS_KEY], args=[window]))
+        return max(self.settings.ADMISSION_WORKER_THROUGHPUT, completed / window)
+
+    async def queue_depth(self) -> int:
+        """Задачи, ожидающие обработки: в очереди брокера и в task_outbox."""
+        depth = await self.outbox_depth()
+        try:
+            # Очередь брокера Celery (redis transport хранит её списком)
+            depth += await asyncio.wait_for(
+                self.broker.llen(ZIP_QUEUE), self.settings.ADMISSION_BROKER_TIMEOUT
+            )
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"Длина очереди брокера недоступна: {e!r}")
+        return depth
+
+    async def outbox_depth(self) -> int:
+        """Неопубликованные сообщения outbox (не больше OUTBOX_DEPTH_LIMIT)."""
+        if self.session_maker is None:
+            return 0
+        pending = (
+            select(TaskOutbox.id)
+            .where(TaskOutbox.sent_at.is_(None))
+            .limit(OUTBOX_DEPTH_LIMIT)
+            .subquery()
+        )
+        async with self.session_maker() as session:
+            return await session.scalar(select(func.count()).select_from(pending))
+
+    async def release(self, slot: str) -> None:
+        """Освобождает слот одновременных загрузок."""
+        await self.redis.zrem(IN_FLIGHT_KEY, slot)
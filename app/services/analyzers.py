@@ -0,0 +1,301 @@
+"""
+Адаптивный лимит одновременных запросов к внешним анализаторам.
+
+Для каждого анализатора в Redis хранится лимит одновременных запросов и
+занятые слоты, общие для всех воркеров. Лимит меняется по AIMD: каждый
+успешный быстрый ответ увеличивает его на 1/limit (примерно +1 за "окно"
+из limit запросов), признак перегрузки - таймаут, ответ 429/503 или ответ
+дольше ANALYZER_LATENCY_TARGET - уменьшает в ANALYZER_DECREASE_FACTOR раз,
+но не чаще раза в ANALYZER_DECREASE_COOLDOWN секунд, чтобы пачка
+одновременных ошибок не обрушила лимит до минимума. Прочие ошибки
+(некорректный ответ, сбой анализатора) лимит не меняют: они не говорят
+о перегрузке, а уменьшение лимита только задержало бы остальные задачи.
+
+Начальный лимит - ANALYZER_INITIAL_LIMIT или, если он не задан,
+конкурентность воркера: лимит не ниже числа задач, которые воркер
+выполняет одновременно, не тормозит его до первой перегрузки.
+
+Опционально запрос дублируется (hedging), если ответа нет дольше
+ANALYZER_HEDGE_QUANTILE перцентиля задержки. Дубль отправляется, только
+если у анализатора есть свободный слот, поэтому лимит не превышается.
+
+При недоступности Redis запросы выполняются без лимита.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Optional, TypeVar
+
+import httpx
+import redis
+
+from app.config import AnalyzerSettings
+from app.services.cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Окно наблюдений задержки для перцентиля (в каждом процессе воркера своё)
+LATENCY_WINDOW = 200
+
+# Ответы анализатора, означающие перегрузку
+CONGESTION_STATUSES = frozenset({429, 503})
+
+# Изменение лимита при освобождении слота (аргумент RELEASE_SCRIPT)
+INCREASE, HOLD, DECREASE = 1, 0, -1
+
+# Занимает слот, если занятых меньше текущего лимита. Возвращает 1 или 0.
+ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local ttl = tonumber(ARGV[2])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - ttl)
+local limit = tonumber(redis.call('HGET', KEYS[1], 'limit')) or tonumber(ARGV[3])
+if redis.call('ZCARD', KEYS[2]) >= math.floor(limit) then
+    return 0
+end
+
+redis.call('ZADD', KEYS[2], now, ARGV[1])
+redis.call('EXPIRE', KEYS[2], ttl)
+return 1
+"""
+
+# Освобождает слот и пересчитывает лимит по результату запроса
+# (ARGV[2]: 1 - увеличить, -1 - уменьшить, 0 - не менять). Возвращает новый лимит.
+RELEASE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local change = tonumber(ARGV[2])
+local min_limit = tonumber(ARGV[3])
+local max_limit = tonumber(ARGV[4])
+
+redis.call('ZREM', KEYS[2], ARGV[1])
+local limit = tonumber(redis.call('HGET', KEYS[1], 'limit')) or tonumber(ARGV[5])
+
+if change > 0 then
+    limit = math.min(max_limit, limit + 1 / limit)
+elseif change < 0 then
+    local decreased_at = tonumber(redis.call('HGET', KEYS[1], 'decreased_at')) or 0
+    if now - decreased_at >= tonumber(ARGV[7]) then
+        limit = math.max(min_limit, limit * tonumber(ARGV[6]))
+        redis.call('HSET', KEYS[1], 'decreased_at', now)
+    end
+end
+
+redis.call('HSET', KEYS[1], 'limit', limit)
+return tostring(limit)
+"""
+
+
+class AnalyzerBusyError(Exception):
+    """Свободный слот анализатора не освободился за время ожидания."""
+
+
+class AdaptiveLimiter:
+    """Лимит одновременных запросов к одному анализатору."""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        name: str,
+        settings: AnalyzerSettings,
+        concurrency: Optional[int] = None,
+    ):
+        self.redis = redis_client
+        self.name = name
+        self.settings = settings
+        initial = settings.ANALYZER_INITIAL_LIMIT or concurrency or 0
+        self.initial_limit = min(
+            settings.ANALYZER_MAX_LIMIT, max(settings.ANALYZER_MIN_LIMIT, initial)
+        )
+        # Ключи одного анализатора в одном слоте Redis Cluster
+        self.keys = [
+            cache_key("analyzer:limit", tag=name),
+            cache_key("analyzer:permits", tag=name),
+        ]
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._acquire = redis_client.register_script(ACQUIRE_SCRIPT)
+        self._release = redis_client.register_script(RELEASE_SCRIPT)
+
+    def try_acquire(self) -> Optional[str]:
+        """
+        Занимает слот без ожидания.
+
+        Returns:
+            Optional[str]: Идентификатор слота, "" при недоступности Redis
+                (запрос выполняется без лимита), None если слотов нет.
+        """
+        permit = uuid.uuid4().hex
+        try:
+            acquired = self._acquire(
+                keys=self.keys,
+                args=[
+                    permit,
+                    self.settings.ANALYZER_PERMIT_TTL,
+                    self.initial_limit,
+                ],
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Лимит анализатора {self.name} недоступен: {e}")
+            return ""
+        return permit if acquired else None
+
+    def acquire(self) -> str:
+        """
+        Занимает слот, ожидая его не дольше ANALYZER_ACQUIRE_TIMEOUT секунд.
+
+        Raises:
+            AnalyzerBusyError: Если слот не освободился.
+        """
+        deadline = time.monotonic() + self.settings.ANALYZER_ACQUIRE_TIMEOUT
+        delay = 0.05
+        while True:
+            permit = self.try_acquire()
+            if permit is not None:
+                return permit
+            if time.monotonic() + delay > deadline:
+                raise AnalyzerBusyError(f"Анализатор {self.name} перегружен")
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def release(
+        self, permit: str, latency: float, error: Optional[BaseException] = None
+    ) -> None:
+        """
+        Освобождает слот и сообщает результат запроса для пересчёта лимита.
+
+        Args:
+            permit (str): Идентификатор слота.
+            latency (float): Длительность запроса (сек).
+            error (Optional[BaseException]): Ошибка запроса, None - успех.
+        """
+        if error is None:
+            self.latencies.append(latency)
+        if not permit:
+            return
+
+        if error is not None:
+            change = DECREASE if is_congestion(error) else HOLD
+        elif latency > self.settings.ANALYZER_LATENCY_TARGET:
+            change = DECREASE
+        else:
+            change = INCREASE
+        try:
+            self._release(
+                keys=self.keys,
+                args=[
+                    permit,
+                    change,
+                    self.settings.ANALYZER_MIN_LIMIT,
+                    self.settings.ANALYZER_MAX_LIMIT,
+                    self.initial_limit,
+                    self.settings.ANALYZER_DECREASE_FACTOR,
+                    self.settings.ANALYZER_DECREASE_COOLDOWN,
+                ],
+            )
+        except redis.RedisError as e:
+            # Слот освободится по ANALYZER_PERMIT_TTL
+            logger.warning(f"Лимит анализатора {self.name} недоступен: {e}")
+
+    def hedge_delay(self) -> Optional[float]:
+        """Задержка, после которой отправляется дубль, либо None (мало наблюдений)."""
+        if (
+            not self.settings.ANALYZER_HEDGE_ENABLED
+            or len(self.latencies) < self.settings.ANALYZER_HEDGE_MIN_SAMPLES
+        ):
+            return None
+        ordered = sorted(self.latencies)
+        index = int(self.settings.ANALYZER_HEDGE_QUANTILE * (len(ordered) - 1))
+        return ordered[index]
+
+    def call(self, func: Callable[..., T], *args) -> T:
+        """
+        Выполняет запрос к анализатору в пределах лимита, с дублированием
+        при медленном ответе (если включено).
+        """
+        delay = self.hedge_delay()
+        permit = self.acquire()
+
+        if delay is None:
+            return self._run(permit, func, *args)
+
+        primary = spawn(self._run, permit, func, *args)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge_permit = self.try_acquire()
+        if hedge_permit is None:
+            return primary.result()
+
+        logger.info(
+            f"Анализатор {self.name}: нет ответа за {delay:.2f} сек, дублируем запрос"
+        )
+        hedge = spawn(self._run, hedge_permit, func, *args)
+        return first_successful(primary, hedge)
+
+    def _run(self, permit: str, func: Callable[..., T], *args) -> T:
+        started = time.monotonic()
+        try:
+            result = func(*args)
+        except BaseException as e:
+            self.release(permit, time.monotonic() - started, e)
+            raise
+        self.release(permit, time.monotonic() - started)
+        return result
+
+
+def is_congestion(error: BaseException) -> bool:
+    """Ошибка - признак перегрузки анализатора: таймаут или ответ 429/503."""
+    if isinstance(error, (TimeoutError, httpx.TimeoutException)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status in CONGESTION_STATUSES
+
+
+def spawn(func: Callable[..., T], *args) -> Future:
+    """
+    Выполняет функцию в отдельном потоке. В воркерах eventlet/gevent модуль
+    threading пропатчен, и поток получается зелёным.
+    ThreadPoolExecutor не подходит: его очередь (_queue.SimpleQueue) не патчится
+    и блокирует hub.
+    """
+    future: Future = Future()
+
+    def runner() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=runner, name="analyzer-hedge", daemon=True).start()
+    return future
+
+
+def first_successful(*futures: Future):
+    """
+    Результат первого успешно завершившегося запроса. Остальные продолжают
+    выполняться в фоне и освобождают свои слоты по завершении.
+
+    Raises:
+        Exception: Ошибка последнего запроса, если все завершились с ошибкой.
+    """
+    pending = set(futures)
+    while True:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+        if not pending:
+            raise done.pop().exception()
+
@@ -0,0 +1,49 @@
+"""
+Ключи кэша задач в Redis.
+
+Используются и API, и воркером, поэтому вынесены отдельно. Все ключи
+начинаются с REDIS_KEY_PREFIX. Ключи одной задачи содержат хэш-тег {task_id}:
+в Redis Cluster они попадают в один слот, и операции над ними можно
+объединять в конвейер (pipeline) без ошибок CROSSSLOT.
+"""
+
+from typing import Optional
+
+from app.config import redis_settings
+
+# Время жизни закэшированного статуса задачи (сек)
+RESULT_CACHE_TTL = 300
+
+
+def cache_key(name: str, tag: Optional[str] = None) -> str:
+    """
+    Ключ кэша с префиксом; tag - хэш-тег, определяющий слот в Redis Cluster.
+    """
+    key = f"{redis_settings.REDIS_KEY_PREFIX}{name}"
+    if tag is not None:
+        key = f"{key}:{{{tag}}}"
+    return key
+
+
+def result_key(task_id: str) -> str:
+    """Ключ со статусом и результатами задачи."""
+    return cache_key("result", tag=task_id)
+
+
+def etag_key(task_id: str) -> str:
+    """Ключ с ETag ответа GET /results/{task_id}."""
+    return cache_key("etag", tag=task_id)
+
+
+# Сохраняет ETag, только если закэшированный результат не изменился с момента,
+# когда по нему было построено тело ответа (compare-and-set). Иначе воркер уже
+# сменил статус и удалил ETag, и API не должен вернуть устаревший.
+# KEYS: ключ результата, ключ ETag (один хэш-тег - один слот Redis Cluster).
+# ARGV: ожидаемое значение результата, значение ETag, TTL (сек).
+STORE_ETAG_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
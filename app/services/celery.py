@@ -1,21 +1,71 @@
-# Команда запуска: celery -A app.services.celery worker -l info -P eventlet
+# Команда запуска: celery -A app.services.celery worker -l info -P eventlet -Q zip_queue,celery
+# Флаг -P должен совпадать с WORKER_POOL (см. app/services/execution.py)
 import json
+from contextlib import suppress
+from datetime import date
+from functools import lru_cache
 from typing import Optional
 
 from celery import shared_task  # type: ignore
 from celery.utils.log import get_task_logger  # type: ignore
-from sqlalchemy.orm import Session
-
-from app.db.session import SessionLocal, redis_client_sync
-from app.models.task_result import TaskResult, TaskStatusEnum
-from app.services.minio_client import download_from_minio
+from redis.exceptions import LockError, RedisError
+
+from app.db.session import get_redis_sync, get_sync_engine
+from app.models.task_result import TaskStatusEnum
+from app.services.admission import record_completion
+from app.services.analyzers import AdaptiveLimiter
+from app.services.cache import RESULT_CACHE_TTL, cache_key, etag_key, result_key
+from app.services.chunk_store import collect_garbage
+from app.services.minio_client import (
+    chunked_storage,
+    download_from_minio,
+    get_minio_client,
+)
+from app.services.profiling import (
+    finish_task_profile,
+    slow_stage,
+    start_task_profile,
+)
+from app.services.reports import encode_report, store_report
+from app.services.retention import purge_archives, purge_outbox, purge_results
+from app.services.rollups import backfill_rollups, fold_rollups
+from app.services.status_writer import (
+    LeaseLostError,
+    StatusWriter,
+    reap_expired_leases,
+)
+from app.services.execution import (
+    InvalidArchiveError,
+    detect_running_pool,
+    get_pool_profile,
+    get_runtime_profile,
+    inspect_archive,
+    make_green_safe,
+    run_cpu_bound,
+    shutdown_cpu_executor,
+)
 
 from external_api.coverage import mock_external_api_coverage
 from external_api.smells import mock_external_api_smells
 from external_api.vulnerabilities import mock_external_api_vulnerabilities
 
 from celery import Celery
-from app.config import celery_settings as settings
+from celery.signals import (  # type: ignore
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+from app.config import (
+    admission_settings,
+    analyzer_settings,
+    celery_settings as settings,
+    minio_settings,
+    outbox_settings,
+    profiling_settings,
+    retention_settings,
+    worker_settings,
+)
 
 
 logger = get_task_logger(__name__)
@@ -25,15 +75,129 @@ celery_app.autodiscover_tasks(["app.services"])
 
 celery_app.conf.task_routes = {
     "app.services.celery.*": {"queue": "zip_queue"},
+    # Задачи зарегистрированы под короткими именами и не попадают под шаблон выше.
+    # Длина zip_queue используется для контроля допуска загрузок в API
+    "process_zip_task": {"queue": "zip_queue"},
 }
 
+# Параметры воркера для модели исполнения из настроек
+# (флаг -P в командной строке имеет приоритет над worker_pool)
+configured_profile = get_pool_profile(
+    worker_settings.WORKER_POOL, worker_settings.WORKER_CONCURRENCY
+)
+celery_app.conf.worker_pool = configured_profile.pool
+celery_app.conf.worker_concurrency = configured_profile.concurrency
+celery_app.conf.worker_prefetch_multiplier = configured_profile.prefetch_multiplier
+
+make_green_safe(detect_running_pool())
+
+celery_app.conf.beat_schedule = {
+    "reap-stuck-tasks": {
+        "task": "reap_stuck_tasks",
+        "schedule": worker_settings.REAPER_INTERVAL,
+    },
+    "apply-retention": {
+        "task": "apply_retention",
+        "schedule": retention_settings.RETENTION_INTERVAL,
+    },
+    "fold-quality-rollups": {
+        "task": "fold_quality_rollups",
+        "schedule": worker_settings.ROLLUP_FOLD_INTERVAL,
+    },
+}
+if chunked_storage():
+    celery_app.conf.beat_schedule["collect-chunks"] = {
+        "task": "collect_chunks",
+        "schedule": minio_settings.MINIO_CHUNK_GC_INTERVAL,
+    }
+
+
+@lru_cache
+def get_status_writer() -> StatusWriter:
+    """Запись статусов задач, создаётся в процессе воркера при первом обращении."""
+    return StatusWriter(
+        get_sync_engine(),
+        batch_size=worker_settings.STATUS_BATCH_SIZE,
+        flush_interval=worker_settings.STATUS_FLUSH_INTERVAL,
+        lease_ttl=worker_settings.LEASE_TTL,
+    )
+
+
+@lru_cache
+def get_analyzer_limiter(name: str) -> AdaptiveLimiter:
+    """Адаптивный лимит запросов к анализатору name (состояние общее в Redis)."""
+    return AdaptiveLimiter(
+        get_redis_sync(),
+        name,
+        analyzer_settings,
+        concurrency=celery_app.conf.worker_concurrency,
+    )
+
+
+def call_analyzer(name: str, func, *args):
+    """Запрос к внешнему анализатору в пределах его адаптивного лимита."""
+    with slow_stage(f"analyzer:{name}", profiling_settings.SLOW_ANALYZER_SECONDS):
+        if not analyzer_settings.ANALYZER_LIMITS_ENABLED:
+            return func(*args)
+        return get_analyzer_limiter(name).call(func, *args)
+
+
+def profile_requested(request) -> bool:
+    """
+    Задача отправлена с заголовком profile:
+    send_task("process_zip_task", args=[task_id], headers={"profile": True}).
+    """
+    headers = getattr(request, "headers", None) or {}
+    return bool(getattr(request, "profile", None) or headers.get("profile"))
+
+
+@task_prerun.connect
+def on_task_prerun(task_id=None, task=None, args=None, **kwargs):
+    if profile_requested(task.request):
+        name = f"{task.name}-{args[0]}" if args else task.name
+        start_task_profile(task_id, name)
+
+
+@task_postrun.connect
+def on_task_postrun(task_id=None, task=None, **kwargs):
+    path = finish_task_profile(task_id)
+    if path is not None:
+        logger.info(f"Профиль задачи [{task_id}] записан в {path}")
+
+    # Каждое выполнение (в том числе с повторной попыткой) забирает сообщение
+    # из zip_queue: по частоте выполнений API оценивает пропускную способность
+    if (
+        admission_settings.ADMISSION_ENABLED
+        and task is not None
+        and task.name == "process_zip_task"
+    ):
+        try:
+            record_completion(
+                get_redis_sync(), admission_settings.ADMISSION_THROUGHPUT_WINDOW
+            )
+        except RedisError as e:
+            logger.warning(f"Не удалось отметить завершение задачи [{task_id}]: {e}")
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def on_worker_shutdown(**kwargs):
+    if get_status_writer.cache_info().currsize:
+        get_status_writer().flush()
+    shutdown_cpu_executor()
+
 
 @shared_task(
     bind=True,
     autoretry_for=(Exception,),
+    # Повреждённый архив не станет целым при повторной попытке
+    dont_autoretry_for=(InvalidArchiveError,),
     retry_backoff=True,
     max_retries=3,
     name="process_zip_task",
+    # Подтверждение после выполнения: при гибели воркера сообщение вернётся в очередь
+    acks_late=True,
+    reject_on_worker_lost=True,
 )
 def process_zip_task(self, task_id: str):
     """
@@ -48,64 +212,288 @@ def process_zip_task(self, task_id: str):
     Raises:
         Exception: Если произошла ошибка при обработке.
     """
-    db: Session = SessionLocal()
+    # Идентификатор запроса Celery сохраняется между повторными попытками
+    owner = f"{self.request.hostname}:{self.request.id}"
+    status_writer = get_status_writer()
+    claimed = False
 
     try:
-        task = db.query(TaskResult).filter(TaskResult.task_id == task_id).first()
-        if task is None:
-            logger.error(f"Задача [{task_id}] не найдена в БД")
+        # Прямой UPDATE без предварительного SELECT
+        claimed = status_writer.claim(task_id, owner)
+        if not claimed:
+            logger.error(
+                f"Задача [{task_id}] не найдена в БД, уже завершена "
+                f"или выполняется другим воркером"
+            )
             return
 
-        # Теперь `mypy` понимает, что `task` не `None`
-        task.status = TaskStatusEnum.IN_PROGRESS
-        db.commit()
-        update_cache(task_id, task.status, None)
+        update_cache(task_id, TaskStatusEnum.IN_PROGRESS, None)
 
         logger.info(f"Начинаем загрузку ZIP-архива [{task_id}] из MinIO")
 
         # Загружаем архив из MinIO
-        local_zip_path = download_from_minio(task_id)
+        with slow_stage(
+            "minio:download", profiling_settings.SLOW_MINIO_SECONDS, task_id=task_id
+        ):
+            local_zip_path = download_from_minio(task_id)
         if not local_zip_path:
             raise Exception(f"Ошибка загрузки [{task_id}] из MinIO")
 
         logger.info(f"Архив успешно загружен")
+        status_writer.renew(task_id, owner)
+
+        # Проверка хэша и CRC - CPU-bound, выполняется вне hub воркера
+        with slow_stage(
+            "hash",
+            profiling_settings.SLOW_HASH_SECONDS,
+            task_id=task_id,
+            size=len(local_zip_path),
+        ):
+            manifest = run_cpu_bound(
+                get_runtime_profile(worker_settings.WORKER_POOL),
+                inspect_archive,
+                local_zip_path,
+                task_id,
+                max_workers=worker_settings.CPU_POOL_SIZE,
+            )
+        logger.info(
+            f"Архив [{task_id}]: файлов {manifest['files']}, "
+            f"{manifest['uncompressed_size']} байт после распаковки"
+        )
+
         logger.info(f"Передача архива во внешние API")
 
-        # Запросы к внешним API
-        api_1_result = mock_external_api_coverage(local_zip_path)
-        api_2_result = mock_external_api_vulnerabilities(local_zip_path)
-        api_3_result = mock_external_api_smells(local_zip_path)
+        # Запросы к внешним API, аренда продлевается перед каждым
+        status_writer.renew(task_id, owner)
+        api_1_result = call_analyzer(
+            "coverage", mock_external_api_coverage, local_zip_path
+        )
+        status_writer.renew(task_id, owner)
+        api_2_result = call_analyzer(
+            "vulnerabilities", mock_external_api_vulnerabilities, local_zip_path
+        )
+        status_writer.renew(task_id, owner)
+        api_3_result = call_analyzer("smells", mock_external_api_smells, local_zip_path)
+
+        # Подробные находки - в MinIO, в БД и кэш попадает только ссылка на отчёт
+        findings = {
+            "coverage": api_1_result.get("findings", []),
+            "vulnerabilities": api_2_result.get("findings", []),
+            "smells": api_3_result.get("findings", []),
+        }
+        report_data, findings_count = run_cpu_bound(
+            get_runtime_profile(worker_settings.WORKER_POOL),
+            encode_report,
+            findings,
+            minio_settings.MINIO_REPORT_ZSTD_LEVEL,
+            max_workers=worker_settings.CPU_POOL_SIZE,
+        )
+        status_writer.renew(task_id, owner)
+        with slow_stage(
+            "minio:report",
+            profiling_settings.SLOW_MINIO_SECONDS,
+            task_id=task_id,
+            size=len(report_data),
+        ):
+            report = store_report(task_id, report_data, findings_count)
+        logger.info(
+            f"Отчёт [{task_id}]: находок {findings_count}, {len(report_data)} байт"
+        )
 
         results = {
             "overall_coverage": api_1_result["coverage"],
             "bugs": api_1_result["bugs"],
             "vulnerabilities": api_2_result["vulnerabilities"],
             "code_smells": api_3_result["code_smells"],
+            "report": report,
         }
 
-        # Обновляем статус на SUCCESS и сохраняем результаты
-        task.status = TaskStatusEnum.SUCCESS
-        task.results = results
-        db.commit()
-
-        update_cache(task_id, task.status, task.results)
+        # Сначала кэш: до записи пачки в БД статус отдаётся из Redis
+        update_cache(task_id, TaskStatusEnum.SUCCESS, results)
+        status_writer.write(task_id, TaskStatusEnum.SUCCESS, owner, results)
 
         logger.info(f"Задача [{task_id}] успешно завершена")
         return results
 
+    except LeaseLostError as e:
+        # Задачу уже обрабатывает другой воркер - молча выходим
+        logger.warning(f"[{task_id}] {e}, обработка прекращена")
+        return
+
+    except InvalidArchiveError as e:
+        # Повреждённый архив или несовпадение хэша: без повторных попыток
+        logger.error(f"[{task_id}] Архив не прошёл проверку: {e}")
+        status_writer.write(task_id, TaskStatusEnum.FAILED, owner, immediate=True)
+        update_cache(task_id, TaskStatusEnum.FAILED, None)
+        return
+
     except Exception as e:
         logger.error(f"[{task_id}] Ошибка обработки: {e}")
 
-        if task is None:
-            return
+        if not claimed:
+            raise self.retry(exc=e)
 
-        task.status = TaskStatusEnum.FAILED
-        db.commit()
-        update_cache(task_id, task.status, None)
+        # Сразу, минуя буфер: повторная попытка снова переведёт задачу
+        # в IN_PROGRESS и не должна быть перезаписана устаревшим FAILED
+        status_writer.write(task_id, TaskStatusEnum.FAILED, owner, immediate=True)
+        update_cache(task_id, TaskStatusEnum.FAILED, None)
         raise self.retry(exc=e)
 
+
+@shared_task(name="reap_stuck_tasks")
+def reap_stuck_tasks():
+    """
+    Периодическая задача (celery beat): возвращает в очередь задачи,
+    воркер которых перестал продлевать аренду.
+
+    Returns:
+        int: Количество перезапущенных задач.
+    """
+    task_ids = reap_expired_leases(
+        get_sync_engine(), worker_settings.REAPER_BATCH_SIZE
+    )
+
+    # В очередь задачи ставит app.relay из task_outbox
+    for task_id in task_ids:
+        logger.warning(f"Аренда задачи [{task_id}] истекла, задача перезапущена")
+        update_cache(task_id, TaskStatusEnum.PENDING, None)
+
+    return len(task_ids)
+
+
+@shared_task(name="apply_retention")
+def apply_retention():
+    """
+    Периодическая задача (celery beat): удаляет устаревшие архивы и результаты
+    пачками, не более RETENTION_MAX_BATCHES пачек каждого вида за запуск.
+
+    Returns:
+        dict: Количество удалённых архивов, задач и сообщений outbox.
+    """
+    batch_size = retention_settings.RETENTION_BATCH_SIZE
+    removed = {"archives": 0, "results": 0, "outbox": 0}
+
+    if retention_settings.ARCHIVE_RETENTION_HOURS is not None:
+        for _ in range(retention_settings.RETENTION_MAX_BATCHES):
+            count = purge_archives(
+                get_sync_engine(),
+                retention_settings.ARCHIVE_RETENTION_HOURS,
+                batch_size,
+            )
+            removed["archives"] += count
+            if count < batch_size:
+                break
+
+    if retention_settings.RESULT_RETENTION_DAYS is not None:
+        for _ in range(retention_settings.RETENTION_MAX_BATCHES):
+            count = purge_results(
+                get_sync_engine(),
+                get_redis_sync(),
+                retention_settings.RESULT_RETENTION_DAYS,
+                batch_size,
+            )
+            removed["results"] += count
+            if count < batch_size:
+                break
+
+    if outbox_settings.OUTBOX_SENT_RETENTION_HOURS is not None:
+        for _ in range(retention_settings.RETENTION_MAX_BATCHES):
+            count = purge_outbox(
+                get_sync_engine(),
+                outbox_settings.OUTBOX_SENT_RETENTION_HOURS,
+                batch_size,
+            )
+            removed["outbox"] += count
+            if count < batch_size:
+                break
+
+    logger.info(
+        f"Очистка по политике хранения: архивов {removed['archives']}, "
+        f"задач {removed['results']}, сообщений outbox {removed['outbox']}"
+    )
+    return removed
+
+
+@shared_task(name="collect_chunks")
+def collect_chunks(rebuild: bool = False):
+    """
+    Периодическая задача (celery beat, при MINIO_STORAGE_MODE=chunked):
+    удаляет из MinIO чанки, на которые не ссылается ни один манифест архива.
+    Запуски не пересекаются: счётчики ссылок обновляет один процесс.
+
+    Args:
+        rebuild (bool): Пересчитать счётчики ссылок по всем манифестам.
+
+    Returns:
+        int: Количество удалённых чанков.
+    """
+    lock = get_redis_sync().lock(
+        cache_key("chunks:gc"), timeout=minio_settings.MINIO_CHUNK_GC_INTERVAL
+    )
+    if not lock.acquire(blocking=False):
+        logger.info("Сборка мусора чанков уже выполняется")
+        return 0
+    try:
+        count = collect_garbage(
+            get_sync_engine(),
+            get_minio_client(),
+            minio_settings.MINIO_BUCKET_NAME,
+            minio_settings.MINIO_CHUNK_GC_GRACE_HOURS,
+            rebuild=rebuild,
+        )
     finally:
-        db.close()
+        # Блокировка могла истечь, если сборка шла дольше интервала
+        with suppress(LockError):
+            lock.release()
+    logger.info(f"Сборка мусора чанков: удалено {count}")
+    return count
+
+
+@shared_task(name="fold_quality_rollups")
+def fold_quality_rollups():
+    """
+    Периодическая задача (celery beat): переносит приращения показателей
+    качества, записанные воркерами, в quality_rollups.
+
+    Returns:
+        int: Количество перенесённых приращений.
+    """
+    batch_size = worker_settings.ROLLUP_FOLD_BATCH_SIZE
+    total = 0
+    while True:
+        count = fold_rollups(get_sync_engine(), batch_size)
+        total += count
+        if count < batch_size:
+            break
+    return total
+
+
+@shared_task(name="backfill_quality_rollups")
+def backfill_quality_rollups(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    overwrite: bool = False,
+):
+    """
+    Разовая задача: заполняет показатели качества по уже сохранённым результатам.
+    Запуск: celery -A app.services.celery call backfill_quality_rollups
+
+    Args:
+        date_from (Optional[str]): Первый день (ISO), по умолчанию - с начала.
+        date_to (Optional[str]): День после последнего (ISO), по умолчанию - сегодня.
+        overwrite (bool): Пересчитать дни, по которым показатели уже есть.
+
+    Returns:
+        int: Количество записанных строк показателей.
+    """
+    count = backfill_rollups(
+        get_sync_engine(),
+        date.fromisoformat(date_from) if date_from else date(1970, 1, 1),
+        date.fromisoformat(date_to) if date_to else None,
+        overwrite=overwrite,
+    )
+    logger.info(f"Показатели качества заполнены: {count} строк")
+    return count
 
 
 def update_cache(task_id: str, status: TaskStatusEnum, results: Optional[dict]):
@@ -120,8 +508,11 @@ def update_cache(task_id: str, status: TaskStatusEnum, results: Optional[dict]):
     try:
         logger.info(f"Обновляем кэш в Redis: {task_id} -> {cache_data}")
 
-        # Обновляем кэш
-        redis_client_sync.setex(task_id, 300, json.dumps(cache_data))
+        # Обновляем кэш и сбрасываем ETag ответа: статус задачи изменился
+        with get_redis_sync().pipeline() as pipe:
+            pipe.setex(result_key(task_id), RESULT_CACHE_TTL, json.dumps(cache_data))
+            pipe.delete(etag_key(task_id))
+            pipe.execute()
 
     except Exception as e:
         logger.error(f"Ошибка при кэшировании задачи [{task_id}]: {e}")
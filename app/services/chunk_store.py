@@ -0,0 +1,671 @@
+"""
+Хранение архивов чанками с дедупликацией (MINIO_STORAGE_MODE=chunked).
+
+Архив режется на чанки по содержимому (content-defined chunking, FastCDC):
+границы определяются скользящим хэшем последних байт, поэтому вставка
+или изменение в одном месте архива сдвигает границы только соседних чанков.
+Чанки хранятся в бакете по SHA-256 (chunks/<sha256>) и общие для всех
+архивов, архив описывается манифестом (manifests/<task_id>.json) - списком
+чанков по порядку. При загрузке почти не изменившегося архива в MinIO
+записываются только новые чанки и манифест.
+
+Чанки, на которые не ссылается ни один манифест, удаляет collect_garbage по
+счётчикам ссылок в БД (chunk_refs). Счётчики меняются по журналу в бакете:
+загрузка отмечает новые чанки (chunk-uploads/) и записанный манифест
+(manifests-new/), удаление копирует манифест в manifests-deleted/
+(retire_manifests). Сборка мусора читает только эти отметки и проверяет
+только чанки без ссылок, не перебирая все манифесты и чанки бакета.
+Чтобы не удалить чанк, который загрузка нашла существующим, но ещё не записала
+манифест, удаляются только чанки старше MINIO_CHUNK_GC_GRACE_HOURS, а загрузка
+перезаписывает найденный чанк, если он старше половины этого срока.
+Загрузка должна укладываться в половину срока.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import uuid
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastcdc import fastcdc
+from minio import Minio
+from minio.commonconfig import CopySource
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+from sqlalchemy import Connection, Engine, bindparam, case, delete, insert, select, update
+
+from app.config import MinioSettings
+from app.models.chunk_ref import ChunkManifest, ChunkRef
+
+logger = logging.getLogger(__name__)
+
+CHUNK_PREFIX = "chunks/"
+MANIFEST_PREFIX = "manifests/"
+MANIFEST_VERSION = 1
+
+# Журнал для сборки мусора: новые чанки загрузки, записанные и удалённые манифесты
+UPLOAD_PREFIX = "chunk-uploads/"
+JOURNAL_PREFIX = "manifests-new/"
+TOMBSTONE_PREFIX = "manifests-deleted/"
+# Размер пачки запросов к БД и кандидатов на удаление за один проход
+GC_BATCH_SIZE = 1000
+
+
+class ChunkStoreError(Exception):
+    """Манифест не соответствует сохранённым чанкам."""
+
+
+class ChunkRefsError(Exception):
+    """Счётчики ссылок не соответствуют манифестам: нужен полный пересчёт."""
+
+
+@dataclass
+class UploadStats:
+    chunks: int
+    new_chunks: int
+    new_bytes: int
+
+
+def chunk_object(digest: str) -> str:
+    return f"{CHUNK_PREFIX}{digest}"
+
+
+def manifest_object(task_id: str) -> str:
+    return f"{MANIFEST_PREFIX}{task_id}.json"
+
+
+def journal_object(prefix: str, task_id: str) -> str:
+    """Отметка журнала; имена уникальны, чтобы удаление обработанной отметки не стёрло новую."""
+    return f"{prefix}{task_id}.{uuid.uuid4().hex}.json"
+
+
+def journal_task_id(prefix: str, object_name: str) -> str:
+    return object_name[len(prefix) :].split(".", 1)[0]
+
+
+def put_json(client: Minio, bucket_name: str, object_name: str, value) -> None:
+    content = json.dumps(value).encode()
+    client.put_object(
+        bucket_name=bucket_name,
+        object_name=object_name,
+        data=io.BytesIO(content),
+        length=len(content),
+        content_type="application/json",
+    )
+
+
+def chunk_spans(
+    data: bytes, min_size: int, avg_size: int, max_size: int
+) -> Iterator[Tuple[int, int]]:
+    """
+    Границы чанков FastCDC с нормализацией (библиотека fastcdc, расширение
+    на Cython; без собранного расширения используется её реализация на Python
+    с теми же границами).
+
+    Returns:
+        Iterator[Tuple[int, int]]: Пары (начало, конец) чанков.
+    """
+    for chunk in fastcdc(data, min_size, avg_size, max_size, fat=False):
+        yield chunk.offset, chunk.offset + chunk.length
+
+
+def chunk_archive(
+    data: bytes, min_size: int, avg_size: int, max_size: int
+) -> List[Tuple[str, int, int]]:
+    """
+    Режет архив на чанки и хэширует их. Нарезка идёт в нативном коде, hashlib
+    отпускает GIL на время хэширования, поэтому вызывается прямо в потоке
+    загрузки: архив не копируется в другой процесс.
+
+    Returns:
+        List[Tuple[str, int, int]]: SHA-256, начало и конец каждого чанка.
+    """
+    view = memoryview(data)
+    return [
+        (hashlib.sha256(view[start:end]).hexdigest(), start, end)
+        for start, end in chunk_spans(data, min_size, avg_size, max_size)
+    ]
+
+
+def store_archive(
+    client: Minio,
+    task_id: str,
+    data: bytes,
+    chunks: List[Tuple[str, int, int]],
+    settings: MinioSettings,
+) -> UploadStats:
+    """
+    Сохраняет архив чанками: записывает отсутствующие чанки, затем манифест.
+
+    Новые чанки отмечаются в chunk-uploads/ до записи: если загрузка не дойдёт
+    до манифеста, сборка мусора найдёт их по отметке. После манифеста
+    записывается отметка в manifests-new/, по ней манифест попадёт в счётчики.
+
+    Args:
+        client (Minio): Клиент MinIO.
+        task_id (str): Идентификатор задачи (SHA-256 архива).
+        data (bytes): Архив.
+        chunks (List[Tuple[str, int, int]]): Результат chunk_archive.
+        settings (MinioSettings): Настройки MinIO.
+
+    Returns:
+        UploadStats: Количество чанков, новых чанков и записанных байт.
+    """
+    bucket_name = settings.MINIO_BUCKET_NAME
+    view = memoryview(data)
+    unique = {}
+    for digest, start, end in chunks:
+        unique.setdefault(digest, (start, end))
+
+    refresh_before = datetime.now(timezone.utc) - timedelta(
+        hours=settings.MINIO_CHUNK_GC_GRACE_HOURS / 2
+    )
+
+    def chunk_missing(digest: str) -> Optional[bool]:
+        """True - чанка нет, False - чанк нужно перезаписать, None - чанк свежий."""
+        try:
+            stat = client.stat_object(bucket_name, chunk_object(digest))
+        except S3Error as e:
+            if e.code != "NoSuchKey":
+                raise
+            return True
+        if stat.last_modified and stat.last_modified >= refresh_before:
+            return None
+        return False
+
+    def put_chunk(digest: str) -> int:
+        start, end = unique[digest]
+        client.put_object(
+            bucket_name=bucket_name,
+            object_name=chunk_object(digest),
+            data=io.BytesIO(view[start:end]),
+            length=end - start,
+        )
+        return end - start
+
+    # Вызывается из API (не из зелёных потоков воркера): обычные потоки допустимы
+    with ThreadPoolExecutor(settings.MINIO_CHUNK_UPLOAD_CONCURRENCY) as executor:
+        states = dict(zip(unique, executor.map(chunk_missing, unique)))
+        missing = [digest for digest, state in states.items() if state]
+        if missing:
+            put_json(client, bucket_name, journal_object(UPLOAD_PREFIX, task_id), missing)
+        written = list(
+            executor.map(
+                put_chunk, [digest for digest, state in states.items() if state is not None]
+            )
+        )
+
+    put_json(
+        client,
+        bucket_name,
+        manifest_object(task_id),
+        {
+            "version": MANIFEST_VERSION,
+            "size": len(data),
+            "chunks": [[digest, end - start] for digest, start, end in chunks],
+        },
+    )
+    put_json(client, bucket_name, journal_object(JOURNAL_PREFIX, task_id), {})
+
+    return UploadStats(chunks=len(chunks), new_chunks=len(written), new_bytes=sum(written))
+
+
+def read_object(client: Minio, bucket_name: str, object_name: str) -> bytes:
+    """Объект бакета целиком."""
+    response = client.get_object(bucket_name, object_name)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def load_manifest(client: Minio, bucket_name: str, task_id: str) -> dict:
+    """
+    Манифест архива.
+
+    Raises:
+        S3Error: Если манифеста нет (NoSuchKey) или MinIO недоступен.
+    """
+    return json.loads(read_object(client, bucket_name, manifest_object(task_id)))
+
+
+def read_chunk(client: Minio, bucket_name: str, digest: str, length: int) -> bytes:
+    """
+    Читает чанк целиком.
+
+    Raises:
+        ChunkStoreError: Если размер чанка не совпадает с манифестом.
+    """
+    data = read_object(client, bucket_name, chunk_object(digest))
+    if len(data) != length:
+        raise ChunkStoreError(f"Чанк {digest}: {len(data)} байт вместо {length}")
+    return data
+
+
+def iter_archive(client: Minio, bucket_name: str, manifest: dict) -> Iterator[bytes]:
+    """Содержимое архива по чанкам, по порядку."""
+    for digest, length in manifest["chunks"]:
+        yield read_chunk(client, bucket_name, digest, length)
+
+
+def chunk_offsets(manifest: dict) -> List[int]:
+    """Смещения начала каждого чанка в архиве."""
+    offsets = []
+    position = 0
+    for _, length in manifest["chunks"]:
+        offsets.append(position)
+        position += length
+    return offsets
+
+
+def read_range(
+    client: Minio,
+    bucket_name: str,
+    manifest: dict,
+    offsets: List[int],
+    offset: int,
+    length: int,
+) -> bytes:
+    """Байты архива [offset, offset + length), читаются только нужные чанки."""
+    end = offset + length
+    index = bisect_right(offsets, offset) - 1
+    parts = []
+    while index < len(offsets) and offsets[index] < end:
+        digest, size = manifest["chunks"][index]
+        data = read_chunk(client, bucket_name, digest, size)
+        start = offsets[index]
+        parts.append(data[max(0, offset - start) : end - start])
+        index += 1
+    return b"".join(parts)
+
+
+def retire_manifests(client: Minio, bucket_name: str, names: Iterable[str]) -> List[str]:
+    """
+    Копирует манифесты перед удалением в manifests-deleted/: по копиям сборка
+    мусора вычитает ссылки удалённых архивов, не перечитывая остальные манифесты.
+
+    Returns:
+        List[str]: Манифесты, которые скопировать не удалось - удалять их нельзя.
+    """
+    failed = []
+    for name in names:
+        task_id = name[len(MANIFEST_PREFIX) :].removesuffix(".json")
+        try:
+            client.copy_object(
+                bucket_name,
+                journal_object(TOMBSTONE_PREFIX, task_id),
+                CopySource(bucket_name, name),
+            )
+        except S3Error as e:
+            # Манифеста нет: архив хранится целым объектом или уже удалён
+            if e.code != "NoSuchKey":
+                logger.error(f"Ошибка копирования манифеста {name}: {e}")
+                failed.append(name)
+    return failed
+
+
+def read_optional(client: Minio, bucket_name: str, object_name: str) -> Optional[bytes]:
+    """Объект бакета целиком, None - если его нет."""
+    try:
+        return read_object(client, bucket_name, object_name)
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            return None
+        raise
+
+
+def manifest_refs(content: bytes) -> Counter:
+    """Количество ссылок манифеста на каждый чанк."""
+    return Counter(digest for digest, _ in json.loads(content)["chunks"])
+
+
+def batches(items: List, size: int = GC_BATCH_SIZE) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def add_refs(connection: Connection, refs: Dict[str, int]) -> None:
+    """
+    Прибавляет ссылки к счётчикам чанков. Счётчики меняет только сборка мусора
+    (запуски не пересекаются), поэтому upsert не нужен.
+    """
+    for batch in batches(list(refs)):
+        existing = set(
+            connection.execute(
+                select(ChunkRef.digest).where(ChunkRef.digest.in_(batch))
+            ).scalars()
+        )
+        updates = [{"b_digest": d, "b_refs": refs[d]} for d in batch if d in existing]
+        if updates:
+            connection.execute(
+                update(ChunkRef)
+                .where(ChunkRef.digest == bindparam("b_digest"))
+                .values(refs=ChunkRef.refs + bindparam("b_refs"), zero_since=None),
+                updates,
+            )
+        rows = [
+            {"digest": d, "refs": refs[d], "zero_since": None}
+            for d in batch
+            if d not in existing
+        ]
+        if rows:
+            connection.execute(insert(ChunkRef), rows)
+
+
+def remove_refs(connection: Connection, refs: Dict[str, int], now: datetime) -> None:
+    """Вычитает ссылки; чанк, у которого их не осталось, становится кандидатом на удаление."""
+    remaining = ChunkRef.refs > bindparam("b_refs")
+    for batch in batches(list(refs)):
+        connection.execute(
+            update(ChunkRef)
+            .where(ChunkRef.digest == bindparam("b_digest"))
+            .values(
+                refs=case((remaining, ChunkRef.refs - bindparam("b_refs")), else_=0),
+                zero_since=case(
+                    (remaining, None),
+                    else_=bindparam("b_now", type_=ChunkRef.zero_since.type),
+                ),
+            ),
+            [{"b_digest": d, "b_refs": refs[d], "b_now": now} for d in batch],
+        )
+
+
+def register_chunks(connection: Connection, digests: List[str], since: datetime) -> None:
+    """Добавляет чанки без счётчика как кандидатов на удаление (refs = 0)."""
+    for batch in batches(digests):
+        existing = set(
+            connection.execute(
+                select(ChunkRef.digest).where(ChunkRef.digest.in_(batch))
+            ).scalars()
+        )
+        rows = [
+            {"digest": d, "refs": 0, "zero_since": since}
+            for d in dict.fromkeys(batch)
+            if d not in existing
+        ]
+        if rows:
+            connection.execute(insert(ChunkRef), rows)
+
+
+def counted_manifest(connection: Connection, task_id: str) -> Optional[str]:
+    return connection.execute(
+        select(ChunkManifest.digest).where(ChunkManifest.task_id == task_id)
+    ).scalar()
+
+
+def count_manifest(engine: Engine, client: Minio, bucket_name: str, task_id: str) -> None:
+    """
+    Учитывает записанный манифест (отметка manifests-new/). Манифест,
+    учтённый раньше, повторно не учитывается.
+
+    Raises:
+        ChunkRefsError: Если учтён другой манифест с тем же именем.
+    """
+    content = read_optional(client, bucket_name, manifest_object(task_id))
+    if content is None:
+        # Архив удалён до сборки мусора: ссылки не учитывались
+        return
+    digest = hashlib.sha256(content).hexdigest()
+    with engine.begin() as connection:
+        counted = counted_manifest(connection, task_id)
+        if counted == digest:
+            return
+        if counted is not None:
+            raise ChunkRefsError(f"Манифест {task_id} перезаписан")
+        connection.execute(insert(ChunkManifest).values(task_id=task_id, digest=digest))
+        add_refs(connection, manifest_refs(content))
+
+
+def retire_manifest(
+    engine: Engine, client: Minio, bucket_name: str, task_id: str, tombstone: str
+) -> None:
+    """
+    Вычитает ссылки удалённого манифеста по его копии (manifests-deleted/).
+    Если манифест снова есть в бакете (архив загружен повторно или не удалён),
+    ссылки остаются.
+
+    Raises:
+        ChunkRefsError: Если копия или манифест не совпадают с учтённой версией.
+    """
+    with engine.connect() as connection:
+        counted = counted_manifest(connection, task_id)
+    if counted is None:
+        return
+    current = read_optional(client, bucket_name, manifest_object(task_id))
+    if current is not None:
+        if hashlib.sha256(current).hexdigest() == counted:
+            return
+        raise ChunkRefsError(f"Манифест {task_id} перезаписан")
+    content = read_optional(client, bucket_name, tombstone)
+    if content is None:
+        return
+    if hashlib.sha256(content).hexdigest() != counted:
+        raise ChunkRefsError(f"Копия манифеста {task_id} не совпадает с учтённой")
+    with engine.begin() as connection:
+        deleted = connection.execute(
+            delete(ChunkManifest).where(
+                ChunkManifest.task_id == task_id, ChunkManifest.digest == counted
+            )
+        ).rowcount
+        if deleted:
+            remove_refs(connection, manifest_refs(content), datetime.now(timezone.utc))
+
+
+def list_names(client: Minio, bucket_name: str, prefix: str) -> List[str]:
+    return [
+        item.object_name
+        for item in client.list_objects(bucket_name, prefix=prefix, recursive=True)
+    ]
+
+
+def remove_names(client: Minio, bucket_name: str, names: List[str]) -> None:
+    """Удаляет обработанные отметки; повторная обработка оставшихся безопасна."""
+    if not names:
+        return
+    for error in client.remove_objects(bucket_name, [DeleteObject(name) for name in names]):
+        logger.error(f"Ошибка удаления отметки сборки мусора {error.name}: {error}")
+
+
+def register_uploads(engine: Engine, client: Minio, bucket_name: str) -> None:
+    """
+    Добавляет новые чанки загрузок (отметки chunk-uploads/) кандидатами на
+    удаление со времени отметки. Чанк, уже учтённый манифестом, не меняется.
+    """
+    uploads = list(client.list_objects(bucket_name, prefix=UPLOAD_PREFIX, recursive=True))
+    for item in uploads:
+        content = read_optional(client, bucket_name, item.object_name)
+        if content is None:
+            continue
+        with engine.begin() as connection:
+            register_chunks(connection, json.loads(content), item.last_modified)
+    remove_names(client, bucket_name, [item.object_name for item in uploads])
+
+
+def update_refs(engine: Engine, client: Minio, bucket_name: str) -> None:
+    """
+    Обновляет счётчики по журналу: новые чанки загрузок, удалённые и записанные
+    манифесты. Стоимость пропорциональна числу отметок с прошлого запуска.
+
+    Raises:
+        ChunkRefsError: Если счётчики не соответствуют манифестам.
+    """
+    register_uploads(engine, client, bucket_name)
+
+    tombstones = list_names(client, bucket_name, TOMBSTONE_PREFIX)
+    for name in tombstones:
+        retire_manifest(
+            engine, client, bucket_name, journal_task_id(TOMBSTONE_PREFIX, name), name
+        )
+    remove_names(client, bucket_name, tombstones)
+
+    journal = list_names(client, bucket_name, JOURNAL_PREFIX)
+    for name in journal:
+        count_manifest(engine, client, bucket_name, journal_task_id(JOURNAL_PREFIX, name))
+    remove_names(client, bucket_name, journal)
+
+
+def rebuild_refs(engine: Engine, client: Minio, bucket_name: str) -> None:
+    """
+    Пересчитывает счётчики по всем манифестам бакета; чанки без ссылок
+    становятся кандидатами на удаление со времени их записи.
+    Читает все манифесты и листинг всех чанков.
+    """
+    # Отметки, записанные до листинга, учтены пересчётом
+    markers = list_names(client, bucket_name, TOMBSTONE_PREFIX) + list_names(
+        client, bucket_name, JOURNAL_PREFIX
+    )
+
+    manifests = {}
+    refs: Counter = Counter()
+    for name in list_names(client, bucket_name, MANIFEST_PREFIX):
+        content = read_optional(client, bucket_name, name)
+        if content is None:
+            continue
+        manifests[name[len(MANIFEST_PREFIX) :].removesuffix(".json")] = hashlib.sha256(
+            content
+        ).hexdigest()
+        refs.update(manifest_refs(content))
+    chunks = {
+        item.object_name[len(CHUNK_PREFIX) :]: item.last_modified
+        for item in client.list_objects(bucket_name, prefix=CHUNK_PREFIX, recursive=True)
+    }
+
+    # Одна транзакция: частично пересчитанные счётчики удалили бы живые чанки
+    with engine.begin() as connection:
+        connection.execute(delete(ChunkManifest))
+        connection.execute(delete(ChunkRef))
+        rows = [{"task_id": task_id, "digest": d} for task_id, d in manifests.items()]
+        for batch in batches(rows):
+            connection.execute(insert(ChunkManifest), batch)
+        rows = [{"digest": d, "refs": count, "zero_since": None} for d, count in refs.items()]
+        rows += [
+            {"digest": d, "refs": 0, "zero_since": modified}
+            for d, modified in chunks.items()
+            if d not in refs
+        ]
+        for batch in batches(rows):
+            connection.execute(insert(ChunkRef), batch)
+
+    remove_names(client, bucket_name, markers)
+    # Чанки загрузок могли появиться уже после листинга
+    register_uploads(engine, client, bucket_name)
+
+
+def refs_initialized(engine: Engine, client: Minio, bucket_name: str) -> bool:
+    """Счётчики заполнены или в бакете ещё нет манифестов."""
+    with engine.connect() as connection:
+        if connection.execute(select(ChunkManifest.task_id).limit(1)).first():
+            return True
+    objects = client.list_objects(bucket_name, prefix=MANIFEST_PREFIX, recursive=True)
+    return next(iter(objects), None) is None
+
+
+def sweep_chunks(engine: Engine, client: Minio, bucket_name: str, grace_hours: float) -> int:
+    """
+    Удаляет чанки без ссылок дольше grace_hours, если они записаны раньше этого
+    срока. Проверяются только кандидаты из chunk_refs (refs = 0).
+
+    Returns:
+        int: Количество удалённых чанков.
+    """
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(hours=grace_hours)
+    removed = 0
+    while True:
+        with engine.connect() as connection:
+            candidates = (
+                connection.execute(
+                    select(ChunkRef.digest)
+                    .where(ChunkRef.refs == 0, ChunkRef.zero_since < cutoff)
+                    .order_by(ChunkRef.zero_since)
+                    .limit(GC_BATCH_SIZE)
+                )
+                .scalars()
+                .all()
+            )
+        if not candidates:
+            return removed
+
+        garbage, gone, postponed = [], [], {}
+        for digest in candidates:
+            try:
+                stat = client.stat_object(bucket_name, chunk_object(digest))
+            except S3Error as e:
+                if e.code != "NoSuchKey":
+                    raise
+                gone.append(digest)
+                continue
+            if stat.last_modified is not None and stat.last_modified < cutoff:
+                garbage.append(digest)
+            else:
+                # Чанк перезаписан загрузкой: манифест с ним может быть ещё не учтён
+                postponed[digest] = stat.last_modified or now
+
+        if garbage:
+            for error in client.remove_objects(
+                bucket_name, [DeleteObject(chunk_object(digest)) for digest in garbage]
+            ):
+                logger.error(f"Ошибка удаления чанка {error.name}: {error}")
+                digest = error.name[len(CHUNK_PREFIX) :]
+                garbage.remove(digest)
+                postponed[digest] = now
+        removed += len(garbage)
+
+        with engine.begin() as connection:
+            if garbage or gone:
+                connection.execute(
+                    delete(ChunkRef).where(
+                        ChunkRef.digest.in_(garbage + gone), ChunkRef.refs == 0
+                    )
+                )
+            if postponed:
+                connection.execute(
+                    update(ChunkRef)
+                    .where(ChunkRef.digest == bindparam("b_digest"))
+                    .values(zero_since=bindparam("b_since")),
+                    [{"b_digest": d, "b_since": since} for d, since in postponed.items()],
+                )
+        if len(candidates) < GC_BATCH_SIZE:
+            return removed
+
+
+def collect_garbage(
+    engine: Engine,
+    client: Minio,
+    bucket_name: str,
+    grace_hours: float,
+    rebuild: bool = False,
+) -> int:
+    """
+    Удаляет чанки, на которые не ссылается ни один манифест,
+    записанные раньше grace_hours часов назад.
+
+    Счётчики ссылок хранятся в БД (chunk_refs) и обновляются по журналу
+    в бакете (update_refs): за запуск читаются отметки, новые и удалённые
+    манифесты с прошлого запуска и проверяются только чанки без ссылок.
+    Стоимость запуска пропорциональна числу загрузок и удалений, а не числу
+    архивов в бакете, при условии, что запуск успевает за MINIO_CHUNK_GC_INTERVAL
+    обработать журнал. Полный пересчёт (rebuild_refs) читает все манифесты
+    и листинг чанков; он выполняется при первом запуске, если манифест
+    перезаписан, и при rebuild=True (нужно после удаления манифестов в обход
+    delete_many_from_minio, иначе их чанки останутся в бакете).
+
+    Returns:
+        int: Количество удалённых чанков.
+    """
+    try:
+        if rebuild or not refs_initialized(engine, client, bucket_name):
+            rebuild_refs(engine, client, bucket_name)
+        else:
+            update_refs(engine, client, bucket_name)
+    except ChunkRefsError as e:
+        logger.warning(f"{e}, счётчики ссылок чанков пересчитываются")
+        rebuild_refs(engine, client, bucket_name)
+    return sweep_chunks(engine, client, bucket_name, grace_hours)
@@ -0,0 +1,45 @@
+"""
+Публикация задач в брокер Celery без импорта модуля задач.
+
+Модуль задач (app.services.celery) тянет за собой Celery worker-конфигурацию,
+синхронный движок БД и внешние API. Задачи отправляются по имени через
+send_task лёгким экземпляром Celery, созданным при первом вызове.
+API в брокер не пишет: задачи попадают в таблицу task_outbox и публикуются
+процессом app.relay.
+"""
+
+from functools import lru_cache
+from typing import Iterable, Tuple
+
+from app.config import celery_settings as settings
+
+ZIP_QUEUE = "zip_queue"
+
+# Очередь для каждой задачи, публикуемой через outbox
+TASK_QUEUES = {"process_zip_task": ZIP_QUEUE}
+
+
+@lru_cache
+def get_dispatch_app():
+    """Экземпляр Celery только для отправки задач."""
+    from celery import Celery  # type: ignore
+
+    return Celery("tasks", broker=settings.CELERY_BROKER_URL)
+
+
+def publish_tasks(messages: Iterable[Tuple[str, str]]) -> None:
+    """
+    Публикует задачи в брокер через одно соединение.
+
+    Args:
+        messages (Iterable[Tuple[str, str]]): Пары (имя задачи, task_id).
+    """
+    dispatch_app = get_dispatch_app()
+    with dispatch_app.producer_or_acquire() as producer:
+        for task_name, task_id in messages:
+            dispatch_app.send_task(
+                task_name,
+                args=[task_id],
+                queue=TASK_QUEUES.get(task_name),
+                producer=producer,
+            )
@@ -0,0 +1,243 @@
+"""
+Модели исполнения воркера Celery и вынос CPU-bound этапов в пул процессов.
+
+Поддерживаемые модели (флаг -P у celery worker):
+    eventlet, gevent - зелёные потоки, подходят для ожидания внешних API;
+    threads          - потоки ОС;
+    prefork          - отдельные процессы (каждая задача в своём процессе);
+    solo             - одна задача за раз, для отладки.
+
+В зелёных и потоковых моделях CPU-bound работа (проверка хэша, разбор ZIP)
+блокирует либо весь hub, либо GIL, поэтому она выполняется в пуле процессов.
+В prefork задача и так выполняется в отдельном процессе, а дочерние процессы
+Celery являются демонами и не могут порождать свои процессы, поэтому там
+CPU-bound этапы выполняются на месте.
+"""
+
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import sys
+import zipfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+GREEN_POOLS = ("eventlet", "gevent")
+
+
+class InvalidArchiveError(ValueError):
+    """Архив повреждён или не совпадает с хэшем: повторная попытка не поможет."""
+
+
+@dataclass(frozen=True)
+class PoolProfile:
+    """Параметры воркера для выбранной модели исполнения."""
+
+    pool: str
+    concurrency: int
+    prefetch_multiplier: int
+    offload_cpu: bool
+
+
+def get_pool_profile(pool: str, concurrency: Optional[int] = None) -> PoolProfile:
+    """
+    Возвращает параметры воркера для модели исполнения.
+
+    Args:
+        pool (str): Название модели (eventlet, gevent, threads, prefork, solo).
+        concurrency (Optional[int]): Явно заданная конкурентность.
+
+    Returns:
+        PoolProfile: Параметры воркера.
+
+    Raises:
+        ValueError: Если модель исполнения не поддерживается.
+    """
+    cpu_count = os.cpu_count() or 1
+
+    # Задача большую часть времени ждёт внешние API, поэтому для зелёных
+    # потоков и потоков ОС конкурентность существенно выше числа ядер.
+    # prefetch_multiplier=1 - задачи длинные, не держим их в буфере воркера.
+    defaults = {
+        "eventlet": (100, True),
+        "gevent": (100, True),
+        "threads": (cpu_count * 4, True),
+        "prefork": (cpu_count, False),
+        "solo": (1, False),
+    }
+    if pool not in defaults:
+        raise ValueError(f"Неподдерживаемая модель исполнения воркера: {pool}")
+
+    default_concurrency, offload_cpu = defaults[pool]
+    if pool == "solo":
+        concurrency = 1
+
+    return PoolProfile(
+        pool=pool,
+        concurrency=concurrency or default_concurrency,
+        prefetch_multiplier=1,
+        offload_cpu=offload_cpu,
+    )
+
+
+def detect_running_pool() -> Optional[str]:
+    """
+    Определяет модель исполнения текущего процесса.
+
+    Celery применяет monkey patching для eventlet/gevent до импорта приложения,
+    поэтому при импорте модуля задач результат уже корректен.
+    """
+    if "eventlet" in sys.modules:
+        from eventlet import patcher  # type: ignore
+
+        if patcher.is_monkey_patched("socket"):
+            return "eventlet"
+
+    if "gevent" in sys.modules:
+        from gevent import monkey  # type: ignore
+
+        if monkey.is_module_patched("socket"):
+            return "gevent"
+
+    if multiprocessing.current_process().daemon:
+        return "prefork"
+
+    return None
+
+
+@lru_cache
+def get_runtime_profile(configured_pool: str) -> PoolProfile:
+    """
+    Возвращает параметры фактической модели исполнения процесса.
+
+    Вычисляется при первом обращении из задачи: в prefork это происходит уже
+    в дочернем процессе, поэтому модель определяется верно, даже если
+    WORKER_POOL в настройках не совпадает с флагом -P.
+    """
+    return get_pool_profile(detect_running_pool() or configured_pool)
+
+
+def make_green_safe(pool: Optional[str]) -> None:
+    """
+    Делает драйвер PostgreSQL совместимым с зелёными потоками.
+
+    psycopg2 - C-расширение и не затрагивается monkey patching, без psycogreen
+    (зависимость проекта) каждый запрос к БД блокирует все зелёные потоки воркера.
+    redis-py и minio (urllib3) работают через socket и патчатся автоматически.
+    """
+    if pool not in GREEN_POOLS:
+        return
+
+    try:
+        if pool == "eventlet":
+            from psycogreen.eventlet import patch_psycopg  # type: ignore
+        else:
+            from psycogreen.gevent import patch_psycopg  # type: ignore
+    except ImportError:
+        logger.warning(
+            f"psycogreen не установлен: запросы к БД блокируют hub {pool}"
+        )
+        return
+
+    patch_psycopg()
+
+
+_cpu_executor: Optional[Executor] = None
+
+
+def get_cpu_executor(max_workers: Optional[int] = None) -> Executor:
+    """Возвращает пул процессов для CPU-bound этапов, создавая его при первом обращении."""
+    global _cpu_executor
+    if _cpu_executor is None:
+        # spawn - форк процесса с запущенным hub eventlet/gevent небезопасен
+        _cpu_executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _cpu_executor
+
+
+def shutdown_cpu_executor() -> None:
+    """Останавливает пул процессов (вызывается при остановке воркера)."""
+    global _cpu_executor
+    if _cpu_executor is not None:
+        _cpu_executor.shutdown(wait=True, cancel_futures=True)
+        _cpu_executor = None
+
+
+def run_cpu_bound(
+    profile: PoolProfile,
+    func: Callable[..., Any],
+    *args: Any,
+    max_workers: Optional[int] = None,
+) -> Any:
+    """
+    Выполняет CPU-bound функцию в соответствии с моделью исполнения.
+
+    Args:
+        profile (PoolProfile): Параметры воркера.
+        func (Callable): Функция уровня модуля (должна сериализоваться pickle).
+        *args: Аргументы функции.
+        max_workers (Optional[int]): Размер пула процессов.
+
+    Returns:
+        Any: Результат функции.
+    """
+    if not profile.offload_cpu:
+        return func(*args)
+
+    future = get_cpu_executor(max_workers).submit(func, *args)
+
+    # Ожидание результата уводим в настоящий поток ОС, чтобы hub
+    # зелёных потоков продолжал обслуживать остальные задачи.
+    if profile.pool == "eventlet":
+        from eventlet import tpool  # type: ignore
+
+        return tpool.execute(future.result)
+    if profile.pool == "gevent":
+        from gevent import get_hub  # type: ignore
+
+        return get_hub().threadpool.apply(future.result)
+
+    return future.result()
+
+
+def inspect_archive(file_data: bytes, expected_hash: Optional[str] = None) -> dict:
+    """
+    Проверяет целостность архива: хэш содержимого и CRC всех файлов внутри ZIP.
+
+    Args:
+        file_data (bytes): Содержимое архива.
+        expected_hash (Optional[str]): Ожидаемый SHA-256 (идентификатор задачи).
+
+    Returns:
+        dict: Сводка по архиву (количество файлов, размер после распаковки, хэш).
+
+    Raises:
+        InvalidArchiveError: Если хэш не совпадает или архив повреждён.
+    """
+    file_hash = hashlib.sha256(file_data).hexdigest()
+    if expected_hash is not None and file_hash != expected_hash:
+        raise InvalidArchiveError(f"Хэш архива {file_hash} не совпадает с {expected_hash}")
+
+    try:
+        with zipfile.ZipFile(io.BytesIO(file_data)) as archive:
+            members = archive.infolist()
+            broken = archive.testzip()
+    except zipfile.BadZipFile as e:
+        raise InvalidArchiveError(f"Повреждённый ZIP-архив: {e}")
+
+    if broken is not None:
+        raise InvalidArchiveError(f"Ошибка CRC у файла {broken}")
+
+    return {
+        "sha256": file_hash,
+        "files": sum(1 for member in members if not member.is_dir()),
+        "uncompressed_size": sum(member.file_size for member in members),
+    }
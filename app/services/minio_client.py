@@ -1,41 +1,96 @@
 import io
+import logging
+from functools import lru_cache
+from typing import Iterable, List
+
 from minio import Minio
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 from app.config import minio_settings as settings
-
-minio_client = Minio(
-    endpoint=settings.MINIO_ENDPOINT,
-    access_key=settings.MINIO_ROOT_USER,
-    secret_key=settings.MINIO_ROOT_PASSWORD,
-    secure=False,
+from app.services.chunk_store import (
+    MANIFEST_PREFIX,
+    chunk_archive,
+    iter_archive,
+    load_manifest,
+    manifest_object,
+    retire_manifests,
+    store_archive,
 )
 
+logger = logging.getLogger(__name__)
+
+# Архивы читаются в обоих форматах независимо от MINIO_STORAGE_MODE,
+# поэтому режим можно переключать без переноса уже загруженных архивов
+CHUNKED_MODE = "chunked"
+
+
+def chunked_storage() -> bool:
+    return settings.MINIO_STORAGE_MODE == CHUNKED_MODE
+
+
+def archive_objects(file_hash: str) -> List[str]:
+    """Объекты архива в MinIO: целый объект и манифест чанков (есть один из них)."""
+    return [file_hash, manifest_object(file_hash)]
+
+
+@lru_cache
+def get_minio_client() -> Minio:
+    """Клиент MinIO, создаётся при первом обращении."""
+    return Minio(
+        endpoint=settings.MINIO_ENDPOINT,
+        access_key=settings.MINIO_ROOT_USER,
+        secret_key=settings.MINIO_ROOT_PASSWORD,
+        secure=False,
+    )
+
 
 def file_exists_in_minio(file_hash: str) -> bool:
-    """Проверяет, существует ли файл с данным хешем в MinIO."""
-    try:
-        minio_client.stat_object(settings.MINIO_BUCKET_NAME, file_hash)
-        return True
-    except S3Error:
-        return False
+    """Проверяет, существует ли файл с данным хешем в MinIO (в любом формате)."""
+    names = archive_objects(file_hash)
+    if chunked_storage():
+        names.reverse()
+
+    for name in names:
+        try:
+            get_minio_client().stat_object(settings.MINIO_BUCKET_NAME, name)
+            return True
+        except S3Error:
+            continue
+    return False
 
 
 def ensure_bucket_exists():
     """Создает бакет, если его нет."""
     try:
-        if not minio_client.bucket_exists(settings.MINIO_BUCKET_NAME):
-            minio_client.make_bucket(settings.MINIO_BUCKET_NAME)
+        if not get_minio_client().bucket_exists(settings.MINIO_BUCKET_NAME):
+            get_minio_client().make_bucket(settings.MINIO_BUCKET_NAME)
     except S3Error as e:
-        print(f"Ошибка MinIO: {e}")
+        logger.error(f"Ошибка MinIO: {e}")
 
 
 def upload_to_minio(file_data: bytes, file_hash: str):
-    """Загружает файл в MinIO."""
+    """Загружает файл в MinIO целиком или чанками (MINIO_STORAGE_MODE)."""
     ensure_bucket_exists()
 
+    if chunked_storage():
+        # Нативный FastCDC (около 1 ГБ/с): нарезка в текущем потоке дешевле,
+        # чем копирование архива в пул процессов
+        chunks = chunk_archive(
+            file_data,
+            settings.MINIO_CHUNK_MIN_SIZE,
+            settings.MINIO_CHUNK_AVG_SIZE,
+            settings.MINIO_CHUNK_MAX_SIZE,
+        )
+        stats = store_archive(get_minio_client(), file_hash, file_data, chunks, settings)
+        logger.info(
+            f"Архив {file_hash}: чанков {stats.chunks}, новых {stats.new_chunks}, "
+            f"записано {stats.new_bytes} из {len(file_data)} байт"
+        )
+        return True
+
     file_stream = io.BytesIO(file_data)  # Обернем в поток
 
-    minio_client.put_object(
+    get_minio_client().put_object(
         bucket_name=settings.MINIO_BUCKET_NAME,
         object_name=file_hash,
         data=file_stream,
@@ -46,24 +101,78 @@ def upload_to_minio(file_data: bytes, file_hash: str):
 
 
 def download_from_minio(file_hash: str) -> bytes | None:
-    """Загружает файл из MinIO и возвращает его в виде байтов."""
+    """
+    Загружает файл из MinIO и возвращает его в виде байтов.
+    Архив, сохранённый чанками, собирается по манифесту.
+    """
+    readers = [read_object, read_chunked]
+    if chunked_storage():
+        readers.reverse()
+
+    for reader in readers:
+        try:
+            return reader(file_hash)
+        except S3Error as e:
+            if e.code == "NoSuchKey" and reader is not readers[-1]:
+                continue
+            logger.error(f"Ошибка загрузки файла из MinIO: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка загрузки файла из MinIO: {e}")
+            return None
+
+
+def read_object(file_hash: str) -> bytes:
+    """Архив, сохранённый одним объектом."""
+    response = get_minio_client().get_object(
+        bucket_name=settings.MINIO_BUCKET_NAME,
+        object_name=file_hash,
+    )
     try:
-        response = minio_client.get_object(
-            bucket_name=settings.MINIO_BUCKET_NAME,
-            object_name=file_hash,
-        )
-        file_data = response.read()
-        return file_data
-    except Exception as e:
-        print(f"Ошибка загрузки файла из MinIO: {e}")
-        return None
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def read_chunked(file_hash: str) -> bytes:
+    """Архив, сохранённый чанками."""
+    client = get_minio_client()
+    manifest = load_manifest(client, settings.MINIO_BUCKET_NAME, file_hash)
+    return b"".join(iter_archive(client, settings.MINIO_BUCKET_NAME, manifest))
 
 
 def delete_from_minio(file_hash: str) -> bool:
-    """Удаляет файл из MinIO."""
-    try:
-        minio_client.remove_object(settings.MINIO_BUCKET_NAME, file_hash)
-        return True
-    except S3Error as e:
-        print(f"Ошибка удаления файла из MinIO: {e}")
-        return False
+    """
+    Удаляет файл из MinIO. У архива, сохранённого чанками, удаляется манифест,
+    чанки без ссылок удаляет сборка мусора (collect_chunks).
+    """
+    return not delete_many_from_minio(archive_objects(file_hash))
+
+
+def delete_many_from_minio(file_hashes: Iterable[str]) -> List[str]:
+    """
+    Удаляет несколько файлов из MinIO одним запросом (DeleteObjects).
+    Манифесты чанков сначала копируются для сборки мусора (retire_manifests).
+
+    Returns:
+        List[str]: Хеши файлов, которые удалить не удалось.
+    """
+    file_hashes = list(file_hashes)
+    failed = retire_manifests(
+        get_minio_client(),
+        settings.MINIO_BUCKET_NAME,
+        [name for name in file_hashes if name.startswith(MANIFEST_PREFIX)],
+    )
+    delete_list = [
+        DeleteObject(file_hash) for file_hash in file_hashes if file_hash not in failed
+    ]
+    if not delete_list:
+        return failed
+
+    # remove_objects ленивый: запросы выполняются при итерации по ошибкам
+    errors = get_minio_client().remove_objects(settings.MINIO_BUCKET_NAME, delete_list)
+    for error in errors:
+        logger.error(f"Ошибка удаления файла из MinIO: {error}")
+        failed.append(error.name)
+    return failed
@@ -0,0 +1,74 @@
+"""
+Публикация сообщений из таблицы task_outbox в брокер Celery (relay).
+
+Сообщения выбираются пачкой в порядке id с FOR UPDATE SKIP LOCKED, поэтому
+несколько экземпляров relay не публикуют одно сообщение одновременно.
+Пачка помечается опубликованной в той же транзакции после отправки всех
+сообщений. Если публикация прервалась, транзакция откатывается и пачка будет
+отправлена повторно (доставка "хотя бы один раз"): воркер не берёт задачу,
+которая уже выполняется по действующей аренде или завершилась успешно.
+"""
+
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy import Engine, func, select, update
+
+from app.config import OutboxSettings
+from app.models.task_outbox import TaskOutbox
+from app.services.dispatch import publish_tasks
+
+logger = logging.getLogger(__name__)
+
+
+def relay_batch(engine: Engine, batch_size: int) -> int:
+    """
+    Публикует одну пачку неопубликованных сообщений.
+
+    Returns:
+        int: Количество опубликованных сообщений.
+    """
+    with engine.begin() as connection:
+        rows = connection.execute(
+            select(TaskOutbox.id, TaskOutbox.task_name, TaskOutbox.task_id)
+            .where(TaskOutbox.sent_at.is_(None))
+            .order_by(TaskOutbox.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            return 0
+
+        publish_tasks((row.task_name, row.task_id) for row in rows)
+
+        connection.execute(
+            update(TaskOutbox)
+            .where(TaskOutbox.id.in_([row.id for row in rows]))
+            .values(sent_at=func.now())
+        )
+
+    return len(rows)
+
+
+def run_relay(
+    engine: Engine,
+    settings: OutboxSettings,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """
+    Публикует сообщения, пока не установлен stop. Полные пачки идут подряд,
+    после неполной - пауза OUTBOX_POLL_INTERVAL секунд.
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            count = relay_batch(engine, settings.OUTBOX_BATCH_SIZE)
+        except Exception as e:
+            logger.error(f"Ошибка публикации сообщений outbox: {e}")
+            count = 0
+
+        if count:
+            logger.info(f"Опубликовано задач: {count}")
+        if count < settings.OUTBOX_BATCH_SIZE:
+            stop.wait(settings.OUTBOX_POLL_INTERVAL)
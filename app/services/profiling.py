@@ -0,0 +1,372 @@
+"""
+Диагностика производительности по запросу: сэмплирующий профилировщик,
+снимки памяти tracemalloc и журнал медленных этапов.
+
+Профилировщик раз в PROFILING_INTERVAL секунд снимает стеки потоков через
+sys._current_frames() из отдельного потока ОС и пишет их в формате collapsed
+stacks ("frame;frame;frame count"), который понимают flamegraph.pl, speedscope
+и inferno. Профилируемый код не инструментируется, накладные расходы
+ограничены частотой сэмплирования.
+
+В воркерах eventlet/gevent все зелёные потоки выполняются в одном потоке ОС,
+поэтому профиль задачи включает и другие задачи, выполнявшиеся одновременно.
+Для точного профиля одной задачи воркер запускается с -P solo.
+"""
+
+import _thread
+import hmac
+import logging
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import ProfilingSettings, profiling_settings
+
+logger = logging.getLogger(__name__)
+
+# Заголовок запроса, включающий профилирование (значение - PROFILING_TOKEN)
+PROFILE_HEADER = "X-Profile-Token"
+# Заголовок ответа с именем файла профиля
+PROFILE_FILE_HEADER = "X-Profile-File"
+
+# Сколько снимков памяти хранится для сравнения
+MAX_MEMORY_SNAPSHOTS = 5
+
+# Служебные кадры, не относящиеся к приложению
+MEMORY_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def profiling_allowed(token: Optional[str], settings: ProfilingSettings) -> bool:
+    """
+    Разрешено ли профилирование для значения заголовка PROFILE_HEADER.
+    Без PROFILING_TOKEN профилирование по запросу недоступно никому.
+    """
+    if not settings.PROFILING_ENABLED or not settings.PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token, settings.PROFILING_TOKEN)
+
+
+# Пользователи трассировки памяти: профили задач, выполняющиеся одновременно
+# (eventlet, threads), и снимки API. Трассировка останавливается последним
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def acquire_tracing(frames: int) -> None:
+    """Запускает tracemalloc, если он ещё не запущен, и учитывает пользователя."""
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0:
+            # Трассировку, запущенную извне (PYTHONTRACEMALLOC), не останавливаем
+            _tracing_owned = not tracemalloc.is_tracing()
+            if _tracing_owned:
+                tracemalloc.start(frames)
+        _tracing_users += 1
+
+
+def release_tracing() -> None:
+    """Снимает пользователя трассировки, последний останавливает её."""
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users = max(_tracing_users - 1, 0)
+        if _tracing_users == 0 and _tracing_owned and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def os_thread_api() -> Tuple[Callable, Callable, Callable]:
+    """
+    start_new_thread, get_ident и sleep потоков ОС в обход monkey patching:
+    поток сэмплирования должен работать независимо от hub зелёных потоков.
+    """
+    if "eventlet" in sys.modules:
+        from eventlet import patcher  # type: ignore
+
+        thread = patcher.original("_thread")
+        return thread.start_new_thread, thread.get_ident, patcher.original("time").sleep
+    if "gevent" in sys.modules:
+        from gevent import monkey  # type: ignore
+
+        start_new_thread, get_ident = monkey.get_original(
+            "_thread", ["start_new_thread", "get_ident"]
+        )
+        return start_new_thread, get_ident, monkey.get_original("time", "sleep")
+    return _thread.start_new_thread, _thread.get_ident, time.sleep
+
+
+def collapse_stack(frame) -> str:
+    """Стек кадра в формате collapsed stacks: от корня к вершине через ';'."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик потоков текущего процесса."""
+
+    def __init__(
+        self,
+        interval: float,
+        thread_ids: Optional[Iterable[int]] = None,
+        max_duration: Optional[float] = None,
+    ):
+        """
+        Args:
+            interval (float): Период сэмплирования (сек).
+            thread_ids (Optional[Iterable[int]]): Потоки ОС для сэмплирования,
+                None - все потоки процесса (стек начинается с имени потока).
+            max_duration (Optional[float]): Сэмплирование прекращается
+                через это время (сек), даже если stop() не вызван.
+        """
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.max_duration = max_duration
+        self.samples: Counter = Counter()
+        self._running = False
+        self._finished = False
+
+    def start(self) -> "StackSampler":
+        start_new_thread, _, _ = os_thread_api()
+        self._running = True
+        self._finished = False
+        start_new_thread(self._run, ())
+        return self
+
+    def stop(self) -> Counter:
+        """Останавливает сэмплирование и возвращает количество сэмплов по стекам."""
+        self._running = False
+        # Ждём последний сэмпл; в зелёных потоках time.sleep не блокирует hub
+        while not self._finished:
+            time.sleep(self.interval)
+        return self.samples
+
+    def sample(self, own_id: Optional[int] = None) -> None:
+        """Снимает один сэмпл стеков."""
+        names = None
+        if self.thread_ids is None:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            if self.thread_ids is not None and thread_id not in self.thread_ids:
+                continue
+            stack = collapse_stack(frame)
+            if names is not None:
+                stack = f"{names.get(thread_id, thread_id)};{stack}"
+            self.samples[stack] += 1
+
+    def _run(self) -> None:
+        _, get_ident, sleep = os_thread_api()
+        own_id = get_ident()
+        deadline = (
+            time.monotonic() + self.max_duration if self.max_duration else None
+        )
+        try:
+            while self._running:
+                if deadline is not None and time.monotonic() > deadline:
+                    logger.warning("Профилирование прервано по PROFILING_MAX_DURATION")
+                    break
+                self.sample(own_id)
+                sleep(self.interval)
+        finally:
+            self._finished = True
+
+
+def write_profile(
+    samples: Counter, kind: str, name: str, directory: Optional[str] = None
+) -> Path:
+    """
+    Записывает профиль в формате collapsed stacks.
+
+    Args:
+        samples (Counter): Количество сэмплов по стекам.
+        kind (str): Источник профиля (api, task).
+        name (str): Имя запроса или задачи, попадает в имя файла.
+        directory (Optional[str]): Каталог, по умолчанию PROFILING_DIR.
+
+    Returns:
+        Path: Путь к файлу профиля.
+    """
+    path = profile_path(kind, name, ".folded", directory)
+    with path.open("w", encoding="utf-8") as file:
+        for stack, count in samples.most_common():
+            file.write(f"{stack} {count}\n")
+    return path
+
+
+def profile_path(
+    kind: str, name: str, suffix: str, directory: Optional[str] = None
+) -> Path:
+    """Путь к новому файлу профиля, каталог создаётся при необходимости."""
+    root = Path(directory or profiling_settings.PROFILING_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")[:100]
+    return root / f"{kind}-{safe_name}-{stamp}{suffix}"
+
+
+class TaskProfile:
+    """Профиль одной задачи воркера: стеки и прирост памяти за время выполнения."""
+
+    def __init__(self, name: str, settings: ProfilingSettings):
+        self.name = name
+        self.settings = settings
+        _, get_ident, _ = os_thread_api()
+        self.sampler = StackSampler(
+            settings.PROFILING_INTERVAL,
+            thread_ids=[get_ident()],
+            max_duration=settings.PROFILING_MAX_DURATION,
+        )
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> "TaskProfile":
+        acquire_tracing(self.settings.PROFILING_TRACEMALLOC_FRAMES)
+        self._snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS)
+        self.sampler.start()
+        return self
+
+    def stop(self) -> Path:
+        """Останавливает профилирование и записывает файлы профиля."""
+        samples = self.sampler.stop()
+        path = write_profile(samples, "task", self.name, self.settings.PROFILING_DIR)
+
+        try:
+            current = tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            release_tracing()
+
+        with path.with_suffix(".memory.txt").open("w", encoding="utf-8") as file:
+            file.write(f"peak {peak}\n")
+            for stat in memory_stats(current, self._snapshot, limit=50):
+                file.write(
+                    f"{stat['location']} size={stat['size']} "
+                    f"size_diff={stat['size_diff']} count_diff={stat['count_diff']}\n"
+                )
+        return path
+
+
+# Профили выполняющихся задач (по идентификатору запроса Celery)
+_task_profiles: Dict[str, TaskProfile] = {}
+
+
+def start_task_profile(task_id: str, name: str) -> None:
+    """Начинает профилирование задачи, если профилирование включено."""
+    if not profiling_settings.PROFILING_ENABLED:
+        return
+    _task_profiles[task_id] = TaskProfile(name, profiling_settings).start()
+
+
+def finish_task_profile(task_id: str) -> Optional[Path]:
+    """Завершает профилирование задачи, если оно было начато."""
+    profile = _task_profiles.pop(task_id, None)
+    if profile is None:
+        return None
+    return profile.stop()
+
+
+def memory_stats(
+    snapshot: tracemalloc.Snapshot,
+    base: Optional[tracemalloc.Snapshot] = None,
+    limit: int = 20,
+) -> List[dict]:
+    """
+    Крупнейшие места выделения памяти (или её прироста относительно base)
+    по строкам исходного кода.
+    """
+    if base is None:
+        stats = snapshot.statistics("lineno")
+    else:
+        stats = snapshot.compare_to(base, "lineno")
+
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size": stat.size,
+            "count": stat.count,
+            "size_diff": getattr(stat, "size_diff", 0),
+            "count_diff": getattr(stat, "count_diff", 0),
+        }
+        for stat in stats[:limit]
+    ]
+
+
+class MemorySnapshots:
+    """Снимки памяти tracemalloc процесса API для поиска утечек."""
+
+    def __init__(self, max_snapshots: int = MAX_MEMORY_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self.snapshots: "OrderedDict[int, tracemalloc.Snapshot]" = OrderedDict()
+        self._next_id = 1
+        self._tracing = False
+
+    def start(self, frames: int) -> None:
+        if not self._tracing:
+            acquire_tracing(frames)
+            self._tracing = True
+
+    def stop(self) -> None:
+        if self._tracing:
+            release_tracing()
+            self._tracing = False
+        self.snapshots.clear()
+
+    def take(self) -> Tuple[int, tracemalloc.Snapshot]:
+        """
+        Снимок текущего состояния памяти, сохраняется для сравнения.
+
+        Raises:
+            RuntimeError: Если трассировка памяти не запущена.
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Трассировка памяти не запущена")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS)
+        snapshot_id = self._next_id
+        self._next_id += 1
+        self.snapshots[snapshot_id] = snapshot
+        while len(self.snapshots) > self.max_snapshots:
+            self.snapshots.popitem(last=False)
+        return snapshot_id, snapshot
+
+
+memory_snapshots = MemorySnapshots()
+
+
+@contextmanager
+def slow_stage(stage: str, threshold: Optional[float], **context) -> Iterator[None]:
+    """
+    Журналирует этап, выполнявшийся дольше threshold секунд.
+
+    Args:
+        stage (str): Название этапа (hash, minio:upload, analyzer:coverage, ...).
+        threshold (Optional[float]): Порог (сек), None - не журналировать.
+        **context: Дополнительные сведения для журнала (task_id, размер, ...).
+    """
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        elapsed = time.monotonic() - started
+        if threshold is not None and elapsed > threshold:
+            details = ", ".join(f"{key}={value}" for key, value in context.items())
+            logger.warning(
+                f"Медленный этап {stage}: {elapsed:.2f} сек "
+                f"при пороге {threshold} сек ({details})"
+            )
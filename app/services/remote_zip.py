@@ -0,0 +1,241 @@
+"""
+Чтение ZIP-архивов прямо из MinIO по HTTP Range-запросам.
+
+MinioRangeFile - файлоподобный объект с поддержкой seek, который zipfile
+открывает как обычный файл. Данные читаются блоками с LRU-кэшем: сначала
+хвост объекта с записью конца центрального каталога (EOCD), затем только
+центральный каталог и запрошенные файлы. Для списка файлов многогигабайтного
+архива скачиваются килобайты вместо всего объекта.
+
+Архив, сохранённый чанками (см. chunk_store), читается через ChunkedRangeFile:
+диапазон отображается на чанки по манифесту, скачиваются только нужные чанки.
+"""
+
+import io
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+from minio import Minio
+from minio.error import S3Error
+
+from app.config import minio_settings as settings
+from app.services.chunk_store import chunk_offsets, load_manifest, read_range
+from app.services.minio_client import chunked_storage, get_minio_client
+
+# EOCD (22 байта) и комментарий архива (до 65535 байт) всегда в конце файла
+EOCD_MAX_SIZE = 22 + 0xFFFF
+
+
+class MinioRangeFile(io.RawIOBase):
+    """Объект MinIO, доступный на чтение с произвольной позиции."""
+
+    def __init__(
+        self,
+        object_name: str,
+        client: Optional[Minio] = None,
+        bucket_name: Optional[str] = None,
+        block_size: Optional[int] = None,
+        cache_blocks: Optional[int] = None,
+    ):
+        super().__init__()
+        self.object_name = object_name
+        self.client = client or get_minio_client()
+        self.bucket_name = bucket_name or settings.MINIO_BUCKET_NAME
+        self.block_size = block_size or settings.MINIO_RANGE_BLOCK_SIZE
+        self.cache_blocks = cache_blocks or settings.MINIO_RANGE_CACHE_BLOCKS
+
+        self.size = self._object_size()
+        self.position = 0
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+
+        # Статистика для логов и тестов
+        self.requests = 0
+        self.bytes_fetched = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Некорректное значение whence: {whence}")
+
+        if position < 0:
+            raise ValueError(f"Отрицательная позиция: {position}")
+        self.position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        end = min(self.position + len(buffer), self.size)
+        if self.position >= end:
+            return 0
+
+        data = self._read_range(self.position, end)
+        buffer[: len(data)] = data
+        self.position = end
+        return len(data)
+
+    def prefetch_tail(self) -> None:
+        """Загружает одним запросом хвост объекта, где zipfile ищет EOCD."""
+        self._load_blocks(max(0, self.size - EOCD_MAX_SIZE), self.size)
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        blocks = self._load_blocks(start, end)
+        first = start // self.block_size
+        data = b"".join(blocks[index] for index in range(first, first + len(blocks)))
+        offset = start - first * self.block_size
+        return data[offset : offset + end - start]
+
+    def _load_blocks(self, start: int, end: int) -> Dict[int, bytes]:
+        """
+        Возвращает блоки, покрывающие [start, end). Недостающие блоки подряд
+        загружаются одним Range-запросом.
+        """
+        first = start // self.block_size
+        last = (end - 1) // self.block_size
+
+        blocks = {}
+        missing = []
+        for index in range(first, last + 1):
+            if index in self._blocks:
+                self._blocks.move_to_end(index)
+                blocks[index] = self._blocks[index]
+            else:
+                missing.append(index)
+
+        if missing:
+            offset = missing[0] * self.block_size
+            length = min((missing[-1] + 1) * self.block_size, self.size) - offset
+            data = self._fetch(offset, length)
+            for index in range(missing[0], missing[-1] + 1):
+                block_start = (index - missing[0]) * self.block_size
+                blocks[index] = data[block_start : block_start + self.block_size]
+                self._remember(index, blocks[index])
+
+        return blocks
+
+    def _remember(self, index: int, block: bytes) -> None:
+        self._blocks[index] = block
+        self._blocks.move_to_end(index)
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+
+    def _object_size(self) -> int:
+        return self.client.stat_object(self.bucket_name, self.object_name).size
+
+    def _fetch(self, offset: int, length: int) -> bytes:
+        response = self.client.get_object(
+            self.bucket_name, self.object_name, offset=offset, length=length
+        )
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        return data
+
+
+class ChunkedRangeFile(MinioRangeFile):
+    """Архив, сохранённый чанками, доступный на чтение с произвольной позиции."""
+
+    def _object_size(self) -> int:
+        self.manifest = load_manifest(self.client, self.bucket_name, self.object_name)
+        self.offsets = chunk_offsets(self.manifest)
+        return self.manifest["size"]
+
+    def _fetch(self, offset: int, length: int) -> bytes:
+        data = read_range(
+            self.client, self.bucket_name, self.manifest, self.offsets, offset, length
+        )
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        return data
+
+
+def open_archive_file(object_name: str, **kwargs) -> MinioRangeFile:
+    """
+    Открывает архив в том формате, в котором он сохранён: сначала пробуется
+    формат текущего MINIO_STORAGE_MODE.
+
+    Raises:
+        S3Error: Если архива нет ни в одном формате.
+    """
+    classes = [MinioRangeFile, ChunkedRangeFile]
+    if chunked_storage():
+        classes.reverse()
+
+    try:
+        return classes[0](object_name, **kwargs)
+    except S3Error as e:
+        if e.code != "NoSuchKey":
+            raise
+    return classes[1](object_name, **kwargs)
+
+
+@contextmanager
+def open_remote_zip(object_name: str, **kwargs) -> Iterator[zipfile.ZipFile]:
+    """
+    Открывает архив из MinIO без полной загрузки.
+
+    Raises:
+        S3Error: Если объекта нет в MinIO.
+        zipfile.BadZipFile: Если объект не является ZIP-архивом.
+    """
+    with open_archive_file(object_name, **kwargs) as remote_file:
+        remote_file.prefetch_tail()
+        with zipfile.ZipFile(remote_file) as archive:
+            yield archive
+
+
+def read_manifest(object_name: str, **kwargs) -> dict:
+    """
+    Список файлов архива по центральному каталогу, без чтения содержимого.
+
+    Returns:
+        dict: Количество файлов, размеры и описание каждого файла.
+    """
+    with open_remote_zip(object_name, **kwargs) as archive:
+        entries = [
+            {
+                "name": member.filename,
+                "size": member.file_size,
+                "compressed_size": member.compress_size,
+                "crc": member.CRC,
+            }
+            for member in archive.infolist()
+            if not member.is_dir()
+        ]
+
+    return {
+        "files": len(entries),
+        "uncompressed_size": sum(entry["size"] for entry in entries),
+        "compressed_size": sum(entry["compressed_size"] for entry in entries),
+        "entries": entries,
+    }
+
+
+def read_members(object_name: str, names: Iterable[str], **kwargs) -> Dict[str, bytes]:
+    """
+    Читает из архива только указанные файлы.
+
+    Raises:
+        KeyError: Если файла нет в архиве.
+    """
+    with open_remote_zip(object_name, **kwargs) as archive:
+        return {name: archive.read(name) for name in names}
@@ -0,0 +1,123 @@
+"""
+Подробные отчёты внешних анализаторов в MinIO.
+
+Находки анализаторов (по файлам) могут занимать мегабайты, поэтому в БД
+и кэш Redis попадает только сводка (TestResults) со ссылкой на отчёт, а сам
+отчёт хранится в MinIO рядом с архивом: JSON Lines (одна находка на строку),
+сжатые zstd. Страница находок читается потоковой распаковкой объекта,
+в памяти держится только сама страница.
+"""
+
+import io
+import json
+from contextlib import closing
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import zstandard
+
+from app.config import minio_settings as settings
+from app.services.minio_client import ensure_bucket_exists, get_minio_client
+
+REPORT_SUFFIX = ".report.jsonl.zst"
+REPORT_CONTENT_TYPE = "application/zstd"
+
+
+def report_object(task_id: str) -> str:
+    """Имя объекта отчёта задачи в бакете архивов."""
+    return f"{task_id}{REPORT_SUFFIX}"
+
+
+def encode_report(findings: Dict[str, List[dict]], level: int) -> Tuple[bytes, int]:
+    """
+    Сериализует находки в JSON Lines и сжимает zstd.
+    Выполняется в пуле процессов для CPU-bound этапов.
+
+    Args:
+        findings (Dict[str, List[dict]]): Находки по имени анализатора.
+        level (int): Уровень сжатия zstd.
+
+    Returns:
+        Tuple[bytes, int]: Сжатый отчёт и количество находок.
+    """
+    buffer = io.BytesIO()
+    count = 0
+    compressor = zstandard.ZstdCompressor(level=level)
+    with compressor.stream_writer(buffer, closefd=False) as writer:
+        for analyzer, items in findings.items():
+            for item in items:
+                line = json.dumps({"analyzer": analyzer, **item}, ensure_ascii=False)
+                writer.write(line.encode() + b"\n")
+                count += 1
+    return buffer.getvalue(), count
+
+
+def store_report(task_id: str, data: bytes, findings: int) -> dict:
+    """
+    Сохраняет сжатый отчёт в MinIO.
+
+    Returns:
+        dict: Ссылка на отчёт для сводки результатов.
+    """
+    ensure_bucket_exists()
+    object_name = report_object(task_id)
+    get_minio_client().put_object(
+        bucket_name=settings.MINIO_BUCKET_NAME,
+        object_name=object_name,
+        data=io.BytesIO(data),
+        length=len(data),
+        content_type=REPORT_CONTENT_TYPE,
+    )
+    return {"object": object_name, "findings": findings, "size": len(data)}
+
+
+def iter_report(task_id: str) -> Iterator[str]:
+    """
+    Строки отчёта (находки в JSON) по порядку, с потоковой распаковкой.
+
+    Raises:
+        S3Error: Если отчёта нет в MinIO (NoSuchKey) или MinIO недоступен.
+    """
+    response = get_minio_client().get_object(
+        settings.MINIO_BUCKET_NAME, report_object(task_id)
+    )
+    try:
+        reader = zstandard.ZstdDecompressor().stream_reader(response)
+        yield from io.TextIOWrapper(reader, encoding="utf-8")
+    finally:
+        # Соединение с недочитанным телом не возвращается в пул, а закрывается
+        response.close()
+        response.release_conn()
+
+
+def read_findings(
+    task_id: str,
+    offset: int,
+    limit: int,
+    analyzer: Optional[str] = None,
+) -> Tuple[List[dict], Optional[int]]:
+    """
+    Страница находок отчёта.
+
+    Args:
+        task_id (str): Идентификатор задачи.
+        offset (int): Номер строки отчёта, с которой начинается страница.
+        limit (int): Размер страницы.
+        analyzer (Optional[str]): Только находки указанного анализатора.
+
+    Returns:
+        Tuple[List[dict], Optional[int]]: Находки и номер строки следующей
+            страницы (None, если отчёт прочитан до конца).
+    """
+    items: List[dict] = []
+    with closing(iter_report(task_id)) as lines:
+        for position, line in enumerate(lines):
+            # Строки до начала страницы только распаковываются, без разбора JSON
+            if position < offset:
+                continue
+            finding = json.loads(line)
+            if analyzer is not None and finding.get("analyzer") != analyzer:
+                continue
+            if len(items) == limit:
+                return items, position
+            items.append(finding)
+    return items, None
@@ -0,0 +1,150 @@
+"""
+Политики хранения архивов и результатов проверки.
+
+Очистка выполняется небольшими пачками: строки выбираются по индексам
+в порядке возраста с FOR UPDATE SKIP LOCKED, блокировка держится только
+на строках текущей пачки и только на время её обработки.
+"""
+
+import logging
+from datetime import timedelta
+
+from redis import Redis
+from sqlalchemy import Engine, delete, func, select, update
+
+from app.models.task_outbox import TaskOutbox
+from app.models.task_result import TERMINAL_STATUSES, TaskResult, TaskStatusEnum
+from app.services.cache import etag_key, result_key
+from app.services.minio_client import archive_objects, delete_many_from_minio
+from app.services.reports import report_object
+
+logger = logging.getLogger(__name__)
+
+
+def purge_archives(engine: Engine, retention_hours: int, batch_size: int) -> int:
+    """
+    Удаляет из MinIO архивы задач, завершившихся SUCCESS раньше retention_hours назад.
+    Результаты проверки остаются в БД.
+
+    Returns:
+        int: Количество удалённых архивов.
+    """
+    cutoff = func.now() - timedelta(hours=retention_hours)
+
+    with engine.begin() as connection:
+        task_ids = (
+            connection.execute(
+                select(TaskResult.task_id)
+                .where(
+                    TaskResult.status == TaskStatusEnum.SUCCESS,
+                    TaskResult.archive_deleted_at.is_(None),
+                    TaskResult.updated_at < cutoff,
+                )
+                .order_by(TaskResult.updated_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        if not task_ids:
+            return 0
+
+        objects = {
+            name: task_id for task_id in task_ids for name in archive_objects(task_id)
+        }
+        failed = {objects[name] for name in delete_many_from_minio(objects)}
+        deleted = [task_id for task_id in task_ids if task_id not in failed]
+
+        if deleted:
+            connection.execute(
+                update(TaskResult)
+                .where(TaskResult.task_id.in_(deleted))
+                # updated_at не трогаем: от него отсчитывается срок хранения результатов
+                .values(archive_deleted_at=func.now(), updated_at=TaskResult.updated_at)
+            )
+
+    return len(deleted)
+
+
+def purge_results(
+    engine: Engine, redis_client: Redis, retention_days: int, batch_size: int
+) -> int:
+    """
+    Удаляет завершённые задачи старше retention_days дней вместе с архивами,
+    подробными отчётами и кэшем.
+    Результаты проверки (task_reports) удаляются каскадно.
+
+    Returns:
+        int: Количество удалённых задач.
+    """
+    cutoff = func.now() - timedelta(days=retention_days)
+
+    with engine.begin() as connection:
+        rows = connection.execute(
+            select(TaskResult.task_id, TaskResult.archive_deleted_at)
+            .where(
+                TaskResult.status.in_(TERMINAL_STATUSES),
+                TaskResult.updated_at < cutoff,
+            )
+            .order_by(TaskResult.updated_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            return 0
+
+        task_ids = [row.task_id for row in rows]
+
+        objects = {report_object(task_id): task_id for task_id in task_ids}
+        objects.update(
+            (name, row.task_id)
+            for row in rows
+            if row.archive_deleted_at is None
+            for name in archive_objects(row.task_id)
+        )
+        failed = {objects[name] for name in delete_many_from_minio(objects)}
+        # Строки, архив или отчёт которых удалить не удалось, оставляем до следующего запуска
+        deleted = [task_id for task_id in task_ids if task_id not in failed]
+
+        if deleted:
+            connection.execute(
+                delete(TaskResult).where(TaskResult.task_id.in_(deleted))
+            )
+
+    if deleted:
+        try:
+            # Ключи одной задачи в одном слоте: конвейер безопасен и для Redis Cluster
+            with redis_client.pipeline(transaction=False) as pipe:
+                for task_id in deleted:
+                    pipe.unlink(result_key(task_id), etag_key(task_id))
+                pipe.execute()
+        except Exception as e:
+            # Записи кэша всё равно истекут по TTL
+            logger.error(f"Ошибка удаления кэша задач: {e}")
+
+    return len(deleted)
+
+
+def purge_outbox(engine: Engine, retention_hours: int, batch_size: int) -> int:
+    """
+    Удаляет сообщения outbox, опубликованные раньше retention_hours назад.
+
+    Returns:
+        int: Количество удалённых сообщений.
+    """
+    cutoff = func.now() - timedelta(hours=retention_hours)
+
+    # Порядок по sent_at - чтение по индексу ix_task_outbox_sent_at: частичный
+    # индекс неопубликованных сообщений для этого условия не подходит
+    sent = (
+        select(TaskOutbox.id)
+        .where(TaskOutbox.sent_at < cutoff)
+        .order_by(TaskOutbox.sent_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    with engine.begin() as connection:
+        result = connection.execute(delete(TaskOutbox).where(TaskOutbox.id.in_(sent)))
+    return result.rowcount
@@ -0,0 +1,185 @@
+"""
+Предагрегированные показатели качества по дням (таблица quality_rollups).
+
+В транзакции, записывающей результаты успешной проверки, добавляются только
+приращения (quality_rollup_deltas): общие строки дня не блокируются, и успешные
+задачи не ждут друг друга. fold_rollups переносит приращения в quality_rollups
+и удаляет их одним запросом, поэтому каждый архив учитывается ровно один раз.
+Статистика за период читается по первичному ключу без разбора JSONB результатов,
+ещё не перенесённые приращения добавляются при чтении.
+
+Показатели за дни до появления таблицы заполняет backfill_rollups.
+Удаление задач политикой хранения показатели не уменьшает.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Connection, Engine, insert, text
+
+from app.models.quality_rollup import (
+    COVERAGE_METRIC,
+    SEVERITY_METRICS,
+    QualityRollupDelta,
+)
+
+BACKFILL_STATEMENT = """
+WITH reports AS (
+    SELECT CAST(created_at AT TIME ZONE 'UTC' AS date) AS day, results
+    FROM task_reports
+    WHERE created_at >= CAST(:date_from AS date) AT TIME ZONE 'UTC'
+      AND created_at < CAST(:date_to AS date) AT TIME ZONE 'UTC'
+), aggregated AS (
+    SELECT day, CAST(:coverage AS varchar) AS metric, CAST('' AS varchar) AS severity,
+           sum(CAST(results ->> 'overall_coverage' AS double precision)) AS value,
+           count(*) AS tasks
+    FROM reports
+    WHERE results -> 'overall_coverage' IS NOT NULL
+    GROUP BY day
+    UNION ALL
+    SELECT r.day, m.metric, s.key, sum(CAST(s.value AS double precision)), count(*)
+    FROM reports AS r
+    CROSS JOIN unnest(CAST(:metrics AS varchar[])) AS m(metric)
+    CROSS JOIN LATERAL jsonb_each_text(r.results -> m.metric) AS s
+    GROUP BY r.day, m.metric, s.key
+)
+), selected AS (
+    SELECT * FROM aggregated
+    WHERE :overwrite OR NOT EXISTS (
+        SELECT 1 FROM quality_rollups AS q WHERE q.day = aggregated.day
+    )
+), cleared AS (
+    -- Результаты пересчитанных дней уже учтены целиком, их приращения лишние
+    DELETE FROM quality_rollup_deltas
+    WHERE day IN (SELECT day FROM selected)
+)
+INSERT INTO quality_rollups (day, metric, severity, value, tasks)
+SELECT day, metric, severity, value, tasks
+FROM selected
+ON CONFLICT (day, metric, severity)
+DO UPDATE SET value = excluded.value, tasks = excluded.tasks
+"""
+
+FOLD_STATEMENT = """
+WITH folded AS (
+    DELETE FROM quality_rollup_deltas
+    WHERE id IN (
+        SELECT id FROM quality_rollup_deltas
+        ORDER BY id
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING day, metric, severity, value, tasks
+), applied AS (
+    INSERT INTO quality_rollups (day, metric, severity, value, tasks)
+    SELECT day, metric, severity, sum(value), sum(tasks)
+    FROM folded
+    GROUP BY day, metric, severity
+    ORDER BY day, metric, severity
+    ON CONFLICT (day, metric, severity)
+    DO UPDATE SET value = quality_rollups.value + excluded.value,
+                  tasks = quality_rollups.tasks + excluded.tasks
+)
+SELECT count(*) FROM folded
+"""
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def collect_rollups(reports: Iterable[dict]) -> Dict[Tuple[str, str], Tuple[float, int]]:
+    """
+    Суммирует показатели результатов проверки.
+
+    Returns:
+        Dict[Tuple[str, str], Tuple[float, int]]: (метрика, критичность) ->
+            (сумма, количество архивов).
+    """
+    totals: Dict[Tuple[str, str], list] = defaultdict(lambda: [0.0, 0])
+
+    def add(metric: str, severity: str, value) -> None:
+        if value is None:
+            return
+        totals[metric, severity][0] += value
+        totals[metric, severity][1] += 1
+
+    for results in reports:
+        add(COVERAGE_METRIC, "", results.get("overall_coverage"))
+        for metric in SEVERITY_METRICS:
+            for severity, value in (results.get(metric) or {}).items():
+                add(metric, severity, value)
+
+    return {key: (value, tasks) for key, (value, tasks) in totals.items()}
+
+
+def record_rollups(
+    connection: Connection, reports: Iterable[dict], day: Optional[date] = None
+) -> None:
+    """
+    Добавляет приращения показателей дня day (по умолчанию - текущего дня UTC),
+    по одной строке на показатель для всей пачки результатов.
+    Вызывается в транзакции, записывающей результаты проверки.
+    """
+    totals = collect_rollups(reports)
+    if not totals:
+        return
+
+    day = day or utc_today()
+    rows = [
+        {"day": day, "metric": metric, "severity": severity, "value": value, "tasks": tasks}
+        for (metric, severity), (value, tasks) in totals.items()
+    ]
+    connection.execute(insert(QualityRollupDelta), rows)
+
+
+def fold_rollups(engine: Engine, batch_size: int) -> int:
+    """
+    Переносит пачку приращений в quality_rollups: одно обновление на строку
+    показателя за пачку. Приращения удаляются в том же запросе, параллельные
+    запуски берут разные приращения (SKIP LOCKED).
+
+    Returns:
+        int: Количество перенесённых приращений.
+    """
+    with engine.begin() as connection:
+        return connection.execute(
+            text(FOLD_STATEMENT), {"batch_size": batch_size}
+        ).scalar_one()
+
+
+def backfill_rollups(
+    engine: Engine,
+    date_from: date,
+    date_to: Optional[date] = None,
+    overwrite: bool = False,
+) -> int:
+    """
+    Пересчитывает показатели по сохранённым результатам проверки за дни
+    [date_from, date_to). Выполняет один проход по task_reports.
+
+    Args:
+        engine (Engine): Синхронный движок БД.
+        date_from (date): Первый день периода.
+        date_to (Optional[date]): День после последнего (по умолчанию - текущий
+            день UTC: его счётчики ведутся воркерами).
+        overwrite (bool): Пересчитать и дни, по которым показатели уже есть.
+            По умолчанию такие дни пропускаются, чтобы не затереть счётчики
+            задач, результаты которых уже удалены политикой хранения.
+
+    Returns:
+        int: Количество записанных строк показателей.
+    """
+    with engine.begin() as connection:
+        result = connection.execute(
+            text(BACKFILL_STATEMENT),
+            {
+                "date_from": date_from,
+                "date_to": date_to or utc_today(),
+                "coverage": COVERAGE_METRIC,
+                "metrics": list(SEVERITY_METRICS),
+                "overwrite": overwrite,
+            },
+        )
+    return result.rowcount
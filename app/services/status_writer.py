@@ -0,0 +1,381 @@
+"""
+Запись статусов задач в PostgreSQL без предварительного SELECT.
+
+Статус обновляется прямым `UPDATE ... WHERE task_id = ...`. При размере пачки
+больше 1 итоговые статусы буферизуются в памяти воркера и записываются одним
+`UPDATE ... FROM (VALUES ...)`, несколько переходов одной задачи схлопываются
+в последний. До записи в БД актуальный статус отдаётся из кэша Redis.
+
+Задача в статусе IN_PROGRESS принадлежит воркеру, взявшему аренду (lease):
+воркер продлевает её по ходу обработки, а итоговый статус записывается только
+владельцем аренды. Задачи с истёкшей арендой возвращает в очередь reap_expired_leases.
+Завершённая задача (SUCCESS) аренду больше не выдаёт, поэтому повторная
+доставка сообщения её не перезапускает.
+
+Результаты проверки записываются один раз в task_reports в той же транзакции,
+что и итоговый статус, и только если статус записан (аренда не потеряна).
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Connection, Engine, and_, func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.task_outbox import TaskOutbox
+from app.models.task_result import TaskReport, TaskResult, TaskStatusEnum
+from app.services.rollups import record_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLostError(Exception):
+    """Аренда задачи истекла и перешла к другому воркеру."""
+
+
+class StatusWriter:
+    """Запись переходов статусов задач с опциональной буферизацией."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        batch_size: int = 1,
+        flush_interval: float = 1.0,
+        lease_ttl: int = 120,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lease_ttl = lease_ttl
+
+        self._pending: Dict[str, Tuple[TaskStatusEnum, Optional[dict], str]] = {}
+        # Время (monotonic) последнего взятия или продления аренды задачи
+        self._renewed: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    @property
+    def buffered(self) -> bool:
+        return self.batch_size > 1
+
+    def claim(self, task_id: str, owner: str) -> bool:
+        """
+        Переводит задачу в IN_PROGRESS и берёт аренду, минуя буфер.
+
+        Аренду можно взять у задачи в PENDING, у задачи IN_PROGRESS с истёкшей
+        арендой или арендой этого же владельца, а у задачи FAILED - только
+        повторной попыткой того же запроса Celery (владелец сохраняется при
+        записи FAILED). Задача SUCCESS не берётся: её результаты неизменны,
+        повторная доставка сообщения (acks_late, outbox) не перезапускает её.
+
+        Args:
+            task_id (str): Идентификатор задачи.
+            owner (str): Владелец аренды.
+
+        Returns:
+            bool: False, если задачи нет в БД, она уже завершена
+                или выполняется другим воркером.
+        """
+        with self._lock:
+            # Новый переход отменяет ещё не записанный предыдущий
+            self._pending.pop(task_id, None)
+
+        started = time.monotonic()
+        statement = (
+            update(TaskResult)
+            .where(
+                TaskResult.task_id == task_id,
+                or_(
+                    TaskResult.status == TaskStatusEnum.PENDING,
+                    and_(
+                        TaskResult.status == TaskStatusEnum.IN_PROGRESS,
+                        or_(
+                            TaskResult.lease_owner == owner,
+                            TaskResult.lease_expires_at.is_(None),
+                            TaskResult.lease_expires_at < func.now(),
+                        ),
+                    ),
+                    and_(
+                        TaskResult.status == TaskStatusEnum.FAILED,
+                        TaskResult.lease_owner == owner,
+                    ),
+                ),
+            )
+            .values(
+                status=TaskStatusEnum.IN_PROGRESS,
+                lease_owner=owner,
+                lease_expires_at=func.now() + timedelta(seconds=self.lease_ttl),
+            )
+        )
+        with self.engine.begin() as connection:
+            claimed = connection.execute(statement).rowcount > 0
+        if claimed:
+            with self._lock:
+                self._renewed[task_id, owner] = started
+        return claimed
+
+    def renew(self, task_id: str, owner: str) -> None:
+        """
+        Продлевает аренду задачи (heartbeat). Запрос не выполняется, пока
+        до истечения аренды больше половины lease_ttl: аренду в это время
+        не может взять другой воркер.
+
+        updated_at не меняется: продление - не изменение задачи, а столбец
+        входит в индексы списка задач, и UPDATE перестал бы быть HOT.
+
+        Raises:
+            LeaseLostError: Если аренда перешла к другому воркеру.
+        """
+        started = time.monotonic()
+        with self._lock:
+            renewed_at = self._renewed.get((task_id, owner))
+        if renewed_at is not None and started - renewed_at < self.lease_ttl / 2:
+            return
+
+        statement = (
+            update(TaskResult)
+            .where(
+                TaskResult.task_id == task_id,
+                TaskResult.status == TaskStatusEnum.IN_PROGRESS,
+                TaskResult.lease_owner == owner,
+            )
+            .values(
+                lease_expires_at=func.now() + timedelta(seconds=self.lease_ttl),
+                updated_at=TaskResult.updated_at,
+            )
+        )
+        with self.engine.begin() as connection:
+            renewed = connection.execute(statement).rowcount > 0
+        with self._lock:
+            if renewed:
+                self._renewed[task_id, owner] = started
+            else:
+                self._renewed.pop((task_id, owner), None)
+        if not renewed:
+            raise LeaseLostError(f"Аренда задачи [{task_id}] потеряна")
+
+    def write(
+        self,
+        task_id: str,
+        status: TaskStatusEnum,
+        owner: str,
+        results: Optional[dict] = None,
+        immediate: bool = False,
+    ) -> bool:
+        """
+        Записывает итоговый статус задачи и освобождает аренду.
+
+        Args:
+            task_id (str): Идентификатор задачи.
+            status (TaskStatusEnum): Новый статус.
+            owner (str): Владелец аренды (запись от чужого владельца игнорируется).
+            results (Optional[dict]): Результаты (None - без результатов).
+            immediate (bool): Записать сразу, минуя буфер.
+
+        Returns:
+            bool: False, если статус не записан: аренда потеряна. Статус,
+                оставленный в буфере, считается записанным (потерю аренды
+                при записи пачки логирует flush).
+        """
+        with self._lock:
+            # Итоговый статус освобождает аренду
+            self._renewed.pop((task_id, owner), None)
+
+        if immediate or not self.buffered:
+            with self._lock:
+                self._pending.pop(task_id, None)
+            if not self._update(task_id, status, owner, results):
+                logger.warning(
+                    f"Статус {status.value} задачи [{task_id}] не записан: аренда потеряна"
+                )
+                return False
+            return True
+
+        with self._lock:
+            self._pending[task_id] = (status, results, owner)
+            full = len(self._pending) >= self.batch_size
+
+        self._ensure_flusher()
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                # Ошибка уже залогирована, статусы остались в буфере
+                pass
+        return True
+
+    def flush(self) -> int:
+        """
+        Записывает накопленные статусы одним запросом.
+
+        Returns:
+            int: Количество записанных задач: статусы задач, аренду которых
+                воркер потерял, не записываются и не учитываются.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return 0
+
+        rows = []
+        params = {}
+        for i, (task_id, (status, results, owner)) in enumerate(pending.items()):
+            rows.append(f"(:task_id_{i}, :status_{i}, :owner_{i})")
+            params[f"task_id_{i}"] = task_id
+            params[f"status_{i}"] = status.value
+            params[f"owner_{i}"] = owner
+
+        statement = text(
+            "UPDATE task_results AS t "
+            "SET status = CAST(v.status AS taskstatusenum), "
+            # Владелец FAILED сохраняется для повторной попытки (см. claim)
+            "lease_owner = CASE WHEN v.status = 'FAILED' THEN t.lease_owner END, "
+            "lease_expires_at = NULL, "
+            "updated_at = now() "
+            f"FROM (VALUES {', '.join(rows)}) AS v(task_id, status, owner) "
+            "WHERE t.task_id = v.task_id AND t.lease_owner = v.owner "
+            "RETURNING t.task_id"
+        )
+
+        try:
+            with self.engine.begin() as connection:
+                written = connection.execute(statement, params).scalars().all()
+                _insert_reports(
+                    connection,
+                    (
+                        (task_id, pending[task_id][1])
+                        for task_id in written
+                        if pending[task_id][1] is not None
+                    ),
+                )
+        except Exception as e:
+            logger.error(f"Ошибка записи пачки статусов ({len(pending)} задач): {e}")
+            with self._lock:
+                # Возвращаем в буфер, не затирая более новые переходы
+                for task_id, value in pending.items():
+                    self._pending.setdefault(task_id, value)
+            raise
+
+        if len(written) < len(pending):
+            logger.warning(
+                f"Статусы {len(pending) - len(written)} из {len(pending)} задач "
+                f"не записаны: аренда потеряна"
+            )
+        return len(written)
+
+    def _update(
+        self,
+        task_id: str,
+        status: TaskStatusEnum,
+        owner: str,
+        results: Optional[dict],
+    ) -> bool:
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                update(TaskResult)
+                .where(TaskResult.task_id == task_id, TaskResult.lease_owner == owner)
+                .values(
+                    status=status,
+                    # Владелец FAILED сохраняется для повторной попытки (см. claim)
+                    lease_owner=owner if status == TaskStatusEnum.FAILED else None,
+                    lease_expires_at=None,
+                )
+            )
+            written = result.rowcount > 0
+            if written and results is not None:
+                _insert_reports(connection, [(task_id, results)])
+        return written
+
+    def _ensure_flusher(self) -> None:
+        """Запускает фоновую запись буфера по таймеру (в каждом процессе воркера свою)."""
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+
+            self._flusher = threading.Thread(
+                target=self._flush_periodically, name="status-writer", daemon=True
+            )
+            self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # Ошибка уже залогирована, статусы остались в буфере
+                pass
+
+
+def _insert_reports(connection: Connection, reports: Iterable[Tuple[str, dict]]) -> None:
+    """
+    Записывает результаты проверки и приращения показателей качества. Результаты
+    задачи неизменны: повторная обработка уже проверенного архива прежние
+    результаты не перезаписывает и в показателях второй раз не учитывается.
+    """
+    reports = dict(reports)
+    if not reports:
+        return
+
+    rows = [
+        {"task_id": task_id, "results": results}
+        for task_id, results in reports.items()
+    ]
+    inserted = connection.execute(
+        insert(TaskReport)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["task_id"])
+        .returning(TaskReport.task_id)
+    ).scalars()
+
+    # Показатели качества - только по впервые записанным результатам
+    record_rollups(connection, [reports[task_id] for task_id in inserted])
+
+
+def reap_expired_leases(engine: Engine, batch_size: int) -> List[str]:
+    """
+    Возвращает в PENDING задачи IN_PROGRESS с истёкшей арендой.
+
+    Строки выбираются по частичному индексу ix_task_results_lease_expires_at
+    с SKIP LOCKED, поэтому несколько одновременных запусков не мешают друг другу.
+
+    Args:
+        engine (Engine): Синхронный движок БД.
+        batch_size (int): Максимальное количество задач за один вызов.
+
+    Returns:
+        List[str]: Идентификаторы перезапущенных задач. Сообщения для брокера
+            записываются в task_outbox в той же транзакции.
+    """
+    expired = (
+        select(TaskResult.task_id)
+        .where(
+            TaskResult.status == TaskStatusEnum.IN_PROGRESS,
+            TaskResult.lease_expires_at < func.now(),
+        )
+        .order_by(TaskResult.lease_expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        update(TaskResult)
+        .where(TaskResult.task_id.in_(expired))
+        .values(
+            status=TaskStatusEnum.PENDING,
+            lease_owner=None,
+            lease_expires_at=None,
+        )
+        .returning(TaskResult.task_id)
+    )
+    with engine.begin() as connection:
+        task_ids = list(connection.execute(statement).scalars().all())
+        if task_ids:
+            connection.execute(
+                insert(TaskOutbox), [{"task_id": task_id} for task_id in task_ids]
+            )
+    return task_ids
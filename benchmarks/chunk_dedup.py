@@ -0,0 +1,101 @@
+"""
+Дедупликация архивов при хранении чанками (MINIO_STORAGE_MODE=chunked).
+
+Эмулирует последовательные загрузки одного проекта: каждая следующая версия
+архива отличается от предыдущей несколькими изменёнными файлами. Для каждой
+версии считается, сколько байт пришлось бы записать в MinIO (новые чанки),
+и скорость нарезки на чанки (chunk_archive).
+
+Запуск (из корня проекта):
+    python -m benchmarks.chunk_dedup --archive-mb 16 --versions 5 --changes 5
+"""
+
+import argparse
+import io
+import random
+import time
+import zipfile
+from typing import Dict
+
+from app.config import minio_settings
+from app.services.chunk_store import chunk_archive
+
+FILE_SIZE = 64 * 1024
+# Фиксированная дата: неизменённые файлы дают одинаковые байты в каждой версии
+DATE_TIME = (2024, 1, 1, 0, 0, 0)
+
+
+def build_archive(files: Dict[str, bytes]) -> bytes:
+    """Собирает ZIP-архив из файлов, каждый файл сжимается отдельно."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            info = zipfile.ZipInfo(name, DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, content)
+    return buffer.getvalue()
+
+
+def source_file(rng: random.Random) -> bytes:
+    """Содержимое, похожее на исходный код: повторяющиеся слова, хорошо сжимается."""
+    words = [rng.randbytes(rng.randint(2, 10)).hex() for _ in range(512)]
+    return " ".join(rng.choice(words) for _ in range(FILE_SIZE // 8)).encode()[
+        :FILE_SIZE
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--archive-mb", type=int, default=16)
+    parser.add_argument("--versions", type=int, default=5)
+    parser.add_argument("--changes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    count = args.archive_mb * 1024 * 1024 // FILE_SIZE
+    files = {f"src/module_{i:04d}.py": source_file(rng) for i in range(count)}
+
+    sizes = (
+        minio_settings.MINIO_CHUNK_MIN_SIZE,
+        minio_settings.MINIO_CHUNK_AVG_SIZE,
+        minio_settings.MINIO_CHUNK_MAX_SIZE,
+    )
+    stored = set()
+    total_size = total_new = 0
+
+    print(f"{'version':<9}{'size MB':>10}{'chunks':>9}{'new MB':>10}{'MB/s':>8}")
+    for version in range(args.versions):
+        if version:
+            for name in rng.sample(sorted(files), args.changes):
+                files[name] = source_file(rng)
+            # Новый файл в середине архива сдвигает все последующие байты
+            files[f"src/added_{version}.py"] = source_file(rng)
+            files = dict(sorted(files.items()))
+
+        data = build_archive(files)
+        started = time.perf_counter()
+        chunks = chunk_archive(data, *sizes)
+        elapsed = time.perf_counter() - started
+
+        new_bytes = 0
+        for digest, start, end in chunks:
+            if digest not in stored:
+                stored.add(digest)
+                new_bytes += end - start
+        total_size += len(data)
+        total_new += new_bytes
+
+        print(
+            f"{version:<9}{len(data) / 2**20:>10.2f}{len(chunks):>9}"
+            f"{new_bytes / 2**20:>10.2f}{len(data) / 2**20 / elapsed:>8.1f}"
+        )
+
+    print(
+        f"записано {total_new / 2**20:.2f} MB из {total_size / 2**20:.2f} MB "
+        f"({total_new / total_size:.1%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
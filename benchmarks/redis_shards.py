@@ -0,0 +1,177 @@
+"""
+Пропускная способность кэша задач в зависимости от числа шардов Redis Cluster.
+
+Поднимает локальный кластер из N процессов redis-server (нужен redis-server
+в PATH), клиенты в отдельных процессах выполняют операции кэша задач
+(SETEX результата + DELETE ETag конвейером, как воркер, и GET, как API).
+
+Запуск (из корня проекта):
+    python -m benchmarks.redis_shards --shards 1 2 4 --clients 8 --seconds 5
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import uuid
+from typing import List
+
+import redis
+
+CLUSTER_SLOTS = 16384
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalRedisCluster:
+    """Redis Cluster из shards мастеров без реплик, для тестов и замеров."""
+
+    def __init__(self, shards: int):
+        self.shards = shards
+        self.ports: List[int] = []
+        self.processes: List[subprocess.Popen] = []
+        self.directory = ""
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.ports[0]}/0"
+
+    def __enter__(self) -> "LocalRedisCluster":
+        server = shutil.which("redis-server")
+        if server is None:
+            raise RuntimeError("redis-server не найден в PATH")
+
+        self.directory = tempfile.mkdtemp(prefix="redis-cluster-")
+        try:
+            for _ in range(self.shards):
+                port = free_port()
+                self.ports.append(port)
+                self.processes.append(
+                    subprocess.Popen(
+                        [
+                            server,
+                            "--port", str(port),
+                            "--bind", "127.0.0.1",
+                            "--cluster-enabled", "yes",
+                            "--cluster-config-file", f"nodes-{port}.conf",
+                            "--dir", self.directory,
+                            "--save", "",
+                            "--appendonly", "no",
+                        ],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                    )
+                )
+            self._create_cluster()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=10)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _create_cluster(self) -> None:
+        nodes = [redis.Redis(port=port, decode_responses=True) for port in self.ports]
+        for node in nodes:
+            self._wait(node.ping)
+
+        # Слоты делятся между мастерами поровну
+        for i, node in enumerate(nodes):
+            first = CLUSTER_SLOTS * i // self.shards
+            last = CLUSTER_SLOTS * (i + 1) // self.shards
+            node.execute_command("CLUSTER ADDSLOTS", *range(first, last))
+        for port in self.ports[1:]:
+            nodes[0].execute_command("CLUSTER MEET", "127.0.0.1", port)
+
+        for node in nodes:
+            self._wait(
+                lambda: node.execute_command("CLUSTER INFO")["cluster_state"] == "ok"
+                and int(node.execute_command("CLUSTER INFO")["cluster_known_nodes"])
+                == self.shards
+            )
+            node.close()
+
+    @staticmethod
+    def _wait(check, timeout: float = 10.0) -> None:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if check():
+                    return
+            except redis.ConnectionError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError("Кластер Redis не запустился")
+            time.sleep(0.05)
+
+
+def _client(url: str, seconds: float, batch: int, counter) -> None:
+    from app.services.cache import RESULT_CACHE_TTL, etag_key, result_key
+
+    client = redis.RedisCluster.from_url(url, decode_responses=True)
+    payload = '{"status": "SUCCESS", "results": null}'
+    operations = 0
+
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        task_ids = [uuid.uuid4().hex for _ in range(batch)]
+        with client.pipeline() as pipe:
+            for task_id in task_ids:
+                pipe.setex(result_key(task_id), RESULT_CACHE_TTL, payload)
+                pipe.delete(etag_key(task_id))
+            for task_id in task_ids:
+                pipe.get(result_key(task_id))
+            pipe.execute()
+        operations += 3 * batch
+
+    client.close()
+    with counter.get_lock():
+        counter.value += operations
+
+
+def measure(shards: int, clients: int, seconds: float, batch: int) -> float:
+    """Возвращает число операций кэша в секунду на кластере из shards шардов."""
+    with LocalRedisCluster(shards) as cluster:
+        counter = multiprocessing.Value("q", 0)
+        processes = [
+            multiprocessing.Process(
+                target=_client, args=(cluster.url, seconds, batch, counter)
+            )
+            for _ in range(clients)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return counter.value / seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'shards':<10}{'ops/s':>12}")
+    for shards in args.shards:
+        rate = measure(shards, args.clients, args.seconds, args.batch)
+        print(f"{shards:<10}{rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Сравнение пропускной способности моделей исполнения воркера.
+
+Каждая модель запускается в отдельном процессе (monkey patching eventlet/gevent
+нельзя откатить), задача эмулирует process_zip_task: ожидание внешних API
+(sleep) и CPU-bound проверку архива через run_cpu_bound.
+
+Запуск (из корня проекта):
+    python -m benchmarks.worker_pools --tasks 200 --io-delay 0.05 --archive-mb 8
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import subprocess
+import sys
+import time
+import zipfile
+
+MODES = ("eventlet", "gevent", "threads", "prefork")
+
+
+def build_archive(size_mb: int) -> bytes:
+    """Собирает ZIP-архив заданного размера с плохо сжимаемым содержимым."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i in range(size_mb):
+            archive.writestr(f"src/file_{i}.bin", os.urandom(1024 * 1024))
+    return buffer.getvalue()
+
+
+_archive: bytes = b""
+_archive_hash: str = ""
+_io_delay: float = 0.0
+
+
+def _init(size_mb: int, io_delay: float) -> None:
+    global _archive, _archive_hash, _io_delay
+    _archive = build_archive(size_mb)
+    _archive_hash = hashlib.sha256(_archive).hexdigest()
+    _io_delay = io_delay
+
+
+def _task(profile) -> None:
+    from app.services.execution import inspect_archive, run_cpu_bound
+
+    time.sleep(_io_delay)
+    run_cpu_bound(profile, inspect_archive, _archive, _archive_hash)
+
+
+def _prefork_task(_: int) -> None:
+    from app.services.execution import get_runtime_profile
+
+    _task(get_runtime_profile("prefork"))
+
+
+def run_mode(mode: str, tasks: int, concurrency: int, size_mb: int, io_delay: float):
+    """Выполняет задачи в текущем процессе и возвращает число задач в секунду."""
+    if mode == "eventlet":
+        import eventlet  # type: ignore
+
+        eventlet.monkey_patch()
+    elif mode == "gevent":
+        from gevent import monkey  # type: ignore
+
+        monkey.patch_all()
+
+    from app.services.execution import get_pool_profile, shutdown_cpu_executor
+
+    profile = get_pool_profile(mode, concurrency or None)
+    _init(size_mb, io_delay)
+
+    # Прогрев пула процессов, чтобы не учитывать время его запуска
+    if profile.offload_cpu:
+        _task(profile)
+
+    started = time.perf_counter()
+
+    if mode == "eventlet":
+        pool = eventlet.GreenPool(profile.concurrency)
+        for _ in range(tasks):
+            pool.spawn_n(_task, profile)
+        pool.waitall()
+    elif mode == "gevent":
+        from gevent.pool import Pool  # type: ignore
+
+        pool = Pool(profile.concurrency)
+        for _ in range(tasks):
+            pool.spawn(_task, profile)
+        pool.join()
+    elif mode == "threads":
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(profile.concurrency) as executor:
+            list(executor.map(lambda _: _task(profile), range(tasks)))
+    else:
+        import multiprocessing
+
+        with multiprocessing.Pool(
+            profile.concurrency, initializer=_init, initargs=(size_mb, io_delay)
+        ) as pool:
+            pool.map(_prefork_task, range(tasks))
+
+    elapsed = time.perf_counter() - started
+    shutdown_cpu_executor()
+    return profile.concurrency, tasks / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", choices=MODES)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=0)
+    parser.add_argument("--archive-mb", type=int, default=8)
+    parser.add_argument("--io-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.mode:
+        concurrency, rate = run_mode(
+            args.mode, args.tasks, args.concurrency, args.archive_mb, args.io_delay
+        )
+        print(f"{args.mode}\t{concurrency}\t{rate:.2f}")
+        return
+
+    print(f"{'mode':<10}{'concurrency':>12}{'tasks/s':>12}")
+    for mode in MODES:
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.worker_pools",
+                "--mode",
+                mode,
+                "--tasks",
+                str(args.tasks),
+                "--concurrency",
+                str(args.concurrency),
+                "--archive-mb",
+                str(args.archive_mb),
+                "--io-delay",
+                str(args.io_delay),
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1:] or ["?"]
+            print(f"{mode:<10}{'-':>12}{'-':>12}  ({error[0]})")
+            continue
+        _, concurrency, rate = result.stdout.split()
+        print(f"{mode:<10}{concurrency:>12}{rate:>12}")
+
+
+if __name__ == "__main__":
+    main()
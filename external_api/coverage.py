@@ -1,6 +1,8 @@
 import time
 import random
 
+from external_api.findings import mock_findings
+
 
 def mock_external_api_coverage(file: bytes):
     """
@@ -8,7 +10,7 @@ def mock_external_api_coverage(file: bytes):
     Args:
         task_id (str): Идентификатор задачи.
     Returns:
-        dict: Словарь с результатами анализа кода.
+        dict: Сводка анализа кода и подробные находки (findings).
     Raises:
         Exception: Если произошла ошибка при эмуляции запроса.
 
@@ -16,12 +18,14 @@ def mock_external_api_coverage(file: bytes):
     if random.random() < 0.2:  # эмуляция ошибки
         raise Exception(f"Ошибка в mock_external_api_1")
     time.sleep(random.uniform(1, 10))
+    summary = {
+        "total": random.randint(5, 20),
+        "critical": random.randint(0, 5),
+        "major": random.randint(0, 10),
+        "minor": random.randint(0, 15),
+    }
     return {
         "coverage": round(random.uniform(60, 90), 2),
-        "bugs": {
-            "total": random.randint(5, 20),
-            "critical": random.randint(0, 5),
-            "major": random.randint(0, 10),
-            "minor": random.randint(0, 15),
-        },
+        "bugs": summary,
+        "findings": mock_findings("bugs", summary),
     }
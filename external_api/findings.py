@@ -0,0 +1,31 @@
+import random
+
+RULES = {
+    "bugs": ["null-dereference", "resource-leak", "unreachable-code"],
+    "vulnerabilities": ["sql-injection", "hardcoded-secret", "path-traversal"],
+    "code_smells": ["long-method", "duplicated-code", "too-many-arguments"],
+}
+
+
+def mock_findings(kind: str, summary: dict) -> list:
+    """
+    Эмулирует подробный отчёт анализатора: находки по файлам архива.
+    Args:
+        kind (str): Вид находок (bugs, vulnerabilities, code_smells).
+        summary (dict): Количество находок по критичности.
+    Returns:
+        list: Находки, по одной на каждую единицу счётчиков summary.
+    """
+    return [
+        {
+            "kind": kind,
+            "file": f"src/module_{random.randint(1, 50)}.py",
+            "line": random.randint(1, 500),
+            "severity": severity,
+            "rule": random.choice(RULES[kind]),
+            "message": f"Найдена проблема {kind} ({severity})",
+        }
+        for severity, count in summary.items()
+        if severity != "total"
+        for _ in range(count)
+    ]
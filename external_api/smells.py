@@ -1,6 +1,8 @@
 import time
 import random
 
+from external_api.findings import mock_findings
+
 
 def mock_external_api_smells(file: bytes):
     """
@@ -8,14 +10,16 @@ def mock_external_api_smells(file: bytes):
     Args:
         task_id (str): Идентификатор задачи.
     Returns:
-        dict: Словарь с результатами проверки code smells.
+        dict: Сводка проверки code smells и подробные находки (findings).
     """
     time.sleep(random.uniform(1, 5))
+    summary = {
+        "total": random.randint(5, 20),
+        "critical": random.randint(0, 5),
+        "major": random.randint(0, 10),
+        "minor": random.randint(0, 15),
+    }
     return {
-        "code_smells": {
-            "total": random.randint(5, 20),
-            "critical": random.randint(0, 5),
-            "major": random.randint(0, 10),
-            "minor": random.randint(0, 15),
-        },
+        "code_smells": summary,
+        "findings": mock_findings("code_smells", summary),
     }
@@ -1,6 +1,8 @@
 import time
 import random
 
+from external_api.findings import mock_findings
+
 
 def mock_external_api_vulnerabilities(file: bytes):
     """
@@ -8,14 +10,16 @@ def mock_external_api_vulnerabilities(file: bytes):
     Args:
         task_id (str): Идентификатор задачи.
     Returns:
-        dict: Словарь с результатами проверки уязвимостей.
+        dict: Сводка проверки уязвимостей и подробные находки (findings).
     """
     time.sleep(random.uniform(5, 10))
+    summary = {
+        "total": random.randint(5, 20),
+        "critical": random.randint(0, 5),
+        "major": random.randint(0, 10),
+        "minor": random.randint(0, 15),
+    }
     return {
-        "vulnerabilities": {
-            "total": random.randint(5, 20),
-            "critical": random.randint(0, 5),
-            "major": random.randint(0, 10),
-            "minor": random.randint(0, 15),
-        },
+        "vulnerabilities": summary,
+        "findings": mock_findings("vulnerabilities", summary),
     }
@@ -8,6 +8,9 @@ from sqlalchemy import pool
 from alembic import context
 from app.db.base import Base
 from app.models.task_result import TaskResult
+from app.models.quality_rollup import QualityRollup, QualityRollupDelta
+from app.models.task_outbox import TaskOutbox
+from app.models.chunk_ref import ChunkManifest, ChunkRef
 
 
 load_dotenv()
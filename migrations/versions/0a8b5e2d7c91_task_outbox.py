@@ -0,0 +1,34 @@
+"""task outbox
+
+Revision ID: 0a8b5e2d7c91
+Revises: f7c2d94e1a36
+Create Date: 2026-10-19 16:27:45.902317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0a8b5e2d7c91'
+down_revision: Union[str, None] = 'f7c2d94e1a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('task_outbox',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('task_id', sa.String(), nullable=False),
+    sa.Column('task_name', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_task_outbox_pending', 'task_outbox', ['id'], unique=False, postgresql_where=sa.text('sent_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_outbox_pending', table_name='task_outbox')
+    op.drop_table('task_outbox')
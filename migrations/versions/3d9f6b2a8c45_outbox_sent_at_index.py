@@ -0,0 +1,27 @@
+"""outbox sent_at index
+
+Revision ID: 3d9f6b2a8c45
+Revises: 0a8b5e2d7c91
+Create Date: 2026-10-19 21:04:18.527193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9f6b2a8c45'
+down_revision: Union[str, None] = '0a8b5e2d7c91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY - без блокировки записи relay на большой таблице
+    with op.get_context().autocommit_block():
+        op.create_index('ix_task_outbox_sent_at', 'task_outbox', ['sent_at'], unique=False, postgresql_where=sa.text('sent_at IS NOT NULL'), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_outbox_sent_at', table_name='task_outbox')
@@ -0,0 +1,34 @@
+"""quality rollup deltas
+
+Revision ID: 5b7e0c3f9a12
+Revises: 8e4c1a7d2f90
+Create Date: 2026-10-19 23:58:06.114720
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e0c3f9a12'
+down_revision: Union[str, None] = '8e4c1a7d2f90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('quality_rollup_deltas',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('metric', sa.String(), nullable=False),
+    sa.Column('severity', sa.String(), nullable=False),
+    sa.Column('value', sa.Double(), nullable=False),
+    sa.Column('tasks', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    # Неперенесённые приращения теряются: перед откатом нужно выполнить fold_quality_rollups
+    op.drop_table('quality_rollup_deltas')
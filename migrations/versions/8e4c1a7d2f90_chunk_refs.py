@@ -0,0 +1,39 @@
+"""chunk refs
+
+Revision ID: 8e4c1a7d2f90
+Revises: 3d9f6b2a8c45
+Create Date: 2026-10-19 23:12:47.301865
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4c1a7d2f90'
+down_revision: Union[str, None] = '3d9f6b2a8c45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('chunk_refs',
+    sa.Column('digest', sa.String(), nullable=False),
+    sa.Column('refs', sa.BigInteger(), nullable=False),
+    sa.Column('zero_since', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('digest')
+    )
+    op.create_index('ix_chunk_refs_unreferenced', 'chunk_refs', ['zero_since'], unique=False, postgresql_where=sa.text('refs = 0'))
+    op.create_table('chunk_manifests',
+    sa.Column('task_id', sa.String(), nullable=False),
+    sa.Column('digest', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('task_id')
+    )
+    # Первый запуск collect_chunks заполнит таблицы по всем манифестам бакета
+
+
+def downgrade() -> None:
+    op.drop_table('chunk_manifests')
+    op.drop_index('ix_chunk_refs_unreferenced', table_name='chunk_refs')
+    op.drop_table('chunk_refs')
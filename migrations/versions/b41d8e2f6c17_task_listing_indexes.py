@@ -0,0 +1,42 @@
+"""task listing indexes
+
+Revision ID: b41d8e2f6c17
+Revises: 7ff1cf44d6a3
+Create Date: 2026-10-19 10:12:41.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d8e2f6c17'
+down_revision: Union[str, None] = '7ff1cf44d6a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('task_results', sa.Column('size', sa.BigInteger(), nullable=True))
+    op.add_column('task_results', sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    op.add_column('task_results', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+
+    # Индекс по task_id дублирует первичный ключ
+    op.drop_index('ix_task_results_task_id', table_name='task_results')
+
+    # CONCURRENTLY - без блокировки записи на больших таблицах
+    with op.get_context().autocommit_block():
+        op.create_index('ix_task_results_updated_at', 'task_results', ['updated_at', 'task_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_task_results_status_updated_at', 'task_results', ['status', 'updated_at', 'task_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_task_results_in_flight', 'task_results', ['updated_at', 'task_id'], unique=False, postgresql_where=sa.text("status IN ('PENDING', 'IN_PROGRESS')"), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_results_in_flight', table_name='task_results')
+    op.drop_index('ix_task_results_status_updated_at', table_name='task_results')
+    op.drop_index('ix_task_results_updated_at', table_name='task_results')
+    op.create_index('ix_task_results_task_id', 'task_results', ['task_id'], unique=False)
+    op.drop_column('task_results', 'updated_at')
+    op.drop_column('task_results', 'created_at')
+    op.drop_column('task_results', 'size')
@@ -0,0 +1,34 @@
+"""task leases
+
+Revision ID: c9a07e5d3b21
+Revises: b41d8e2f6c17
+Create Date: 2026-10-19 11:04:52.907114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9a07e5d3b21'
+down_revision: Union[str, None] = 'b41d8e2f6c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('task_results', sa.Column('lease_owner', sa.String(), nullable=True))
+    op.add_column('task_results', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Задачи, зависшие в IN_PROGRESS до появления аренды, перезапустятся при первом проходе
+    op.execute("UPDATE task_results SET lease_expires_at = now() WHERE status = 'IN_PROGRESS'")
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_task_results_lease_expires_at', 'task_results', ['lease_expires_at'], unique=False, postgresql_where=sa.text("status = 'IN_PROGRESS'"), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_results_lease_expires_at', table_name='task_results')
+    op.drop_column('task_results', 'lease_expires_at')
+    op.drop_column('task_results', 'lease_owner')
@@ -0,0 +1,29 @@
+"""archive retention
+
+Revision ID: d52f19a8e0c4
+Revises: c9a07e5d3b21
+Create Date: 2026-10-19 12:21:07.441930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd52f19a8e0c4'
+down_revision: Union[str, None] = 'c9a07e5d3b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('task_results', sa.Column('archive_deleted_at', sa.DateTime(timezone=True), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_task_results_archive_retention', 'task_results', ['updated_at'], unique=False, postgresql_where=sa.text("status = 'SUCCESS' AND archive_deleted_at IS NULL"), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_results_archive_retention', table_name='task_results')
+    op.drop_column('task_results', 'archive_deleted_at')
@@ -0,0 +1,117 @@
+"""partition task results
+
+Revision ID: e3a61c7f9b58
+Revises: d52f19a8e0c4
+Create Date: 2026-10-19 14:02:51.118204
+
+Статусы задач переносятся в таблицу, секционированную по хэшу task_id,
+результаты проверки - в отдельную таблицу task_reports (тоже секционированную).
+Данные копируются целиком, миграцию нужно выполнять при остановленных API и воркерах.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a61c7f9b58'
+down_revision: Union[str, None] = 'd52f19a8e0c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Количество секций каждой таблицы
+PARTITIONS = 16
+
+STATUS_COLUMNS = 'task_id, status, size, created_at, updated_at, lease_owner, lease_expires_at, archive_deleted_at'
+
+INDEXES = ('ix_task_results_updated_at', 'ix_task_results_status_updated_at', 'ix_task_results_in_flight', 'ix_task_results_lease_expires_at', 'ix_task_results_archive_retention')
+
+
+def create_partitions(table: str) -> None:
+    for remainder in range(PARTITIONS):
+        op.execute(
+            f"CREATE TABLE {table}_p{remainder} PARTITION OF {table} "
+            f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+        )
+
+
+def create_indexes() -> None:
+    # На секционированной таблице индекс создаётся сразу на всех секциях
+    op.create_index('ix_task_results_updated_at', 'task_results', ['updated_at', 'task_id'], unique=False)
+    op.create_index('ix_task_results_status_updated_at', 'task_results', ['status', 'updated_at', 'task_id'], unique=False)
+    op.create_index('ix_task_results_in_flight', 'task_results', ['updated_at', 'task_id'], unique=False, postgresql_where=sa.text("status IN ('PENDING', 'IN_PROGRESS')"))
+    op.create_index('ix_task_results_lease_expires_at', 'task_results', ['lease_expires_at'], unique=False, postgresql_where=sa.text("status = 'IN_PROGRESS'"))
+    op.create_index('ix_task_results_archive_retention', 'task_results', ['updated_at'], unique=False, postgresql_where=sa.text("status = 'SUCCESS' AND archive_deleted_at IS NULL"))
+
+
+def rename_old_table() -> None:
+    for index in INDEXES:
+        op.drop_index(index, table_name='task_results')
+    op.rename_table('task_results', 'task_results_old')
+    op.execute("ALTER INDEX task_results_pkey RENAME TO task_results_old_pkey")
+
+
+def upgrade() -> None:
+    rename_old_table()
+
+    op.create_table('task_results',
+    sa.Column('task_id', sa.String(), nullable=False),
+    sa.Column('status', postgresql.ENUM('PENDING', 'IN_PROGRESS', 'SUCCESS', 'FAILED', name='taskstatusenum', create_type=False), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('lease_owner', sa.String(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('archive_deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('task_id', name='task_results_pkey'),
+    postgresql_partition_by='HASH (task_id)'
+    )
+    create_partitions('task_results')
+
+    op.create_table('task_reports',
+    sa.Column('task_id', sa.String(), nullable=False),
+    sa.Column('results', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['task_id'], ['task_results.task_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('task_id'),
+    postgresql_partition_by='HASH (task_id)'
+    )
+    create_partitions('task_reports')
+
+    op.execute(f"INSERT INTO task_results ({STATUS_COLUMNS}) SELECT {STATUS_COLUMNS} FROM task_results_old")
+    op.execute(
+        "INSERT INTO task_reports (task_id, results, created_at) "
+        "SELECT task_id, results, updated_at FROM task_results_old WHERE results IS NOT NULL"
+    )
+    op.drop_table('task_results_old')
+
+    create_indexes()
+
+
+def downgrade() -> None:
+    rename_old_table()
+
+    op.create_table('task_results',
+    sa.Column('task_id', sa.String(), nullable=False),
+    sa.Column('status', postgresql.ENUM('PENDING', 'IN_PROGRESS', 'SUCCESS', 'FAILED', name='taskstatusenum', create_type=False), nullable=False),
+    sa.Column('results', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('lease_owner', sa.String(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('archive_deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('task_id', name='task_results_pkey')
+    )
+
+    op.execute(
+        f"INSERT INTO task_results ({STATUS_COLUMNS}, results) "
+        f"SELECT {', '.join('t.' + column.strip() for column in STATUS_COLUMNS.split(','))}, r.results "
+        "FROM task_results_old AS t LEFT JOIN task_reports AS r ON r.task_id = t.task_id"
+    )
+    op.drop_table('task_reports')
+    op.drop_table('task_results_old')
+
+    create_indexes()
@@ -0,0 +1,33 @@
+"""quality rollups
+
+Revision ID: f7c2d94e1a36
+Revises: e3a61c7f9b58
+Create Date: 2026-10-19 15:10:24.583019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c2d94e1a36'
+down_revision: Union[str, None] = 'e3a61c7f9b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('quality_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('metric', sa.String(), nullable=False),
+    sa.Column('severity', sa.String(), nullable=False),
+    sa.Column('value', sa.Double(), nullable=False),
+    sa.Column('tasks', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'metric', 'severity')
+    )
+    # Показатели за дни до появления таблицы заполняет задача backfill_quality_rollups
+
+
+def downgrade() -> None:
+    op.drop_table('quality_rollups')
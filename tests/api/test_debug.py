@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from unittest.mock import patch
+
+from app.api.debug import profile_requests
+from app.config import ProfilingSettings
+from app.services.profiling import StackSampler
+from app.main import app
+
+ENABLED = ProfilingSettings(PROFILING_ENABLED=True, PROFILING_TOKEN="secret")
+
+
+async def request(method, url, target=app, **kwargs):
+    async with AsyncClient(
+        transport=ASGITransport(app=target), base_url="http://test"
+    ) as ac:
+        return await ac.request(method, url, **kwargs)
+
+
+@pytest.mark.anyio
+async def test_debug_endpoints_hidden_when_disabled():
+    response = await request("POST", "/debug/memory/snapshots")
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_debug_endpoints_require_token():
+    with patch("app.api.dependencies.profiling_settings", ENABLED):
+        response = await request(
+            "POST", "/debug/memory/start", headers={"X-Profile-Token": "wrong"}
+        )
+    assert response.status_code == 403
+
+
+@pytest.mark.anyio
+async def test_debug_endpoints_closed_without_configured_token():
+    settings = ProfilingSettings(PROFILING_ENABLED=True)
+    with patch("app.api.dependencies.profiling_settings", settings):
+        response = await request(
+            "POST", "/debug/memory/start", headers={"X-Profile-Token": "anything"}
+        )
+    assert response.status_code == 403
+
+
+@pytest.mark.anyio
+async def test_memory_snapshot_and_diff():
+    headers = {"X-Profile-Token": "secret"}
+    with patch("app.api.dependencies.profiling_settings", ENABLED):
+        not_started = await request("POST", "/debug/memory/snapshots", headers=headers)
+        await request("POST", "/debug/memory/start", headers=headers)
+        try:
+            base = await request("POST", "/debug/memory/snapshots", headers=headers)
+            diff = await request(
+                "GET",
+                f"/debug/memory/snapshots/{base.json()['snapshot_id']}/diff",
+                headers=headers,
+            )
+            missing = await request(
+                "GET", "/debug/memory/snapshots/999/diff", headers=headers
+            )
+        finally:
+            await request("DELETE", "/debug/memory", headers=headers)
+
+    assert not_started.status_code == 409
+    assert base.status_code == 200
+    assert diff.json()["snapshot_id"] == base.json()["snapshot_id"] + 1
+    assert missing.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_request_profile_written_on_header(tmp_path):
+    settings = ProfilingSettings(
+        PROFILING_ENABLED=True,
+        PROFILING_TOKEN="secret",
+        PROFILING_DIR=str(tmp_path),
+        PROFILING_INTERVAL=0.001,
+    )
+    target = FastAPI()
+    target.middleware("http")(profile_requests)
+
+    @target.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    with (
+        patch("app.api.debug.profiling_settings", settings),
+        patch("app.services.profiling.profiling_settings", settings),
+    ):
+        plain = await request("GET", "/ping", target=target)
+        wrong = await request(
+            "GET", "/ping", target=target, headers={"X-Profile-Token": "1"}
+        )
+        profiled = await request(
+            "GET", "/ping", target=target, headers={"X-Profile-Token": "secret"}
+        )
+
+    assert "X-Profile-File" not in plain.headers
+    assert "X-Profile-File" not in wrong.headers
+    assert (tmp_path / profiled.headers["X-Profile-File"]).exists()
+
+
+@pytest.mark.anyio
+async def test_request_profile_does_not_block_event_loop(tmp_path):
+    """Остановка сэмплирования выполняется вне цикла событий"""
+    settings = ProfilingSettings(
+        PROFILING_ENABLED=True,
+        PROFILING_TOKEN="secret",
+        PROFILING_DIR=str(tmp_path),
+        PROFILING_INTERVAL=0.001,
+    )
+    target = FastAPI()
+    target.middleware("http")(profile_requests)
+    loop_threads = []
+
+    @target.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    original_stop = StackSampler.stop
+
+    def stop(self):
+        loop_threads.append(threading.current_thread() is threading.main_thread())
+        return original_stop(self)
+
+    with (
+        patch("app.api.debug.profiling_settings", settings),
+        patch("app.services.profiling.profiling_settings", settings),
+        patch.object(StackSampler, "stop", stop),
+    ):
+        response = await request(
+            "GET", "/ping", target=target, headers={"X-Profile-Token": "secret"}
+        )
+
+    assert response.status_code == 200
+    assert loop_threads == [False]
@@ -0,0 +1,220 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+from minio.error import S3Error
+from app.main import app
+from app.db.session import get_db
+from app.models.task_result import TaskStatusEnum
+from app.api.http_cache import etag_matches
+from app.services.cache import STORE_ETAG_SCRIPT, etag_key, result_key
+
+TASK_ID = "a" * 64
+RESULTS = {
+    "overall_coverage": 80.0,
+    "bugs": {"BLOCKER": 0},
+    "code_smells": {"MAJOR": 2},
+    "vulnerabilities": {"CRITICAL": 1},
+}
+
+
+def make_redis(cache=None, etag=None):
+    redis_client = AsyncMock()
+    values = {result_key(TASK_ID): cache, etag_key(TASK_ID): etag}
+    redis_client.get.side_effect = lambda key: values.get(key)
+    return redis_client
+
+
+async def get_results(redis_client, headers=None):
+    with patch("app.api.routers.get_redis_async", return_value=redis_client):
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as ac:
+            return await ac.get(f"/results/{TASK_ID}", headers=headers)
+
+
+@pytest.mark.anyio
+async def test_success_is_immutable():
+    redis_client = make_redis(json.dumps({"status": "SUCCESS", "results": RESULTS}))
+
+    response = await get_results(redis_client)
+
+    assert response.status_code == 200
+    assert response.json()["results"]["overall_coverage"] == 80.0
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+    # ETag сохраняется, только если кэш результата не изменился (compare-and-set)
+    redis_client.eval.assert_awaited_once()
+    script, keys, *args = redis_client.eval.call_args.args
+    assert script == STORE_ETAG_SCRIPT
+    assert keys == 2
+    assert args == [
+        result_key(TASK_ID),
+        etag_key(TASK_ID),
+        json.dumps({"status": "SUCCESS", "results": RESULTS}),
+        f"SUCCESS {etag}",
+        24 * 60 * 60,
+    ]
+
+
+@pytest.mark.anyio
+async def test_not_modified_skips_payload():
+    """При совпадении ETag кэш с результатами не читается"""
+    etag = '"0123456789abcdef"'
+    redis_client = make_redis(etag=f"SUCCESS {etag}")
+
+    response = await get_results(redis_client, {"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    redis_client.get.assert_awaited_once_with(etag_key(TASK_ID))
+
+
+@pytest.mark.anyio
+async def test_in_progress_has_retry_hint():
+    redis_client = make_redis(json.dumps({"status": "IN_PROGRESS", "results": None}))
+
+    response = await get_results(redis_client)
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=5"
+    assert response.headers["retry-after"] == "10"
+    # ETag незавершённой задачи не сохраняется
+    redis_client.eval.assert_not_awaited()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("status", ["IN_PROGRESS", "SUCCESS"])
+async def test_not_modified_without_stored_etag(status):
+    """Без сохранённого ETag If-None-Match сравнивается с ETag тела ответа"""
+    results = RESULTS if status == "SUCCESS" else None
+    cache = json.dumps({"status": status, "results": results})
+    etag = (await get_results(make_redis(cache))).headers["etag"]
+
+    response = await get_results(make_redis(cache), {"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+@pytest.mark.anyio
+async def test_same_etag_for_reordered_cache():
+    """Тело ответа каноническое: порядок ключей в кэше не влияет на ETag"""
+    first = await get_results(
+        make_redis(json.dumps({"status": "SUCCESS", "results": RESULTS}))
+    )
+    reordered = dict(reversed(list(RESULTS.items())))
+    second = await get_results(
+        make_redis(json.dumps({"results": reordered, "status": "SUCCESS"}))
+    )
+
+    assert first.headers["etag"] == second.headers["etag"]
+
+
+def test_etag_matches():
+    assert etag_matches('"x", W/"y"', '"y"')
+    assert etag_matches("*", '"y"')
+    assert not etag_matches('"x"', '"y"')
+    assert not etag_matches(None, '"y"')
+
+
+@pytest.mark.anyio
+async def test_manifest_of_deleted_archive():
+    error = S3Error(Mock(), "NoSuchKey", "not found", TASK_ID, None, None)
+
+    with patch("app.api.routers.read_manifest", Mock(side_effect=error)):
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as ac:
+            response = await ac.get(f"/archives/{TASK_ID}/manifest")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_results_from_database():
+    """Без кэша статус читается из task_results, результаты - только для завершённых задач"""
+    mock_db_session = AsyncMock()
+    row = SimpleNamespace(status=TaskStatusEnum.SUCCESS, results=RESULTS)
+    mock_db_session.execute.return_value = MagicMock(first=Mock(return_value=row))
+
+    async def override_get_db():
+        yield mock_db_session
+
+    app.dependency_overrides[get_db] = override_get_db
+    redis_client = make_redis()
+    response = await get_results(redis_client)
+    app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.json()["results"]["overall_coverage"] == 80.0
+    statement = str(mock_db_session.execute.call_args.args[0])
+    assert "CASE WHEN" in statement
+    assert "FROM task_reports" in statement
+    # Кэш заполняется, только если воркер не записал более новый статус
+    redis_client.set.assert_awaited_once()
+    assert redis_client.set.call_args.args[0] == result_key(TASK_ID)
+    assert redis_client.set.call_args.kwargs["nx"] is True
+
+
+@pytest.mark.anyio
+async def test_results_carry_only_report_pointer():
+    results = {
+        **RESULTS,
+        "report": {
+            "object": f"{TASK_ID}.report.jsonl.zst",
+            "findings": 120000,
+            "size": 900000,
+        },
+    }
+    redis_client = make_redis(json.dumps({"status": "SUCCESS", "results": results}))
+
+    response = await get_results(redis_client)
+
+    assert response.json()["results"]["report"] == {"findings": 120000, "size": 900000}
+
+
+@pytest.mark.anyio
+async def test_findings_page_and_cursor():
+    items = [{"analyzer": "smells", "file": "src/main.py", "line": 3}]
+    mock_read = Mock(return_value=(items, 42))
+
+    with patch("app.api.routers.read_findings", mock_read):
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as ac:
+            first = await ac.get(
+                f"/results/{TASK_ID}/findings",
+                params={"analyzer": "smells", "limit": 1},
+            )
+            mock_read.return_value = ([], None)
+            second = await ac.get(
+                f"/results/{TASK_ID}/findings",
+                params={"cursor": first.json()["next_cursor"]},
+            )
+
+    assert first.status_code == 200
+    assert first.json()["items"][0]["file"] == "src/main.py"
+    assert mock_read.call_args_list[0].args == (TASK_ID, 0, 1, "smells")
+    assert mock_read.call_args_list[1].args == (TASK_ID, 42, 100, None)
+    assert second.json() == {"items": [], "next_cursor": None}
+
+
+@pytest.mark.anyio
+async def test_findings_without_report():
+    error = S3Error(Mock(), "NoSuchKey", "not found", TASK_ID, None, None)
+
+    with patch("app.api.routers.read_findings", Mock(side_effect=error)):
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as ac:
+            missing = await ac.get(f"/results/{TASK_ID}/findings")
+            bad_cursor = await ac.get(
+                f"/results/{TASK_ID}/findings", params={"cursor": "???"}
+            )
+
+    assert missing.status_code == 404
+    assert bad_cursor.status_code == 400
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from unittest.mock import AsyncMock, MagicMock
+from app.main import app
+from app.db.session import get_db
+from app.api.pagination import decode_cursor, encode_cursor
+
+
+def make_rows(count: int):
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        SimpleNamespace(
+            task_id=f"{i:064x}",
+            status="FAILED",
+            size=100,
+            created_at=now - timedelta(minutes=i),
+            updated_at=now - timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+
+def override_db(rows):
+    mock_db_session = AsyncMock()
+    result = MagicMock()
+    result.all.return_value = rows
+    mock_db_session.execute.return_value = result
+
+    async def override_get_db():
+        yield mock_db_session
+
+    app.dependency_overrides[get_db] = override_get_db
+    return mock_db_session
+
+
+def test_cursor_roundtrip():
+    updated_at = datetime(2026, 1, 1, 12, 30, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(updated_at, "abc")) == (updated_at, "abc")
+
+
+@pytest.mark.anyio
+async def test_list_tasks_next_page():
+    """Если строк больше лимита - возвращается курсор на следующую страницу"""
+    rows = make_rows(3)
+    override_db(rows)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/tasks", params={"status": "FAILED", "limit": 2})
+
+    app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["task_id"] for item in body["items"]] == [
+        rows[0].task_id,
+        rows[1].task_id,
+    ]
+    assert "results" not in body["items"][0]
+    assert decode_cursor(body["next_cursor"]) == (rows[1].updated_at, rows[1].task_id)
+
+
+@pytest.mark.anyio
+async def test_list_tasks_last_page():
+    override_db(make_rows(2))
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/tasks", params={"limit": 2})
+
+    app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+
+
+@pytest.mark.anyio
+async def test_list_tasks_bad_cursor():
+    override_db([])
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/tasks", params={"cursor": "not-a-cursor"})
+
+    app.dependency_overrides.clear()
+
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_quality_stats_per_day():
+    day = datetime(2026, 1, 1).date()
+    rollups = [
+        SimpleNamespace(day=day, metric="bugs", severity="critical", value=4.0, tasks=2),
+        SimpleNamespace(day=day, metric="coverage", severity="", value=150.0, tasks=2),
+    ]
+    mock_db_session = override_db([])
+    mock_db_session.execute.return_value.all.return_value = rollups
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get(
+            "/stats/quality", params={"date_from": "2026-01-01", "date_to": "2026-01-31"}
+        )
+        too_long = await ac.get("/stats/quality", params={"date_from": "2020-01-01"})
+
+    app.dependency_overrides.clear()
+
+    # Неперенесённые приращения учитываются при чтении
+    statement = mock_db_session.execute.call_args.args[0]
+    assert "quality_rollup_deltas" in str(statement)
+    assert response.status_code == 200
+    assert response.json()["items"] == [
+        {
+            "day": "2026-01-01",
+            "tasks": 2,
+            "average_coverage": 75.0,
+            "bugs": {"critical": 4},
+            "vulnerabilities": {},
+            "code_smells": {},
+        }
+    ]
+    assert too_long.status_code == 400
@@ -4,14 +4,24 @@ from unittest.mock import AsyncMock, patch, Mock
 from asgi_lifespan import LifespanManager
 from app.main import app
 from app.db.session import get_db
+from app.api.dependencies import admission_control
+from app.models.task_outbox import TaskOutbox
+from app.models.task_result import TaskResult
+from app.services.admission import AdmissionRejected
+
+
+async def override_admission_control():
+    yield
 
 
 @pytest.mark.anyio("asyncio")
 async def test_upload_without_file():
+    app.dependency_overrides[admission_control] = override_admission_control
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test"
     ) as ac:
         response = await ac.post("/upload")
+    app.dependency_overrides.clear()
     assert response.status_code == 422
 
 
@@ -22,6 +32,7 @@ async def test_upload_correct_filetype():
     test_file = {"file": ("test.zip", b"Fake ZIP content", "application/zip")}
 
     mock_db_session = AsyncMock()
+    mock_db_session.add = Mock()
 
     async def override_get_db():
         yield mock_db_session
@@ -29,15 +40,14 @@ async def test_upload_correct_filetype():
     mock_file_exists = Mock(return_value=False)
     mock_upload_to_minio = AsyncMock(return_value=True)
     mock_delete_from_minio = AsyncMock()
-    mock_celery_task = AsyncMock()
 
     with (
         patch("app.api.routers.file_exists_in_minio", mock_file_exists),
         patch("app.api.routers.upload_to_minio", mock_upload_to_minio),
         patch("app.api.routers.delete_from_minio", mock_delete_from_minio),
-        patch("app.api.routers.process_zip_task.apply_async", mock_celery_task),
     ):
         app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[admission_control] = override_admission_control
 
         async with AsyncClient(
             transport=ASGITransport(app=app), base_url="http://test"
@@ -47,6 +57,12 @@ async def test_upload_correct_filetype():
         assert response.status_code == 200
         app.dependency_overrides.clear()
 
+    # Задача и сообщение для брокера записываются одной транзакцией
+    added = [call.args[0] for call in mock_db_session.add.call_args_list]
+    assert [type(obj) for obj in added] == [TaskResult, TaskOutbox]
+    assert added[1].task_id == added[0].task_id == response.json()["task_id"]
+    mock_db_session.commit.assert_awaited_once()
+
 
 @pytest.mark.anyio
 async def test_upload_incorrect_filetype():
@@ -66,17 +82,16 @@ async def test_upload_incorrect_filetype():
     mock_file_exists = Mock(return_value=False)
     mock_upload_to_minio = AsyncMock(return_value=True)
     mock_delete_from_minio = AsyncMock()
-    mock_celery_task = AsyncMock()
 
     # Патчи для замены реальных функций на моки
     with (
         patch("app.api.routers.file_exists_in_minio", mock_file_exists),
         patch("app.api.routers.upload_to_minio", mock_upload_to_minio),
         patch("app.api.routers.delete_from_minio", mock_delete_from_minio),
-        patch("app.api.routers.process_zip_task.apply_async", mock_celery_task),
     ):
         # Перегрузка зависимости для БД
         app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[admission_control] = override_admission_control
 
         # Выполнение запроса с файлом
         async with AsyncClient(  # Мок файла некорректного типа
@@ -93,6 +108,39 @@ async def test_upload_incorrect_filetype():
         app.dependency_overrides.clear()
 
 
+@pytest.mark.anyio
+async def test_upload_rejected_under_overload():
+    """При перегрузке загрузка отклоняется с 429 и Retry-After"""
+
+    test_file = {"file": ("test.zip", b"Fake ZIP content", "application/zip")}
+
+    mock_controller = Mock()
+    mock_controller.admit = AsyncMock(
+        side_effect=AdmissionRejected("Очередь переполнена", 42)
+    )
+    mock_upload_to_minio = Mock(return_value=True)
+    mock_form = Mock()
+
+    with (
+        patch(
+            "app.api.dependencies.get_admission_controller",
+            Mock(return_value=mock_controller),
+        ),
+        patch("app.api.routers.upload_to_minio", mock_upload_to_minio),
+        patch("starlette.requests.Request.form", mock_form),
+    ):
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as ac:
+            response = await ac.post("/upload", files=test_file)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "42"
+    mock_upload_to_minio.assert_not_called()
+    # Отклонённая загрузка не читает тело запроса
+    mock_form.assert_not_called()
+
+
 # @pytest.mark.anyio
 # async def test_upload_file_retry():
 #     """Тест для проверки повторной загрузки файла"""
@@ -111,14 +159,12 @@ async def test_upload_incorrect_filetype():
 #     mock_file_exists = Mock(side_effect=[False, True])
 #     mock_upload_to_minio = AsyncMock(return_value=True)
 #     mock_delete_from_minio = AsyncMock()
-#     mock_celery_task = AsyncMock()
 
 #     # Патчи для замены реальных функций на моки
 #     with (
 #         patch("app.api.routers.file_exists_in_minio", mock_file_exists),
 #         patch("app.api.routers.upload_to_minio", mock_upload_to_minio),
 #         patch("app.api.routers.delete_from_minio", mock_delete_from_minio),
-#         patch("app.api.routers.process_zip_task.apply_async", mock_celery_task),
 #     ):
 #         # Перегрузка зависимости для БД
 #         app.dependency_overrides[get_db] = override_get_db
@@ -174,14 +220,12 @@ async def test_upload_incorrect_filetype():
 #     )  # Файл сначала не существует, потом существует, потом снова не существует
 #     mock_upload_to_minio = AsyncMock(return_value=True)
 #     mock_delete_from_minio = AsyncMock()
-#     mock_celery_task = AsyncMock()
 
 #     # Патчи для замены реальных функций на моки
 #     with (
 #         patch("app.api.routers.file_exists_in_minio", mock_file_exists),
 #         patch("app.api.routers.upload_to_minio", mock_upload_to_minio),
 #         patch("app.api.routers.delete_from_minio", mock_delete_from_minio),
-#         patch("app.api.routers.process_zip_task.apply_async", mock_celery_task),
 #     ):
 #         # Перегрузка зависимости для БД
 #         app.dependency_overrides[get_db] = override_get_db
@@ -235,14 +279,12 @@ async def test_upload_incorrect_filetype():
 #     mock_file_exists = Mock(return_value=False)  # Файл не существует
 #     mock_upload_to_minio = AsyncMock(return_value=True)
 #     mock_delete_from_minio = AsyncMock()
-#     mock_celery_task = AsyncMock()
 
 #     # Патчи для замены реальных функций на моки
 #     with (
 #         patch("app.api.routers.file_exists_in_minio", mock_file_exists),
 #         patch("app.api.routers.upload_to_minio", mock_upload_to_minio),
 #         patch("app.api.routers.delete_from_minio", mock_delete_from_minio),
-#         patch("app.api.routers.process_zip_task.apply_async", mock_celery_task),
 #     ):
 #         # Перегрузка зависимости для БД
 #         app.dependency_overrides[get_db] = override_get_db
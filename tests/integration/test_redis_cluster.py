@@ -0,0 +1,115 @@
+"""
+Кэш задач на локальном Redis Cluster из нескольких процессов redis-server.
+Пропускаются, если redis-server не установлен.
+"""
+
+import shutil
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import redis
+import redis.asyncio as redis_async
+
+from app.config import AdmissionSettings, AnalyzerSettings, redis_settings
+from app.db.session import create_redis
+from app.services.admission import AdmissionController, record_completion
+from app.services.analyzers import AdaptiveLimiter
+from app.services.cache import RESULT_CACHE_TTL, etag_key, result_key
+from app.services.retention import purge_results
+from benchmarks.redis_shards import LocalRedisCluster
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("redis-server") is None, reason="redis-server не установлен"
+)
+
+TASK_IDS = [f"{i:064x}" for i in range(200)]
+
+
+@pytest.fixture(scope="module")
+def cluster():
+    with LocalRedisCluster(shards=3) as cluster:
+        yield cluster
+
+
+@pytest.fixture
+def cluster_settings(cluster, monkeypatch):
+    monkeypatch.setattr(redis_settings, "REDIS_MODE", "cluster")
+    monkeypatch.setattr(redis_settings, "REDIS_URL", cluster.url)
+
+
+def test_task_keys_spread_across_shards(cluster, cluster_settings):
+    client = create_redis(redis)
+    assert isinstance(client, redis.RedisCluster)
+
+    # Так же, как update_cache в воркере: SETEX и DELETE одной задачи конвейером
+    with client.pipeline() as pipe:
+        for task_id in TASK_IDS:
+            pipe.setex(result_key(task_id), RESULT_CACHE_TTL, "{}")
+            pipe.delete(etag_key(task_id))
+        pipe.execute()
+
+    sizes = [redis.Redis(port=port).dbsize() for port in cluster.ports]
+    assert sum(sizes) == len(TASK_IDS)
+    assert all(size > 0 for size in sizes)
+
+    # Очистка по политике хранения удаляет ключи всех задач без CROSSSLOT
+    engine = MagicMock()
+    connection = engine.begin.return_value.__enter__.return_value
+    connection.execute.return_value.all.return_value = [
+        SimpleNamespace(task_id=task_id, archive_deleted_at="2026-01-01")
+        for task_id in TASK_IDS
+    ]
+    with patch("app.services.retention.delete_many_from_minio", return_value=[]):
+        purge_results(engine, client, retention_days=30, batch_size=len(TASK_IDS))
+
+    assert sum(redis.Redis(port=port).dbsize() for port in cluster.ports) == 0
+    client.close()
+
+
+@pytest.mark.anyio
+async def test_admission_on_cluster(cluster_settings):
+    client = create_redis(redis_async)
+    broker = MagicMock()
+    broker.llen = AsyncMock(return_value=0)
+    controller = AdmissionController(client, broker, AdmissionSettings())
+
+    slot = await controller.admit("127.0.0.1")
+    await controller.release(slot)
+
+    # Завершения задач, отмеченные воркером, дают наблюдаемую пропускную способность
+    sync_client = create_redis(redis)
+    for _ in range(30):
+        record_completion(sync_client, window=60)
+    sync_client.close()
+    controller.settings = AdmissionSettings(
+        ADMISSION_THROUGHPUT_WINDOW=60, ADMISSION_WORKER_THROUGHPUT=0.1
+    )
+    assert await controller.throughput() == pytest.approx(0.5)
+
+    await client.aclose()
+
+
+def test_analyzer_limit_aimd(cluster_settings):
+    client = create_redis(redis)
+    settings = AnalyzerSettings(
+        ANALYZER_INITIAL_LIMIT=2.0, ANALYZER_DECREASE_COOLDOWN=0.0
+    )
+    limiter = AdaptiveLimiter(client, "aimd-test", settings)
+
+    first, second = limiter.try_acquire(), limiter.try_acquire()
+    assert first and second
+    # Лимит 2 исчерпан
+    assert limiter.try_acquire() is None
+
+    limiter.release(first, latency=0.1)
+    assert float(client.hget(limiter.keys[0], "limit")) == pytest.approx(2.5)
+
+    # Ошибка без признаков перегрузки лимит не меняет
+    limiter.release(limiter.try_acquire(), latency=0.1, error=ValueError("bad"))
+    assert float(client.hget(limiter.keys[0], "limit")) == pytest.approx(2.5)
+
+    limiter.release(second, latency=0.1, error=TimeoutError())
+    assert float(client.hget(limiter.keys[0], "limit")) == pytest.approx(1.75)
+
+    client.close()
@@ -0,0 +1,157 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.config import AdmissionSettings
+from app.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    COMPLETIONS_SCRIPT,
+    IN_FLIGHT_SCRIPT,
+    TOKEN_BUCKET_SCRIPT,
+    queue_retry_after,
+)
+
+
+def test_queue_retry_after_accepts_short_queue():
+    assert queue_retry_after(depth=10, throughput=1.0, max_wait=600) is None
+
+
+def test_queue_retry_after_overloaded_queue():
+    # 2 задачи/сек, допустимо 100 сек ожидания -> очередь до 200 задач
+    assert queue_retry_after(depth=200, throughput=2.0, max_wait=100) == 1
+    assert queue_retry_after(depth=400, throughput=2.0, max_wait=100) == 101
+
+
+def make_session_maker(outbox_depth: int):
+    session = MagicMock()
+    session.scalar = AsyncMock(return_value=outbox_depth)
+    session_maker = MagicMock()
+    session_maker.return_value.__aenter__ = AsyncMock(return_value=session)
+    session_maker.return_value.__aexit__ = AsyncMock(return_value=False)
+    return session_maker
+
+
+def make_controller(
+    depth=0, in_flight=1, wait="0", outbox_depth=None, completed=0, **settings
+):
+    redis_client = MagicMock()
+    scripts = {
+        TOKEN_BUCKET_SCRIPT: AsyncMock(return_value=wait),
+        IN_FLIGHT_SCRIPT: AsyncMock(return_value=in_flight),
+        COMPLETIONS_SCRIPT: AsyncMock(return_value=completed),
+    }
+    redis_client.register_script.side_effect = scripts.get
+    redis_client.zrem = AsyncMock()
+
+    broker_client = MagicMock()
+    if isinstance(depth, Exception):
+        broker_client.llen = AsyncMock(side_effect=depth)
+    else:
+        broker_client.llen = AsyncMock(return_value=depth)
+
+    session_maker = None
+    if outbox_depth is not None:
+        session_maker = make_session_maker(outbox_depth)
+
+    controller = AdmissionController(
+        redis_client, broker_client, AdmissionSettings(**settings), session_maker
+    )
+    return controller, redis_client
+
+
+@pytest.mark.anyio
+async def test_admit():
+    controller, redis_client = make_controller()
+
+    slot = await controller.admit("127.0.0.1")
+    await controller.release(slot)
+
+    redis_client.zrem.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_admit_rejects_deep_queue():
+    controller, redis_client = make_controller(
+        depth=1000, ADMISSION_WORKER_THROUGHPUT=1.0, ADMISSION_MAX_QUEUE_WAIT=100
+    )
+
+    with pytest.raises(AdmissionRejected) as e:
+        await controller.admit("127.0.0.1")
+
+    assert e.value.retry_after == 901
+    controller._occupy_slot.assert_not_awaited()
+
+
+@pytest.mark.anyio
+async def test_admit_uses_observed_throughput():
+    # 3000 задач за 300 сек - 10 задач/сек, очередь 900 разберётся за 90 сек
+    controller, _ = make_controller(
+        depth=900,
+        completed=3000,
+        ADMISSION_WORKER_THROUGHPUT=1.0,
+        ADMISSION_MAX_QUEUE_WAIT=100,
+        ADMISSION_THROUGHPUT_WINDOW=300,
+    )
+
+    assert await controller.throughput() == 10.0
+    slot = await controller.admit("127.0.0.1")
+    assert slot
+
+
+@pytest.mark.anyio
+async def test_idle_workers_use_configured_throughput():
+    controller, _ = make_controller(completed=0, ADMISSION_WORKER_THROUGHPUT=2.0)
+
+    assert await controller.throughput() == 2.0
+
+
+@pytest.mark.anyio
+async def test_admit_rejects_too_many_in_flight():
+    controller, redis_client = make_controller(
+        in_flight=11, ADMISSION_MAX_IN_FLIGHT_UPLOADS=10
+    )
+
+    with pytest.raises(AdmissionRejected):
+        await controller.admit("127.0.0.1")
+
+    redis_client.zrem.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_admit_rejects_empty_bucket():
+    controller, redis_client = make_controller(wait="2.5")
+
+    with pytest.raises(AdmissionRejected) as e:
+        await controller.admit("127.0.0.1")
+
+    assert e.value.retry_after == 3
+    redis_client.zrem.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_admit_without_broker():
+    # Брокер недоступен: загрузка не зависит от него, очередь брокера не учитывается
+    controller, redis_client = make_controller(
+        depth=RedisConnectionError("broker is down"), outbox_depth=3
+    )
+
+    assert await controller.queue_depth() == 3
+    assert await controller.admit("127.0.0.1")
+
+
+@pytest.mark.anyio
+async def test_admit_counts_unpublished_outbox():
+    # Отставание relay: задачи ещё в outbox, очередь брокера пуста
+    controller, redis_client = make_controller(
+        depth=0,
+        outbox_depth=1000,
+        ADMISSION_WORKER_THROUGHPUT=1.0,
+        ADMISSION_MAX_QUEUE_WAIT=100,
+    )
+
+    with pytest.raises(AdmissionRejected) as e:
+        await controller.admit("127.0.0.1")
+
+    assert e.value.retry_after == 901
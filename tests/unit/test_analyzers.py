@@ -0,0 +1,170 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+import redis
+
+from app.config import AnalyzerSettings
+from app.services.analyzers import (
+    ACQUIRE_SCRIPT,
+    DECREASE,
+    HOLD,
+    INCREASE,
+    RELEASE_SCRIPT,
+    AdaptiveLimiter,
+    AnalyzerBusyError,
+    first_successful,
+    is_congestion,
+    spawn,
+)
+
+
+def make_limiter(acquired=1, **settings):
+    redis_client = MagicMock()
+    scripts = {
+        ACQUIRE_SCRIPT: MagicMock(return_value=acquired),
+        RELEASE_SCRIPT: MagicMock(return_value="4.25"),
+    }
+    redis_client.register_script.side_effect = scripts.get
+    limiter = AdaptiveLimiter(redis_client, "coverage", AnalyzerSettings(**settings))
+    return limiter, scripts[ACQUIRE_SCRIPT], scripts[RELEASE_SCRIPT]
+
+
+def test_call_reports_success():
+    limiter, acquire, release = make_limiter()
+
+    assert limiter.call(lambda x: x * 2, 21) == 42
+
+    acquire.assert_called_once()
+    keys = release.call_args.kwargs["keys"]
+    assert keys == ["zipv:analyzer:limit:{coverage}", "zipv:analyzer:permits:{coverage}"]
+    # Второй аргумент скрипта - изменение лимита
+    assert release.call_args.kwargs["args"][1] == INCREASE
+
+
+def test_error_without_congestion_keeps_limit():
+    limiter, _, release = make_limiter()
+
+    def failing():
+        raise RuntimeError("backend is down")
+
+    with pytest.raises(RuntimeError):
+        limiter.call(failing)
+
+    assert release.call_args.kwargs["args"][1] == HOLD
+    assert len(limiter.latencies) == 0
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        TimeoutError(),
+        httpx.ReadTimeout("timeout"),
+        httpx.HTTPStatusError(
+            "busy",
+            request=httpx.Request("GET", "http://analyzer"),
+            response=httpx.Response(429),
+        ),
+        httpx.HTTPStatusError(
+            "unavailable",
+            request=httpx.Request("GET", "http://analyzer"),
+            response=httpx.Response(503),
+        ),
+    ],
+)
+def test_congestion_decreases_limit(error):
+    limiter, _, release = make_limiter()
+
+    def failing():
+        raise error
+
+    with pytest.raises(type(error)):
+        limiter.call(failing)
+
+    assert release.call_args.kwargs["args"][1] == DECREASE
+
+
+def test_server_error_is_not_congestion():
+    error = httpx.HTTPStatusError(
+        "boom",
+        request=httpx.Request("GET", "http://analyzer"),
+        response=httpx.Response(500),
+    )
+    assert not is_congestion(error)
+
+
+def test_slow_response_decreases_limit():
+    limiter, _, release = make_limiter(ANALYZER_LATENCY_TARGET=0.0)
+
+    limiter.call(time.sleep, 0.01)
+
+    assert release.call_args.kwargs["args"][1] == DECREASE
+
+
+@pytest.mark.parametrize(
+    "configured, concurrency, expected",
+    [(None, 16, 16.0), (None, 500, 64.0), (None, None, 1.0), (8.0, 16, 8.0)],
+)
+def test_initial_limit_follows_worker_concurrency(configured, concurrency, expected):
+    limiter = AdaptiveLimiter(
+        MagicMock(),
+        "coverage",
+        AnalyzerSettings(ANALYZER_INITIAL_LIMIT=configured),
+        concurrency=concurrency,
+    )
+
+    assert limiter.initial_limit == expected
+
+
+def test_acquire_timeout():
+    limiter, acquire, _ = make_limiter(acquired=0, ANALYZER_ACQUIRE_TIMEOUT=0.2)
+
+    with pytest.raises(AnalyzerBusyError):
+        limiter.acquire()
+
+    assert acquire.call_count > 1
+
+
+def test_redis_unavailable_fails_open():
+    limiter, acquire, release = make_limiter()
+    acquire.side_effect = redis.ConnectionError("redis is down")
+
+    assert limiter.call(lambda: "ok") == "ok"
+    release.assert_not_called()
+
+
+def test_hedged_request_returns_faster_response():
+    limiter, acquire, _ = make_limiter(
+        ANALYZER_HEDGE_ENABLED=True, ANALYZER_HEDGE_MIN_SAMPLES=3
+    )
+    limiter.latencies.extend([0.01, 0.01, 0.01])
+    first_call = threading.Event()
+
+    def backend():
+        # Первый запрос "зависает", дубль отвечает сразу
+        if not first_call.is_set():
+            first_call.set()
+            time.sleep(1.0)
+            return "slow"
+        return "fast"
+
+    started = time.monotonic()
+    assert limiter.call(backend) == "fast"
+    assert time.monotonic() - started < 0.5
+    assert acquire.call_count == 2
+
+
+def test_first_successful_skips_failed():
+    def fail():
+        raise RuntimeError("boom")
+
+    def slow_ok():
+        time.sleep(0.05)
+        return "ok"
+
+    assert first_successful(spawn(fail), spawn(slow_ok)) == "ok"
+
+    with pytest.raises(RuntimeError):
+        first_successful(spawn(fail), spawn(fail))
@@ -0,0 +1,14 @@
+from redis.crc import key_slot
+
+from app.services.cache import cache_key, etag_key, result_key
+
+
+def test_task_keys_share_slot():
+    """Ключи одной задачи в одном слоте Redis Cluster, разных задач - в разных"""
+    assert key_slot(result_key("a").encode()) == key_slot(etag_key("a").encode())
+    assert key_slot(result_key("a").encode()) != key_slot(result_key("b").encode())
+
+
+def test_keys_are_prefixed():
+    assert result_key("a") == "zipv:result:{a}"
+    assert cache_key("admission:in_flight") == "zipv:admission:in_flight"
@@ -0,0 +1,358 @@
+import hashlib
+import io
+import os
+import random
+import zipfile
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+from minio.error import S3Error
+from sqlalchemy import bindparam, create_engine, select, update
+
+from app.config import MinioSettings
+from app.models.chunk_ref import ChunkManifest, ChunkRef
+from app.services import minio_client
+from app.services.chunk_store import (
+    chunk_archive,
+    chunk_spans,
+    collect_garbage,
+    iter_archive,
+    load_manifest,
+    store_archive,
+)
+from app.services.remote_zip import read_manifest
+
+SETTINGS = MinioSettings(
+    MINIO_CHUNK_MIN_SIZE=2 * 1024,
+    MINIO_CHUNK_AVG_SIZE=8 * 1024,
+    MINIO_CHUNK_MAX_SIZE=32 * 1024,
+    MINIO_CHUNK_UPLOAD_CONCURRENCY=4,
+)
+BUCKET = SETTINGS.MINIO_BUCKET_NAME
+
+
+class FakeMinio:
+    """MinIO в памяти: объекты и время их записи."""
+
+    def __init__(self):
+        self.objects = {}
+        self.modified = {}
+        self.puts = []
+        self.gets = []
+        self.lists = []
+
+    def put_object(self, bucket_name, object_name, data, length, content_type=None):
+        self.objects[object_name] = data.read()
+        self.modified[object_name] = datetime.now(timezone.utc)
+        self.puts.append(object_name)
+
+    def stat_object(self, bucket_name, object_name):
+        if object_name not in self.objects:
+            raise S3Error(Mock(), "NoSuchKey", "not found", object_name, None, None)
+        return SimpleNamespace(
+            size=len(self.objects[object_name]),
+            last_modified=self.modified[object_name],
+        )
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0):
+        self.stat_object(bucket_name, object_name)
+        self.gets.append(object_name)
+        data = self.objects[object_name]
+        response = Mock()
+        response.read.return_value = data[offset : offset + length] if length else data
+        return response
+
+    def list_objects(self, bucket_name, prefix, recursive=False):
+        self.lists.append(prefix)
+        return [
+            SimpleNamespace(
+                object_name=name,
+                last_modified=self.modified[name],
+                etag=hashlib.md5(self.objects[name]).hexdigest(),
+            )
+            for name in sorted(self.objects)
+            if name.startswith(prefix)
+        ]
+
+    def copy_object(self, bucket_name, object_name, source):
+        self.stat_object(bucket_name, source.object_name)
+        self.objects[object_name] = self.objects[source.object_name]
+        self.modified[object_name] = datetime.now(timezone.utc)
+
+    def remove_objects(self, bucket_name, delete_list):
+        for item in delete_list:
+            self.objects.pop(item.name, None)
+        return iter([])
+
+    def age(self, object_name, hours):
+        self.modified[object_name] -= timedelta(hours=hours)
+
+
+def make_data(size=256 * 1024, seed=1) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def store(client, task_id, data):
+    chunks = chunk_archive(
+        data,
+        SETTINGS.MINIO_CHUNK_MIN_SIZE,
+        SETTINGS.MINIO_CHUNK_AVG_SIZE,
+        SETTINGS.MINIO_CHUNK_MAX_SIZE,
+    )
+    return store_archive(client, task_id, data, chunks, SETTINGS)
+
+
+def test_chunk_spans_cover_data_within_bounds():
+    data = make_data()
+
+    spans = list(chunk_spans(data, 2048, 8192, 32768))
+
+    assert spans[0][0] == 0 and spans[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(spans, spans[1:]))
+    assert all(2048 <= end - start <= 32768 for start, end in spans[:-1])
+    assert spans == list(chunk_spans(data, 2048, 8192, 32768))
+
+
+def test_insertion_changes_only_neighbouring_chunks():
+    data = make_data()
+    middle = len(data) // 2
+    changed = data[:middle] + b"new line of code\n" + data[middle:]
+
+    before = {data[start:end] for start, end in chunk_spans(data, 2048, 8192, 32768)}
+    after = [changed[start:end] for start, end in chunk_spans(changed, 2048, 8192, 32768)]
+
+    assert len([chunk for chunk in after if chunk not in before]) <= 2
+    assert len(after) > 10
+
+
+def test_second_upload_stores_only_new_chunks():
+    client = FakeMinio()
+    data = make_data()
+    changed = data[:1000] + b"patched" + data[1007:]
+
+    first = store(client, "a", data)
+    second = store(client, "b", changed)
+
+    assert first.new_chunks == first.chunks
+    assert second.new_chunks == 1
+    assert second.new_bytes < len(changed) // 4
+    manifest = load_manifest(client, BUCKET, "b")
+    assert b"".join(iter_archive(client, BUCKET, manifest)) == changed
+
+
+def test_old_existing_chunk_is_refreshed():
+    client = FakeMinio()
+    data = make_data(64 * 1024)
+    store(client, "a", data)
+    stale = next(name for name in client.objects if name.startswith("chunks/"))
+    client.age(stale, SETTINGS.MINIO_CHUNK_GC_GRACE_HOURS)
+    client.puts.clear()
+
+    store(client, "a", data)
+
+    assert [name for name in client.puts if not name.startswith("manifests-new/")] == [
+        stale,
+        "manifests/a.json",
+    ]
+
+
+def delete(client, task_id):
+    with patch("app.services.minio_client.get_minio_client", return_value=client):
+        assert minio_client.delete_from_minio(task_id)
+
+
+def chunk_names(client, task_id):
+    manifest = load_manifest(client, BUCKET, task_id)
+    return {f"chunks/{digest}" for digest, _ in manifest["chunks"]}
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    ChunkRef.__table__.create(engine)
+    ChunkManifest.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+def age(client, engine, names, hours):
+    """Сдвигает назад время записи чанков и время, с которого на них нет ссылок."""
+    for name in names:
+        client.age(name, hours)
+    with engine.begin() as connection:
+        rows = connection.execute(
+            select(ChunkRef.digest, ChunkRef.zero_since).where(
+                ChunkRef.zero_since.isnot(None)
+            )
+        ).all()
+        if rows:
+            connection.execute(
+                update(ChunkRef)
+                .where(ChunkRef.digest == bindparam("b_digest"))
+                .values(zero_since=bindparam("b_since")),
+                [
+                    {"b_digest": digest, "b_since": since - timedelta(hours=hours)}
+                    for digest, since in rows
+                ],
+            )
+
+
+def gc(client, engine, rebuild=False):
+    return collect_garbage(engine, client, BUCKET, grace_hours=6, rebuild=rebuild)
+
+
+def test_garbage_collection_keeps_referenced_and_fresh_chunks(engine):
+    client = FakeMinio()
+    store(client, "a", make_data(seed=1))
+    store(client, "b", make_data(seed=2))
+    chunks_b = chunk_names(client, "b")
+    assert gc(client, engine) == 0
+    delete(client, "b")
+
+    # Свежие чанки без ссылок не удаляются: загрузка могла ещё не записать манифест
+    assert gc(client, engine) == 0
+
+    age(client, engine, chunks_b, 7)
+    assert gc(client, engine) == len(chunks_b)
+    assert not chunks_b & set(client.objects)
+    assert [name for name in client.objects if not name.startswith("chunks/")] == [
+        "manifests/a.json"
+    ]
+    manifest = load_manifest(client, BUCKET, "a")
+    assert b"".join(iter_archive(client, BUCKET, manifest)) == make_data(seed=1)
+
+
+def test_garbage_collection_reads_only_journal(engine):
+    client = FakeMinio()
+    for seed in range(3):
+        store(client, f"a{seed}", make_data(seed=seed))
+    gc(client, engine)
+    store(client, "new", make_data(seed=10))
+    delete(client, "a0")
+    client.gets.clear()
+    client.lists.clear()
+
+    gc(client, engine)
+
+    assert sorted(name.split(".")[0] for name in client.gets) == [
+        "chunk-uploads/new",
+        "manifests-deleted/a0",
+        "manifests/new",
+    ]
+    assert "chunks/" not in client.lists and "manifests/" not in client.lists
+
+
+def test_garbage_collection_keeps_reuploaded_archive(engine):
+    client = FakeMinio()
+    data = make_data(seed=1)
+    store(client, "a", data)
+    gc(client, engine)
+    delete(client, "a")
+    store(client, "a", data)
+    age(client, engine, chunk_names(client, "a"), 7)
+
+    assert gc(client, engine) == 0
+    # Повторная копия удалённого манифеста (сбой до её удаления) тоже безопасна
+    client.put_object(
+        BUCKET, "manifests-deleted/a.0.json", io.BytesIO(client.objects["manifests/a.json"]), 0
+    )
+    assert gc(client, engine) == 0
+    manifest = load_manifest(client, BUCKET, "a")
+    assert b"".join(iter_archive(client, BUCKET, manifest)) == data
+
+
+def test_garbage_collection_removes_chunks_of_failed_upload(engine):
+    client = FakeMinio()
+    put_object = client.put_object
+
+    def fail_manifest(bucket_name, object_name, *args, **kwargs):
+        if object_name.startswith("manifests/"):
+            raise S3Error(Mock(), "InternalError", "failed", object_name, None, None)
+        put_object(bucket_name, object_name, *args, **kwargs)
+
+    with patch.object(client, "put_object", side_effect=fail_manifest):
+        with pytest.raises(S3Error):
+            store(client, "a", make_data(seed=1))
+    chunks = {name for name in client.objects if name.startswith("chunks/")}
+    assert gc(client, engine) == 0
+
+    age(client, engine, chunks, 7)
+    assert gc(client, engine) == len(chunks)
+    assert not client.objects
+
+
+def test_overwritten_manifest_rebuilds_references(engine):
+    client = FakeMinio()
+    data = make_data(seed=1)
+    store(client, "a", data)
+    gc(client, engine)
+    chunks = chunk_archive(data, 1024, 4096, 16384)
+    store_archive(client, "a", data, chunks, SETTINGS)
+    age(client, engine, [name for name in client.objects if name.startswith("chunks/")], 7)
+
+    gc(client, engine)
+
+    manifest = load_manifest(client, BUCKET, "a")
+    assert b"".join(iter_archive(client, BUCKET, manifest)) == data
+    assert {name for name in client.objects if name.startswith("chunks/")} == chunk_names(
+        client, "a"
+    )
+
+
+def test_rebuild_after_manifest_removed_directly(engine):
+    client = FakeMinio()
+    store(client, "a", make_data(seed=1))
+    gc(client, engine)
+    chunks = chunk_names(client, "a")
+    del client.objects["manifests/a.json"]
+    age(client, engine, chunks, 7)
+
+    assert gc(client, engine) == 0
+    assert gc(client, engine, rebuild=True) == len(chunks)
+
+
+def test_manifest_not_deleted_without_copy():
+    client = FakeMinio()
+    store(client, "a", make_data(seed=1))
+    error = S3Error(Mock(), "AccessDenied", "denied", "a", None, None)
+
+    with (
+        patch.object(client, "copy_object", side_effect=error),
+        patch("app.services.minio_client.get_minio_client", return_value=client),
+    ):
+        assert not minio_client.delete_from_minio("a")
+    assert "manifests/a.json" in client.objects
+
+
+def test_manifest_of_chunked_archive_read_by_range():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("big.bin", os.urandom(200 * 1024))
+        archive.writestr("src/main.py", "print('hello')\n")
+    client = FakeMinio()
+    store(client, "a", buffer.getvalue())
+
+    with patch("app.services.remote_zip.chunked_storage", return_value=True):
+        manifest = read_manifest("a", client=client, block_size=4096, cache_blocks=4)
+
+    assert [entry["name"] for entry in manifest["entries"]] == ["big.bin", "src/main.py"]
+
+
+@pytest.mark.parametrize("mode", ["object", "chunked"])
+def test_download_reads_both_formats(mode):
+    client = FakeMinio()
+    data = make_data(64 * 1024)
+    store(client, "chunked", data)
+    client.put_object(BUCKET, "whole", io.BytesIO(data), len(data))
+
+    with (
+        patch.object(minio_client.settings, "MINIO_STORAGE_MODE", mode),
+        patch("app.services.minio_client.get_minio_client", return_value=client),
+    ):
+        assert minio_client.download_from_minio("chunked") == data
+        assert minio_client.download_from_minio("whole") == data
+        assert minio_client.download_from_minio("missing") is None
+        assert minio_client.file_exists_in_minio("chunked")
+        assert not minio_client.file_exists_in_minio("missing")
@@ -0,0 +1,91 @@
+import hashlib
+import io
+import zipfile
+
+import pytest
+
+from app.services.execution import (
+    InvalidArchiveError,
+    get_pool_profile,
+    inspect_archive,
+    run_cpu_bound,
+    shutdown_cpu_executor,
+)
+
+
+def make_zip(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    "pool, offload_cpu",
+    [
+        ("eventlet", True),
+        ("gevent", True),
+        ("threads", True),
+        ("prefork", False),
+        ("solo", False),
+    ],
+)
+def test_pool_profiles(pool, offload_cpu):
+    profile = get_pool_profile(pool)
+    assert profile.pool == pool
+    assert profile.offload_cpu is offload_cpu
+    assert profile.concurrency >= 1
+    assert profile.prefetch_multiplier == 1
+
+
+def test_pool_profile_explicit_concurrency():
+    assert get_pool_profile("threads", 7).concurrency == 7
+    # solo всегда выполняет одну задачу за раз
+    assert get_pool_profile("solo", 7).concurrency == 1
+
+
+def test_pool_profile_unknown():
+    with pytest.raises(ValueError):
+        get_pool_profile("asyncio")
+
+
+def test_inspect_archive():
+    data = make_zip({"a.py": b"print(1)", "pkg/b.py": b"x" * 1000})
+    manifest = inspect_archive(data, hashlib.sha256(data).hexdigest())
+
+    assert manifest["files"] == 2
+    assert manifest["uncompressed_size"] == 1008
+
+
+def test_inspect_archive_hash_mismatch():
+    data = make_zip({"a.py": b"print(1)"})
+    with pytest.raises(InvalidArchiveError):
+        inspect_archive(data, "0" * 64)
+
+
+def test_inspect_archive_not_zip():
+    with pytest.raises(InvalidArchiveError):
+        inspect_archive(b"Fake ZIP content")
+
+
+def test_run_cpu_bound_in_process_pool():
+    """В модели threads проверка архива выполняется в пуле процессов."""
+    data = make_zip({"a.py": b"print(1)"})
+    try:
+        manifest = run_cpu_bound(get_pool_profile("threads"), inspect_archive, data)
+    finally:
+        shutdown_cpu_executor()
+
+    assert manifest["sha256"] == hashlib.sha256(data).hexdigest()
+
+
+def test_invalid_archive_error_from_process_pool():
+    """Ошибка проверки архива доходит из пула процессов с тем же типом: задача не повторяется."""
+    try:
+        with pytest.raises(InvalidArchiveError):
+            run_cpu_bound(
+                get_pool_profile("threads"), inspect_archive, b"Fake ZIP content"
+            )
+    finally:
+        shutdown_cpu_executor()
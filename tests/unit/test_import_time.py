@@ -0,0 +1,76 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Бюджет времени импорта точек входа (сек), с запасом на медленные CI-машины
+API_IMPORT_BUDGET = 3.0
+WORKER_IMPORT_BUDGET = 4.0
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+
+from app.db import session
+created = [
+    name
+    for name in ("get_async_engine", "get_sync_engine", "get_redis_async", "get_redis_sync")
+    if getattr(session, name).cache_info().currsize
+]
+from app.services.minio_client import get_minio_client
+if get_minio_client.cache_info().currsize:
+    created.append("get_minio_client")
+print(json.dumps({{"elapsed": elapsed, "modules": sorted(sys.modules), "created": created}}))
+"""
+
+
+def probe_import(module: str) -> dict:
+    """Импортирует модуль в чистом интерпретаторе и возвращает замеры."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope="module")
+def api_import():
+    return probe_import("app.main")
+
+
+@pytest.fixture(scope="module")
+def worker_import():
+    return probe_import("app.services.celery")
+
+
+def test_api_import_budget(api_import):
+    assert api_import["elapsed"] < API_IMPORT_BUDGET
+
+
+def test_api_does_not_import_worker(api_import):
+    """API отправляет задачи по имени и не тянет Celery, модуль задач и внешние API"""
+    modules = set(api_import["modules"])
+    assert "celery" not in modules
+    assert "app.services.celery" not in modules
+    assert not any(module.startswith("external_api") for module in modules)
+
+
+def test_api_creates_no_clients_on_import(api_import):
+    assert api_import["created"] == []
+
+
+def test_worker_import_budget(worker_import):
+    assert worker_import["elapsed"] < WORKER_IMPORT_BUDGET
+
+
+def test_worker_creates_no_clients_on_import(worker_import):
+    assert worker_import["created"] == []
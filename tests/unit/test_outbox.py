@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.outbox import relay_batch
+
+
+def make_engine(rows):
+    engine = MagicMock()
+    connection = engine.begin.return_value.__enter__.return_value
+    connection.execute.return_value.all.return_value = rows
+    return engine, connection
+
+
+def test_relay_batch_publishes_and_marks_sent():
+    engine, connection = make_engine(
+        [
+            SimpleNamespace(id=1, task_name="process_zip_task", task_id="a"),
+            SimpleNamespace(id=2, task_name="process_zip_task", task_id="b"),
+        ]
+    )
+    published = []
+    mock_publish = Mock(side_effect=lambda messages: published.extend(messages))
+
+    with patch("app.services.outbox.publish_tasks", mock_publish):
+        assert relay_batch(engine, batch_size=100) == 2
+
+    assert published == [("process_zip_task", "a"), ("process_zip_task", "b")]
+    select_statement = str(
+        connection.execute.call_args_list[0].args[0].compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert "FOR UPDATE SKIP LOCKED" in select_statement
+    update_statement = str(connection.execute.call_args.args[0])
+    assert update_statement.startswith("UPDATE task_outbox SET sent_at")
+
+
+def test_relay_batch_nothing_to_do():
+    engine, connection = make_engine([])
+    mock_publish = Mock()
+
+    with patch("app.services.outbox.publish_tasks", mock_publish):
+        assert relay_batch(engine, batch_size=100) == 0
+
+    mock_publish.assert_not_called()
+
+
+def test_relay_batch_keeps_messages_when_publish_fails():
+    engine, connection = make_engine(
+        [SimpleNamespace(id=1, task_name="process_zip_task", task_id="a")]
+    )
+    mock_publish = Mock(side_effect=ConnectionError("broker down"))
+
+    with patch("app.services.outbox.publish_tasks", mock_publish):
+        with pytest.raises(ConnectionError):
+            relay_batch(engine, batch_size=100)
+
+    # Только SELECT: сообщения не помечены опубликованными и уйдут повторно
+    assert connection.execute.call_count == 1
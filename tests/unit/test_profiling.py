@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+import pytest
+
+from app.config import ProfilingSettings
+from app.services.profiling import (
+    MemorySnapshots,
+    StackSampler,
+    TaskProfile,
+    memory_stats,
+    profiling_allowed,
+    slow_stage,
+    write_profile,
+)
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiling_allowed():
+    disabled = ProfilingSettings(PROFILING_ENABLED=False)
+    open_access = ProfilingSettings(PROFILING_ENABLED=True)
+    with_token = ProfilingSettings(PROFILING_ENABLED=True, PROFILING_TOKEN="secret")
+
+    assert not profiling_allowed("secret", disabled)
+    # Без токена доступ закрыт
+    assert not profiling_allowed(None, open_access)
+    assert not profiling_allowed("1", open_access)
+    assert not profiling_allowed(None, with_token)
+    assert profiling_allowed("secret", with_token)
+    assert not profiling_allowed("wrong", with_token)
+
+
+def test_sampler_collects_stacks_of_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    try:
+        sampler = StackSampler(0.001, thread_ids=[worker.ident]).start()
+        time.sleep(0.1)
+        samples = sampler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert sum(samples.values()) > 10
+    assert all("busy_loop" in stack for stack in samples)
+
+
+def test_sampler_stops_after_max_duration():
+    sampler = StackSampler(0.001, max_duration=0.02).start()
+    time.sleep(0.1)
+    # Поток сэмплирования уже завершился, stop() не ждёт
+    started = time.monotonic()
+    sampler.stop()
+    assert time.monotonic() - started < 0.05
+
+
+def test_write_profile_is_collapsed_stacks(tmp_path):
+    samples = Counter({"main;handler;hash": 7, "main;handler": 2})
+
+    path = write_profile(samples, "api", "POST /upload", directory=str(tmp_path))
+
+    assert path.name.startswith("api-POST_upload-")
+    assert path.read_text().splitlines() == ["main;handler;hash 7", "main;handler 2"]
+
+
+def test_task_profile_writes_stacks_and_memory(tmp_path):
+    settings = ProfilingSettings(
+        PROFILING_ENABLED=True, PROFILING_DIR=str(tmp_path), PROFILING_INTERVAL=0.001
+    )
+
+    profile = TaskProfile("process_zip_task-abc", settings).start()
+    buffers = [bytearray(1024 * 1024) for _ in range(4)]
+    time.sleep(0.02)
+    path = profile.stop()
+
+    assert path.exists()
+    memory = path.with_suffix(".memory.txt").read_text().splitlines()
+    assert memory[0].startswith("peak ")
+    assert "test_profiling.py" in memory[1]
+    del buffers
+
+
+def test_overlapping_task_profiles(tmp_path):
+    """Первая завершившаяся задача не останавливает трассировку памяти второй"""
+    settings = ProfilingSettings(
+        PROFILING_ENABLED=True, PROFILING_DIR=str(tmp_path), PROFILING_INTERVAL=0.001
+    )
+
+    first = TaskProfile("first", settings).start()
+    second = TaskProfile("second", settings).start()
+    first.stop()
+    assert tracemalloc.is_tracing()
+
+    path = second.stop()
+    assert path.with_suffix(".memory.txt").exists()
+    assert not tracemalloc.is_tracing()
+
+
+def test_memory_snapshot_diff():
+    snapshots = MemorySnapshots(max_snapshots=2)
+    with pytest.raises(RuntimeError):
+        snapshots.take()
+
+    snapshots.start(frames=5)
+    try:
+        base_id, base = snapshots.take()
+        buffers = [bytearray(1024 * 1024) for _ in range(4)]
+        _, current = snapshots.take()
+        snapshots.take()
+
+        top = memory_stats(current, base, limit=5)
+        assert "test_profiling.py" in top[0]["location"]
+        assert top[0]["size_diff"] >= 4 * 1024 * 1024
+        # Хранятся только последние снимки
+        assert base_id not in snapshots.snapshots
+        del buffers
+    finally:
+        snapshots.stop()
+
+
+def test_slow_stage_logs_above_threshold(caplog):
+    with caplog.at_level(logging.WARNING, logger="app.services.profiling"):
+        with slow_stage("minio:upload", 0.0, task_id="abc"):
+            time.sleep(0.01)
+        with slow_stage("hash", None):
+            time.sleep(0.01)
+        with slow_stage("hash", 10.0):
+            pass
+
+    assert len(caplog.records) == 1
+    assert "minio:upload" in caplog.records[0].getMessage()
+    assert "task_id=abc" in caplog.records[0].getMessage()
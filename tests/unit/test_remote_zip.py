@@ -0,0 +1,83 @@
+import io
+import os
+import zipfile
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.remote_zip import MinioRangeFile, read_manifest, read_members
+
+
+class FakeMinio:
+    """MinIO в памяти, отдающий объект по диапазонам."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.ranges = []
+
+    def stat_object(self, bucket_name, object_name):
+        return SimpleNamespace(size=len(self.data))
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0):
+        self.ranges.append((offset, length))
+        response = MagicMock()
+        response.read.return_value = self.data[offset : offset + length]
+        return response
+
+
+def make_archive() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        # Несжимаемые данные: архив заведомо больше кэша блоков
+        archive.writestr("big.bin", os.urandom(4 * 1024 * 1024))
+        archive.writestr("src/main.py", "print('hello')\n")
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def archive_data():
+    return make_archive()
+
+
+def test_manifest_reads_only_tail(archive_data):
+    client = FakeMinio(archive_data)
+
+    manifest = read_manifest("a", client=client, bucket_name="b", block_size=64 * 1024)
+
+    assert manifest["files"] == 2
+    assert {entry["name"] for entry in manifest["entries"]} == {"big.bin", "src/main.py"}
+    # Хвост с EOCD и центральным каталогом - одним запросом
+    assert len(client.ranges) == 1
+    assert sum(length for _, length in client.ranges) < len(archive_data) / 20
+
+
+def test_read_selected_member(archive_data):
+    client = FakeMinio(archive_data)
+
+    members = read_members(
+        "a", ["src/main.py"], client=client, bucket_name="b", block_size=64 * 1024
+    )
+
+    assert members == {"src/main.py": b"print('hello')\n"}
+    assert sum(length for _, length in client.ranges) < len(archive_data) / 20
+
+
+def test_block_cache_and_eviction(archive_data):
+    client = FakeMinio(archive_data)
+    remote_file = MinioRangeFile(
+        "a", client=client, bucket_name="b", block_size=1024, cache_blocks=2
+    )
+
+    assert remote_file.read(10) == archive_data[:10]
+    remote_file.seek(5)
+    assert remote_file.read(2000) == archive_data[5:2005]
+    # Второй блок догружен отдельно, первый взят из кэша
+    assert client.ranges == [(0, 1024), (1024, 1024)]
+
+    remote_file.seek(-3, io.SEEK_END)
+    assert remote_file.read() == archive_data[-3:]
+    remote_file.seek(0)
+    remote_file.read(1)
+    # Первый блок вытеснен из кэша размером в два блока
+    assert client.ranges[-1] == (0, 1024)
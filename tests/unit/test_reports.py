@@ -0,0 +1,88 @@
+import io
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.reports import encode_report, read_findings, store_report
+
+FINDINGS = {
+    "coverage": [{"file": f"src/a_{i}.py", "line": i} for i in range(5)],
+    "smells": [{"file": f"src/b_{i}.py", "line": i} for i in range(3)],
+}
+
+
+class FakeResponse(io.BytesIO):
+    """Тело ответа MinIO."""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.released = False
+
+    def release_conn(self):
+        self.released = True
+
+
+@pytest.fixture
+def minio():
+    data, _ = encode_report(FINDINGS, level=3)
+    client = MagicMock()
+    client.get_object.side_effect = lambda *args: FakeResponse(data)
+    with patch("app.services.reports.get_minio_client", return_value=client):
+        yield client
+
+
+def test_encode_report_is_compressed_jsonl():
+    findings = {"coverage": [{"file": "src/main.py", "message": "x" * 100}] * 1000}
+
+    data, count = encode_report(findings, level=3)
+
+    assert count == 1000
+    # Однотипные находки сжимаются многократно
+    assert len(data) < 5000
+
+
+def test_store_report_returns_pointer():
+    client = MagicMock()
+    with (
+        patch("app.services.reports.get_minio_client", return_value=client),
+        patch("app.services.reports.ensure_bucket_exists"),
+    ):
+        pointer = store_report("abc", b"data", 7)
+
+    assert pointer == {"object": "abc.report.jsonl.zst", "findings": 7, "size": 4}
+    assert client.put_object.call_args.kwargs["object_name"] == "abc.report.jsonl.zst"
+
+
+def test_read_findings_pages(minio):
+    items, next_offset = read_findings("abc", 0, 3)
+    assert [item["file"] for item in items] == ["src/a_0.py", "src/a_1.py", "src/a_2.py"]
+    assert items[0]["analyzer"] == "coverage"
+    assert next_offset == 3
+
+    items, next_offset = read_findings("abc", next_offset, 10)
+    assert len(items) == 5
+    assert next_offset is None
+
+
+def test_read_findings_by_analyzer(minio):
+    items, next_offset = read_findings("abc", 0, 2, analyzer="smells")
+    assert [item["file"] for item in items] == ["src/b_0.py", "src/b_1.py"]
+    # Следующая страница начинается с оставшейся находки smells, а не после прочитанных строк
+    assert next_offset == 7
+
+    items, next_offset = read_findings("abc", next_offset, 2, analyzer="smells")
+    assert [item["file"] for item in items] == ["src/b_2.py"]
+    assert next_offset is None
+
+
+def test_read_findings_releases_connection_on_early_stop():
+    data, _ = encode_report(FINDINGS, level=3)
+    response = FakeResponse(data)
+    client = MagicMock()
+    client.get_object.return_value = response
+
+    with patch("app.services.reports.get_minio_client", return_value=client):
+        read_findings("abc", 0, 1)
+
+    assert response.closed
+    assert response.released
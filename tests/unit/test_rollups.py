@@ -0,0 +1,60 @@
+from datetime import date
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.rollups import collect_rollups, fold_rollups, record_rollups
+
+RESULTS = {
+    "overall_coverage": 80.0,
+    "bugs": {"total": 7, "critical": 2},
+    "vulnerabilities": {"total": 1},
+    "code_smells": {"total": 3},
+}
+
+
+def test_collect_rollups():
+    totals = collect_rollups([RESULTS, {**RESULTS, "overall_coverage": 60.0}])
+
+    assert totals["coverage", ""] == (140.0, 2)
+    assert totals["bugs", "critical"] == (4, 2)
+    assert totals["vulnerabilities", "total"] == (2, 2)
+
+
+def test_record_rollups_appends_deltas():
+    connection = MagicMock()
+
+    record_rollups(connection, [RESULTS, RESULTS], day=date(2026, 1, 1))
+
+    statement, rows = connection.execute.call_args.args
+    compiled = str(statement.compile(dialect=postgresql.dialect()))
+    # Только вставка: общие строки quality_rollups в транзакции результатов не блокируются
+    assert compiled.startswith("INSERT INTO quality_rollup_deltas")
+    assert "ON CONFLICT" not in compiled
+    # Одна строка на показатель для всей пачки
+    assert len(rows) == 5
+    assert {"day": date(2026, 1, 1), "metric": "bugs", "severity": "critical",
+            "value": 4, "tasks": 2} in rows
+
+
+def test_record_rollups_without_reports():
+    connection = MagicMock()
+
+    record_rollups(connection, [])
+
+    connection.execute.assert_not_called()
+
+
+def test_fold_rollups_moves_deltas_in_one_statement():
+    engine = MagicMock()
+    connection = engine.begin.return_value.__enter__.return_value
+    connection.execute.return_value.scalar_one.return_value = 3
+
+    assert fold_rollups(engine, batch_size=100) == 3
+
+    statement, params = connection.execute.call_args.args
+    sql = " ".join(str(statement).split())
+    assert "DELETE FROM quality_rollup_deltas" in sql
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "value = quality_rollups.value + excluded.value" in sql
+    assert params == {"batch_size": 100}
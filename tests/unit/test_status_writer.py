@@ -0,0 +1,241 @@
+import logging
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.dialects import postgresql
+
+from app.models.task_result import TaskResult, TaskStatusEnum
+from app.services.status_writer import (
+    LeaseLostError,
+    StatusWriter,
+    reap_expired_leases,
+)
+
+
+def make_writer(batch_size: int):
+    engine = MagicMock()
+    connection = engine.begin.return_value.__enter__.return_value
+    connection.execute.return_value.rowcount = 1
+    writer = StatusWriter(engine, batch_size=batch_size, flush_interval=3600)
+    return writer, connection
+
+
+def test_direct_write_without_select():
+    writer, connection = make_writer(batch_size=1)
+
+    assert writer.claim("a", "w1") is True
+    writer.write("a", TaskStatusEnum.SUCCESS, "w1", {"overall_coverage": 1.0})
+
+    claim, update, report = connection.execute.call_args_list
+    assert str(claim.args[0]).startswith("UPDATE task_results")
+    assert str(update.args[0]).startswith("UPDATE task_results")
+    # Результаты - отдельной вставкой в неизменяемую таблицу
+    assert str(report.args[0]).startswith("INSERT INTO task_reports")
+    assert "ON CONFLICT (task_id) DO NOTHING" in str(
+        report.args[0].compile(dialect=postgresql.dialect())
+    )
+
+
+def test_no_report_when_lease_lost(caplog):
+    writer, connection = make_writer(batch_size=1)
+    connection.execute.return_value.rowcount = 0
+
+    with caplog.at_level(logging.WARNING):
+        assert not writer.write("a", TaskStatusEnum.SUCCESS, "w1", {"overall_coverage": 1.0})
+
+    assert connection.execute.call_count == 1
+    assert "аренда потеряна" in caplog.text
+
+
+def test_claim_missing_or_leased_task():
+    writer, connection = make_writer(batch_size=1)
+    connection.execute.return_value.rowcount = 0
+
+    assert writer.claim("missing", "w1") is False
+
+
+def test_claim_respects_foreign_lease():
+    writer, connection = make_writer(batch_size=1)
+    writer.claim("a", "w1")
+
+    statement = str(connection.execute.call_args.args[0])
+    assert "lease_owner" in statement
+    assert "lease_expires_at <" in statement
+
+
+def test_renew_lost_lease():
+    writer, connection = make_writer(batch_size=1)
+    connection.execute.return_value.rowcount = 0
+
+    with pytest.raises(LeaseLostError):
+        writer.renew("a", "w1")
+
+
+def test_renew_keeps_updated_at():
+    writer, connection = make_writer(batch_size=1)
+
+    writer.renew("a", "w1")
+
+    statement = connection.execute.call_args.args[0]
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "updated_at=task_results.updated_at" in sql
+    assert "updated_at=now()" not in sql
+
+
+def test_renew_skipped_while_lease_is_fresh(monkeypatch):
+    writer, connection = make_writer(batch_size=1)
+    writer.lease_ttl = 120
+    clock = [1000.0]
+    monkeypatch.setattr("app.services.status_writer.time.monotonic", lambda: clock[0])
+
+    writer.claim("a", "w1")
+    clock[0] += 59
+    writer.renew("a", "w1")
+    assert connection.execute.call_count == 1
+
+    clock[0] += 2
+    writer.renew("a", "w1")
+    assert connection.execute.call_count == 2
+
+    # Отсчёт - от последнего продления
+    clock[0] += 30
+    writer.renew("a", "w1")
+    assert connection.execute.call_count == 2
+
+
+def test_buffered_writes_are_coalesced():
+    writer, connection = make_writer(batch_size=3)
+
+    writer.write("a", TaskStatusEnum.FAILED, "w1")
+    writer.write("a", TaskStatusEnum.SUCCESS, "w1", {"overall_coverage": 1.0})
+    writer.write("b", TaskStatusEnum.SUCCESS, "w2", {"overall_coverage": 2.0})
+    assert connection.execute.call_count == 0
+
+    # Аренда задачи "b" потеряна: её статус и результаты не записаны
+    connection.execute.return_value.scalars.return_value.all.return_value = ["a"]
+
+    assert writer.flush() == 1
+    (statement, params), (report,) = (
+        call.args for call in connection.execute.call_args_list
+    )
+    assert "FROM (VALUES" in str(statement)
+    assert "t.lease_owner = v.owner" in str(statement)
+    assert params["task_id_0"] == "a"
+    assert params["status_0"] == "SUCCESS"
+    assert params["owner_0"] == "w1"
+    assert params["task_id_1"] == "b"
+    assert report.compile().params == {
+        "task_id_m0": "a",
+        "results_m0": {"overall_coverage": 1.0},
+    }
+
+
+def test_buffer_flushed_when_full():
+    writer, connection = make_writer(batch_size=2)
+
+    writer.write("a", TaskStatusEnum.SUCCESS, "w1", {})
+    writer.write("b", TaskStatusEnum.SUCCESS, "w1", {})
+
+    assert connection.execute.call_count == 1
+    assert writer.flush() == 0
+
+
+def test_claim_drops_pending_transition():
+    writer, connection = make_writer(batch_size=10)
+
+    writer.write("a", TaskStatusEnum.FAILED, "w1")
+    writer.claim("a", "w1")
+
+    assert writer.flush() == 0
+
+
+def test_failed_flush_keeps_statuses():
+    writer, connection = make_writer(batch_size=10)
+    connection.execute.side_effect = RuntimeError("db is down")
+
+    writer.write("a", TaskStatusEnum.SUCCESS, "w1", {})
+    with pytest.raises(RuntimeError):
+        writer.flush()
+
+    connection.execute.side_effect = None
+    connection.execute.return_value.scalars.return_value.all.return_value = ["a"]
+    assert writer.flush() == 1
+
+
+def test_rollups_only_for_new_reports():
+    writer, connection = make_writer(batch_size=1)
+    report = MagicMock()
+    connection.execute.side_effect = [MagicMock(rowcount=1), report, MagicMock()]
+
+    # Результаты задачи уже были записаны ранее: показатели не увеличиваются
+    report.scalars.return_value = iter([])
+    writer.write("a", TaskStatusEnum.SUCCESS, "w1", {"overall_coverage": 1.0})
+    assert connection.execute.call_count == 2
+
+    connection.execute.side_effect = [MagicMock(rowcount=1), report, MagicMock()]
+    report.scalars.return_value = iter(["a"])
+    writer.write("a", TaskStatusEnum.SUCCESS, "w1", {"overall_coverage": 1.0})
+    rollup = connection.execute.call_args.args[0]
+    assert str(rollup).startswith("INSERT INTO quality_rollup_deltas")
+
+
+def test_reaper_writes_outbox_in_same_transaction():
+    engine = MagicMock()
+    connection = engine.begin.return_value.__enter__.return_value
+    connection.execute.return_value.scalars.return_value.all.return_value = ["a", "b"]
+
+    assert reap_expired_leases(engine, batch_size=10) == ["a", "b"]
+
+    engine.begin.assert_called_once()
+    statement, rows = connection.execute.call_args.args
+    assert str(statement).startswith("INSERT INTO task_outbox")
+    assert rows == [{"task_id": "a"}, {"task_id": "b"}]
+
+
+@pytest.fixture
+def sqlite_engine():
+    engine = create_engine("sqlite://")
+    TaskResult.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+def add_task(engine, task_id: str, status: TaskStatusEnum, owner=None):
+    with engine.begin() as connection:
+        connection.execute(
+            insert(TaskResult).values(task_id=task_id, status=status, lease_owner=owner)
+        )
+
+
+def test_claim_finished_task_returns_false(sqlite_engine):
+    writer = StatusWriter(sqlite_engine)
+    add_task(sqlite_engine, "done", TaskStatusEnum.SUCCESS)
+    add_task(sqlite_engine, "failed", TaskStatusEnum.FAILED, owner="w1")
+
+    # Повторная доставка сообщения не перезапускает завершённую задачу
+    assert writer.claim("done", "w2") is False
+    # Упавшую задачу берёт только повторная попытка того же запроса
+    assert writer.claim("failed", "w2") is False
+    assert writer.claim("failed", "w1") is True
+
+
+def test_claim_pending_task(sqlite_engine):
+    writer = StatusWriter(sqlite_engine)
+    add_task(sqlite_engine, "a", TaskStatusEnum.PENDING)
+
+    assert writer.claim("a", "w1") is True
+
+
+def test_failed_write_keeps_owner_for_retry(sqlite_engine):
+    writer = StatusWriter(sqlite_engine)
+    add_task(sqlite_engine, "a", TaskStatusEnum.PENDING)
+    writer.claim("a", "w1")
+
+    writer.write("a", TaskStatusEnum.FAILED, "w1", immediate=True)
+
+    with sqlite_engine.connect() as connection:
+        row = connection.execute(select(TaskResult)).one()
+    assert row.status == TaskStatusEnum.FAILED
+    assert row.lease_owner == "w1"
+    assert row.lease_expires_at is None